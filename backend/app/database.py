@@ -5,9 +5,15 @@ Soporta: SQLModel + SQLite (Local) y PostgreSQL (Producción/Supabase)
 
 from pathlib import Path
 import os
+import time
+from sqlalchemy import event, inspect, text
 from sqlmodel import SQLModel, create_engine, Session
 from dotenv import load_dotenv  # <--- 1. NUEVO IMPORT
 
+from .metrics import DB_COMMIT_LATENCY
+from .ml.fileops import file_lock
+from .stats_summary import ensure_summary
+
 # 2. CARGAR VARIABLES DE ENTORNO
 # Esto busca el archivo .env y carga las variables en os.getenv
 load_dotenv() 
@@ -15,37 +21,133 @@ load_dotenv()
 # 1. Intentar obtener la URL de la nube (Variable de entorno)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Ajustes del motor (todos configurables por entorno)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negativo = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
 # 2. Lógica de selección de Base de Datos
 if DATABASE_URL:
     # CASO PRODUCCIÓN (Supabase / Postgres)
     # Fix: SQLAlchemy necesita 'postgresql://' pero algunos providers dan 'postgres://'
     if DATABASE_URL.startswith("postgres://"):
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    
-    # Postgres no necesita argumentos especiales de hilos
-    connect_args = {}
-    print("🌍 Conectando a Base de Datos en la NUBE (PostgreSQL)")
+
+    if DATABASE_URL.startswith("sqlite"):
+        print(f"🏠 Conectando a Base de Datos SQLite ({DATABASE_URL})")
+    else:
+        print("🌍 Conectando a Base de Datos en la NUBE (PostgreSQL)")
 
 else:
     # CASO LOCAL (SQLite) - Fallback
     DEFAULT_DB_PATH = Path("./data/edupredict_v2.db")
     DEFAULT_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     DATABASE_URL = f"sqlite:///{DEFAULT_DB_PATH}"
-    
-    # SQLite necesita esto para trabajar con FastAPI
-    connect_args = {"check_same_thread": False}
+
     print("🏠 Conectando a Base de Datos LOCAL (SQLite)")
 
+
+def build_engine(url: str = DATABASE_URL, **kwargs):
+    """Crea el motor con los ajustes de cada dialecto.
+
+    - SQLite: WAL, synchronous=NORMAL, mmap, cache y busy timeout en cada conexion.
+    - Postgres/otros: pool con tamano, overflow, reciclado y pre-ping.
+    """
+    if url.startswith("sqlite"):
+        # check_same_thread=False: SQLite necesita esto para trabajar con FastAPI
+        sqlite_engine = create_engine(
+            url, echo=False, connect_args={"check_same_thread": False}, **kwargs
+        )
+
+        @event.listens_for(sqlite_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+            cursor.close()
+
+        return sqlite_engine
+
+    return create_engine(
+        url,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        **kwargs,
+    )
+
+
 # 3. Crear el motor de la base de datos
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+engine = build_engine(DATABASE_URL)
+
+
+# Con `uvicorn --workers N` solo un proceso a la vez crea tablas y migra
+SCHEMA_LOCK_PATH = Path(os.getenv("SCHEMA_LOCK_PATH", "./data/.schema.lock"))
 
 
 def create_db_and_tables():
     """Crear todas las tablas en la BD si no existen"""
-    SQLModel.metadata.create_all(engine)
+    with file_lock(SCHEMA_LOCK_PATH, timeout=120):
+        SQLModel.metadata.create_all(engine)
+        aplicados = run_migrations()
+        with Session(engine) as session:
+            ensure_summary(session)
+    if aplicados:
+        print(f"🔧 Migraciones aplicadas: {', '.join(aplicados)}")
+
+
+def run_migrations(bind=None) -> list:
+    """Migraciones idempotentes sobre BDs existentes (create_all no altera tablas).
+
+    - Agrega las columnas nuevas (nullable) de los modelos.
+    - Crea los indices declarados en los modelos que aun no existen.
+    Retorna la lista de cambios aplicados.
+    """
+    bind = bind or engine
+    aplicados = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+                aplicados.append(f"columna {table.name}.{column.name}")
+
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    aplicados.append(f"indice {index.name}")
+    return aplicados
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_LATENCY.observe(time.perf_counter() - started)
 
 
 def get_session():
     """Dependency para obtener sesion de BD en cada request"""
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
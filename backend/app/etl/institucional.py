@@ -3,6 +3,8 @@
 Soporta:
 - Conexión opcional a BD institucional vía DSN (env INSTITUTIONAL_DB_DSN)
 - Ingesta de CSVs del sistema académico (notas, asistencia, actividades)
+- Ingesta en streaming (CSV o Parquet) por bloques, agregada por estudiante
+- Extraccion desde la BD institucional con agregacion en SQL y cursores de servidor
 - Transformación/mapeo a las variables del modelo: promedio, asistencia, horas_estudio,
   tendencia, puntualidad, habitos, y etiqueta de riesgo opcional si existe.
 
@@ -11,12 +13,14 @@ Nota: Este módulo está diseñado para ser extendido con los nombres reales de
 
 from __future__ import annotations
 
+import json
 import os
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import numpy as np
 import pandas as pd
+from sqlalchemy import MetaData, and_, create_engine, func, select
 
 # Columnas esperadas por el modelo
 FEATURE_COLUMNS = [
@@ -28,6 +32,55 @@ FEATURE_COLUMNS = [
     "habitos",
 ]
 
+# Nombres de columna candidatos por feature en los sistemas académicos
+COLUMN_CANDIDATES: Dict[str, List[str]] = {
+    "promedio": ["promedio", "nota_promedio", "prom_general", "media", "nota"],
+    "asistencia": ["asistencia", "porc_asistencia", "attendance"],
+    "puntualidad": ["puntualidad", "on_time_pct", "entregas_puntuales"],
+    "horas_estudio": ["horas_estudio", "study_hours", "hrs_estudio"],
+    "tendencia": ["tendencia", "trend", "variacion"],
+    "habitos": ["habitos", "habitos_estudio", "study_habits"],
+}
+STUDENT_KEY_CANDIDATES = ["estudiante_id", "id_estudiante", "student_id", "matricula", "cedula"]
+LABEL_COLUMN = "riesgo"
+# Columnas que ordenan los registros de una tabla (la etiqueta es la del ultimo);
+# la clave primaria desempata y, si no hay ninguna, es el orden
+ORDER_CANDIDATES = ["fecha", "fecha_registro", "created_at", "updated_at", "periodo"]
+
+# Defaults conservadores cuando una feature no aparece en ninguna fuente
+FEATURE_DEFAULTS = {
+    "promedio": 7.0,
+    "asistencia": 85.0,
+    "puntualidad": 85.0,
+    "horas_estudio": 10.0,
+    "tendencia": 0.0,
+    "habitos": 6.5,
+}
+
+STREAM_CHUNKSIZE = int(os.getenv("ETL_CHUNKSIZE", "200000"))
+
+# Tablas de la BD institucional a consultar (env INSTITUTIONAL_DB_TABLES)
+DB_TABLES = [t.strip() for t in os.getenv("INSTITUTIONAL_DB_TABLES", "notas,asistencia,actividades").split(",") if t.strip()]
+
+
+def _pick(cols: Iterable[str], candidates: Iterable[str]) -> Optional[str]:
+    for c in candidates:
+        if c in cols:
+            return c
+    return None
+
+
+def _fill_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """Completa faltantes con la mediana, o con el default si la columna esta vacia."""
+    for col in FEATURE_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+        if df[col].isna().all():
+            df[col] = FEATURE_DEFAULTS[col]
+        else:
+            df[col] = df[col].fillna(df[col].median())
+    return df
+
 
 def _safe_read_csv(path: Path) -> pd.DataFrame:
     try:
@@ -68,75 +121,248 @@ def import_from_csvs(
     raw = pd.concat(frames, ignore_index=True)
 
     # Mapeo heurístico de columnas posibles a las features
-    def pick(cols: Iterable[str], candidates: Iterable[str], default=np.nan):
-        for c in candidates:
-            if c in cols:
-                return c
-        return None
-
     cols = set(raw.columns)
-    col_promedio = pick(cols, ["promedio", "nota_promedio", "prom_general", "media"])
-    col_asistencia = pick(cols, ["asistencia", "porc_asistencia", "attendance"], 0)
-    col_puntualidad = pick(cols, ["puntualidad", "on_time_pct", "entregas_puntuales"], 0)
-    col_horas = pick(cols, ["horas_estudio", "study_hours", "hrs_estudio"], 0)
-    col_tendencia = pick(cols, ["tendencia", "trend", "variacion"], 0)
-    col_habitos = pick(cols, ["habitos", "habitos_estudio", "study_habits"], 0)
-
     df = pd.DataFrame()
-    df["promedio"] = pd.to_numeric(raw.get(col_promedio, pd.Series([np.nan] * len(raw)))),
-    df["asistencia"] = pd.to_numeric(raw.get(col_asistencia, pd.Series([np.nan] * len(raw))))
-    df["puntualidad"] = pd.to_numeric(raw.get(col_puntualidad, pd.Series([np.nan] * len(raw))))
-    df["horas_estudio"] = pd.to_numeric(raw.get(col_horas, pd.Series([np.nan] * len(raw))))
-    df["tendencia"] = pd.to_numeric(raw.get(col_tendencia, pd.Series([np.nan] * len(raw))))
-    df["habitos"] = pd.to_numeric(raw.get(col_habitos, pd.Series([np.nan] * len(raw))))
+    for feature in FEATURE_COLUMNS:
+        col = _pick(cols, COLUMN_CANDIDATES[feature])
+        df[feature] = pd.to_numeric(raw[col]) if col else pd.Series([np.nan] * len(raw))
 
     # Completar faltantes con valores razonables
-    for col in FEATURE_COLUMNS:
-        if col not in df.columns:
-            df[col] = np.nan
-        if df[col].isna().all():
-            # Defaults conservadores
-            default = {
-                "promedio": 7.0,
-                "asistencia": 85.0,
-                "puntualidad": 85.0,
-                "horas_estudio": 10.0,
-                "tendencia": 0.0,
-                "habitos": 6.5,
-            }[col]
-            df[col] = default
-        else:
-            df[col] = df[col].fillna(df[col].median())
-
+    df = _fill_missing(df)
     return df[FEATURE_COLUMNS]
 
 
-def import_from_db(dsn: Optional[str] = None) -> pd.DataFrame:
-    """Plantilla para importar desde BD institucional.
+def _is_parquet(path: Path) -> bool:
+    return path.suffix.lower() in {".parquet", ".pq"}
+
+
+def _read_columns(path: Path) -> List[str]:
+    """Solo el encabezado/esquema, sin leer filas."""
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Instale pyarrow para importar archivos Parquet") from exc
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _iter_chunks(path: Path, usecols: List[str], dtypes: Dict[str, str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Lee solo `usecols` por bloques de `chunksize` filas con dtypes compactos."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=usecols):
+            yield batch.to_pandas().astype(dtypes)
+        return
+
+    yield from pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+
+
+def _aggregate_source(path: Path, chunksize: int) -> pd.DataFrame:
+    """
+    Agrega una fuente por estudiante de forma incremental (suma y conteo por bloque).
+    La memoria depende del numero de estudiantes, no del numero de filas.
+    """
+    columns = _read_columns(path)
+    key = _pick(columns, STUDENT_KEY_CANDIDATES)
+    if key is None:
+        raise ValueError(f"{path.name}: no se encontro columna de estudiante ({', '.join(STUDENT_KEY_CANDIDATES)})")
+
+    mapping = {}
+    for feature in FEATURE_COLUMNS:
+        col = _pick(columns, COLUMN_CANDIDATES[feature])
+        if col and col not in mapping:
+            mapping[col] = feature
+    label = LABEL_COLUMN if LABEL_COLUMN in columns else None
+
+    dtypes = {key: "str", **{col: "float32" for col in mapping}}
+    if label:
+        dtypes[label] = "category"
+    usecols = [key, *mapping, *([label] if label else [])]
+
+    sums: Optional[pd.DataFrame] = None
+    counts: Optional[pd.DataFrame] = None
+    labels: Optional[pd.Series] = None
+    features = list(mapping.values())
+    for chunk in _iter_chunks(path, usecols, dtypes, chunksize):
+        chunk = chunk.rename(columns={**mapping, key: "estudiante_id"})
+        grouped = chunk.groupby("estudiante_id", sort=False, observed=True)
+        if features:
+            chunk_sums = grouped[features].sum().astype("float64")
+            chunk_counts = grouped[features].count()
+            sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+            counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+        if label:
+            # Ultima etiqueta observada por estudiante (un bloque sin etiqueta no la borra)
+            chunk_labels = grouped[label].last().dropna().astype(str)
+            labels = chunk_labels if labels is None else chunk_labels.combine_first(labels)
+
+    if sums is not None:
+        result = (sums / counts.replace(0, np.nan)).astype("float32")
+    else:
+        result = pd.DataFrame(index=labels.index if labels is not None else None)
+    if labels is not None:
+        result[LABEL_COLUMN] = labels
+    result.index.name = "estudiante_id"
+    return result
+
+
+def import_streaming(paths: Iterable[str], chunksize: int = STREAM_CHUNKSIZE) -> pd.DataFrame:
+    """Ingesta en streaming de CSV/Parquet institucionales, una fila por estudiante.
+
+    Cada fuente (notas, asistencia, actividades...) se lee por bloques con `usecols`
+    y dtypes compactos, se agrega por estudiante y las fuentes se combinan por la
+    clave de estudiante (hash join sobre el indice). Ante una feature repetida
+    prevalece la primera fuente.
+    """
+    joined: Optional[pd.DataFrame] = None
+    for path in paths:
+        if not path or not Path(path).exists():
+            continue
+        source = _aggregate_source(Path(path), chunksize)
+        joined = source if joined is None else joined.combine_first(source)
+
+    return _finalize(joined)
+
+
+def _finalize(joined: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Una fila por estudiante con FEATURE_COLUMNS completas (+ riesgo si existe)."""
+    if joined is None or joined.empty:
+        return pd.DataFrame(columns=FEATURE_COLUMNS)
+
+    df = _fill_missing(joined.reset_index())
+    df[FEATURE_COLUMNS] = df[FEATURE_COLUMNS].astype("float32")
+    extra = [LABEL_COLUMN] if LABEL_COLUMN in df.columns else []
+    return df[["estudiante_id", *FEATURE_COLUMNS, *extra]]
+
+
+def _column_candidates(column_map: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """COLUMN_CANDIDATES con overrides (argumento o env INSTITUTIONAL_COLUMN_MAP en JSON)."""
+    if column_map is None and os.getenv("INSTITUTIONAL_COLUMN_MAP"):
+        column_map = json.loads(os.environ["INSTITUTIONAL_COLUMN_MAP"])
+    candidates = {feature: list(names) for feature, names in COLUMN_CANDIDATES.items()}
+    for feature, names in (column_map or {}).items():
+        names = [names] if isinstance(names, str) else list(names)
+        candidates[feature] = names + candidates.get(feature, [])
+    return candidates
+
 
-    Por defecto, devuelve vacío. Para usar, implementar queries según el esquema real.
+def _aggregate_table(conn, table, candidates: Dict[str, List[str]], chunksize: int) -> Optional[pd.DataFrame]:
+    """
+    AVG por estudiante calculado en SQL y leido con cursor de servidor por bloques.
+    La etiqueta es la del ultimo registro con etiqueta de cada estudiante (ROW_NUMBER
+    sobre ORDER_CANDIDATES y la clave primaria), como en `import_streaming`.
+    Retorna None si la tabla no tiene columna de estudiante.
+    """
+    columns = {c.name: c for c in table.columns}
+    key = _pick(columns, STUDENT_KEY_CANDIDATES)
+    if key is None:
+        return None
+
+    selected = [columns[key].label("estudiante_id")]
+    for feature in FEATURE_COLUMNS:
+        col = _pick(columns, candidates.get(feature, []))
+        if col:
+            selected.append(func.avg(columns[col]).label(feature))
+    order = [columns[c] for c in ORDER_CANDIDATES if c in columns] + list(table.primary_key.columns)
+    label = LABEL_COLUMN in columns
+    if label and not order:
+        print(f"⚠️ {table.name}: sin columna de orden ni clave primaria, se omite la etiqueta")
+        label = False
+    if len(selected) == 1 and not label:
+        return None
+
+    query = select(*selected).group_by(columns[key])
+    if label:
+        averages = query.subquery()
+        ranked = (
+            select(
+                columns[key].label("estudiante_id"),
+                columns[LABEL_COLUMN].label(LABEL_COLUMN),
+                func.row_number()
+                .over(partition_by=columns[key], order_by=[col.desc() for col in order])
+                .label("posicion"),
+            )
+            .where(columns[LABEL_COLUMN].is_not(None))
+            .subquery()
+        )
+        query = select(averages, ranked.c[LABEL_COLUMN]).select_from(
+            averages.outerjoin(
+                ranked, and_(ranked.c.estudiante_id == averages.c.estudiante_id, ranked.c.posicion == 1)
+            )
+        )
+    result = conn.execution_options(stream_results=True, yield_per=chunksize).execute(query)
+    frames = [pd.DataFrame(rows, columns=list(result.keys())) for rows in result.partitions()]
+    if not frames:
+        return None
+
+    df = pd.concat(frames, ignore_index=True)
+    df["estudiante_id"] = df["estudiante_id"].astype(str)
+    for feature in FEATURE_COLUMNS:
+        if feature in df.columns:
+            df[feature] = pd.to_numeric(df[feature]).astype("float32")
+    return df.set_index("estudiante_id")
+
+
+def import_from_db(
+    dsn: Optional[str] = None,
+    tables: Optional[List[str]] = None,
+    column_map: Optional[Dict[str, List[str]]] = None,
+    chunksize: int = STREAM_CHUNKSIZE,
+) -> pd.DataFrame:
+    """Importa desde la BD institucional (env INSTITUTIONAL_DB_DSN) via SQLAlchemy.
+
+    Por cada tabla (`tables` o env INSTITUTIONAL_DB_TABLES) se detectan la clave de
+    estudiante y las columnas de features con los mismos candidatos que los CSV
+    (ajustables con `column_map`). El promedio por estudiante se calcula en SQL y
+    el resultado se recorre con cursor de servidor por bloques de `chunksize`.
     """
     dsn = dsn or os.getenv("INSTITUTIONAL_DB_DSN")
     if not dsn:
         return pd.DataFrame(columns=FEATURE_COLUMNS)
 
-    # Ejemplo: conectar con sqlalchemy/pyodbc y mapear tablas reales.
-    # Aquí se deja como stub para no romper el entorno.
-    return pd.DataFrame(columns=FEATURE_COLUMNS)
+    candidates = _column_candidates(column_map)
+    engine = create_engine(dsn)
+    try:
+        metadata = MetaData()
+        metadata.reflect(bind=engine, only=lambda name, _: name in (tables or DB_TABLES))
+        joined: Optional[pd.DataFrame] = None
+        with engine.connect() as conn:
+            for name in tables or DB_TABLES:
+                if name not in metadata.tables:
+                    continue
+                source = _aggregate_table(conn, metadata.tables[name], candidates, chunksize)
+                if source is not None:
+                    joined = source if joined is None else joined.combine_first(source)
+    finally:
+        engine.dispose()
+
+    return _finalize(joined)
 
 
 def build_training_dataset(
     csv_config: Optional[Dict[str, str]] = None,
     use_db: bool = False,
+    streaming: bool = False,
 ) -> pd.DataFrame:
-    """Construye un dataset de entrenamiento combinando CSV y/o BD institucional."""
+    """Construye un dataset de entrenamiento combinando CSV y/o BD institucional.
+
+    Con `streaming=True` las fuentes (CSV o Parquet) se leen por bloques y se unen
+    por estudiante en lugar de apilarse.
+    """
     csv_config = csv_config or {}
-    df_csv = import_from_csvs(
-        notas_csv=csv_config.get("notas"),
-        asistencia_csv=csv_config.get("asistencia"),
-        actividades_csv=csv_config.get("actividades"),
-        materias_csv=csv_config.get("materias"),
-    )
+    if streaming:
+        df_csv = import_streaming(
+            [csv_config.get(name) for name in ("notas", "asistencia", "actividades", "materias")]
+        )
+    else:
+        df_csv = import_from_csvs(
+            notas_csv=csv_config.get("notas"),
+            asistencia_csv=csv_config.get("asistencia"),
+            actividades_csv=csv_config.get("actividades"),
+            materias_csv=csv_config.get("materias"),
+        )
     df_db = import_from_db() if use_db else pd.DataFrame(columns=FEATURE_COLUMNS)
 
     if df_csv.empty and df_db.empty:
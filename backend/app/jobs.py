@@ -0,0 +1,168 @@
+"""Seguimiento de trabajos en segundo plano (reentrenamiento, exportes).
+
+Cada trabajo se ejecuta en un executor (procesos o hilos) y su estado se consulta
+por id: pendiente -> en_curso -> completado | fallido. Un trabajo que corre en un
+hilo puede publicar su avance con `update_job(job_id, progreso=...)` si recibe su id
+(`new_job_id()` + `submit_job(..., job_id=...)`).
+
+El estado vive en la tabla `trabajos` de la BD, asi cualquier worker de
+`uvicorn --workers N` responde por trabajos lanzados en otro. Solo el `Future` queda
+en el proceso que lanzo el trabajo. Los trabajos terminados se borran pasadas
+JOBS_TTL_HOURS o cuando hay mas de JOBS_MAX; uno activo que no se actualiza en
+JOBS_STALE_HOURS (su worker murio) se marca fallido para no bloquear a los siguientes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import Executor, Future
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from .models import Trabajo
+
+JOBS_TTL_HOURS = float(os.getenv("JOBS_TTL_HOURS", "24"))
+JOBS_MAX = int(os.getenv("JOBS_MAX", "500"))
+JOBS_STALE_HOURS = float(os.getenv("JOBS_STALE_HOURS", "6"))
+ACTIVOS = ("pendiente", "en_curso")
+
+_FUTURES: Dict[str, Future] = {}
+_LOCK = threading.Lock()
+
+
+def _engine():
+    # Import diferido: los procesos del pool importan este modulo (via report_export)
+    # y no deben abrir la BD
+    from .database import engine
+
+    return engine
+
+
+def _plain(value):
+    """numpy y fechas a tipos de JSON."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _save(session: Session, job: Dict) -> None:
+    job = json.loads(json.dumps(job, default=_plain))
+    session.merge(
+        Trabajo(
+            id=job["id"],
+            tipo=job["tipo"],
+            estado=job["estado"],
+            creado=datetime.fromisoformat(job["creado"]),
+            actualizado=datetime.utcnow(),
+            datos=job,
+        )
+    )
+    session.commit()
+
+
+def purge_jobs(session: Session) -> None:
+    """Borra los trabajos terminados vencidos y los que excedan JOBS_MAX."""
+    terminados = Trabajo.estado.not_in(ACTIVOS)
+    session.exec(delete(Trabajo).where(terminados, Trabajo.actualizado < datetime.utcnow() - timedelta(hours=JOBS_TTL_HOURS)))
+    sobrantes = select(Trabajo.id).where(terminados).order_by(Trabajo.actualizado.desc()).offset(JOBS_MAX)
+    session.exec(delete(Trabajo).where(Trabajo.id.in_(sobrantes.scalar_subquery())))
+    session.commit()
+
+
+def submit_job(
+    tipo: str,
+    executor: Executor,
+    fn: Callable,
+    *args,
+    on_success: Optional[Callable] = None,
+    job_id: Optional[str] = None,
+    **kwargs,
+) -> Dict:
+    """
+    Encola `fn(*args, **kwargs)` en el executor y retorna el estado inicial.
+    `on_success(resultado)` corre al terminar (en el hilo del callback); si retorna
+    un dict, se mezcla en el estado del trabajo.
+    """
+    job_id = job_id or new_job_id()
+    job = {
+        "id": job_id,
+        "tipo": tipo,
+        "estado": "pendiente",
+        "creado": datetime.utcnow().isoformat(),
+        "finalizado": None,
+        "resultado": None,
+        "error": None,
+    }
+    with Session(_engine()) as session:
+        purge_jobs(session)
+        _save(session, job)
+
+    def _done(future: Future):
+        update: Dict = {"finalizado": datetime.utcnow().isoformat()}
+        try:
+            resultado = future.result()
+            extra = on_success(resultado) if on_success else None
+            update.update({"estado": "completado", "resultado": resultado, **(extra or {})})
+        except Exception as exc:  # el error queda visible en /jobs/{id}
+            traceback.print_exc()
+            update.update({"estado": "fallido", "error": str(exc)})
+        update_job(job_id, **update)
+
+    future = executor.submit(fn, *args, **kwargs)
+    with _LOCK:
+        _FUTURES[job_id] = future
+    future.add_done_callback(_done)
+    return get_job(job_id)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def update_job(job_id: str, **fields) -> None:
+    with _LOCK:
+        with Session(_engine()) as session:
+            row = session.get(Trabajo, job_id)
+            if row is not None:
+                if row.estado not in ACTIVOS and fields.get("estado") in ACTIVOS:
+                    # `en_curso` visto tarde: el trabajo ya termino
+                    fields = {k: v for k, v in fields.items() if k != "estado"}
+                _save(session, {**row.datos, **fields})
+        if fields.get("estado") in {"completado", "fallido"}:
+            _FUTURES.pop(job_id, None)
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Estado actual de un trabajo o None si no existe."""
+    with Session(_engine()) as session:
+        row = session.get(Trabajo, job_id)
+        if row is None:
+            return None
+        job = dict(row.datos)
+    with _LOCK:
+        future = _FUTURES.get(job_id)
+    if job["estado"] == "pendiente" and future is not None and future.running():
+        update_job(job_id, estado="en_curso")
+        return get_job(job_id)
+    return job
+
+
+def find_active_job(tipo: str) -> Optional[Dict]:
+    """Primer trabajo de un tipo que aun no ha terminado (en cualquier worker)."""
+    limite = datetime.utcnow() - timedelta(hours=JOBS_STALE_HOURS)
+    with Session(_engine()) as session:
+        rows = session.exec(
+            select(Trabajo).where(Trabajo.tipo == tipo, Trabajo.estado.in_(ACTIVOS)).order_by(Trabajo.creado)
+        ).all()
+        activos = [row.id for row in rows if row.actualizado >= limite]
+        abandonados = [row.id for row in rows if row.actualizado < limite]
+    for job_id in abandonados:
+        update_job(job_id, estado="fallido", error="Trabajo abandonado (sin avance)", finalizado=datetime.utcnow().isoformat())
+    return get_job(activos[0]) if activos else None
@@ -4,36 +4,96 @@ Backend API REST con FastAPI + pipeline de IA (Regresion Logistica, Arboles
 de Decision, Random Forest y KNN).
 """
 
+import base64
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import asynccontextmanager  # <--- NUEVO IMPORT
-from datetime import datetime, timedelta
+import csv
+from datetime import date, datetime, timedelta
+import io
+import json
+import multiprocessing
 import os
-from typing import List, Optional
+import threading
+import time
+import traceback
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
+
+STARTED_AT = time.perf_counter()  # referencia para medir el time-to-ready
 
 import jwt
-from fastapi import Depends, FastAPI, HTTPException
+import numpy as np
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response as RawResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from passlib.context import CryptContext
+from sqlalchemy import func, tuple_
 from sqlmodel import Session, select
 
 # Importamos la funcion que creaste en database.py para crear las tablas
-from .database import create_db_and_tables, get_session
+from .database import create_db_and_tables, engine, get_session
+from .jobs import find_active_job, get_job, new_job_id, submit_job
+from .metrics import MetricsMiddleware, gauge_lines, register_collector, render_metrics
+from .pdf_cache import get_or_build_pdf, iter_pdf_zip, pdf_cache_stats, purge_pdf_cache, report_cache_key
+from .prediction_cache import (
+    cache_prediction,
+    clear_prediction_cache,
+    get_cached_prediction,
+    prediction_cache_stats,
+    prediction_key,
+)
+from .report_export import (
+    EXPORT_MAX_REPORTS,
+    EXPORT_WORKERS,
+    FORMATOS,
+    export_path,
+    export_query,
+    purge_exports,
+    run_export,
+)
+from .stats_summary import TREND_MAX_DAYS, TREND_MAX_POINTS, read_summary, summary_dict, trend
+from .user_cache import cache_user, get_cached_user, user_cache_stats
+from .write_behind import (
+    failed_prediction,
+    insert_errors,
+    pending_prediction,
+    persist_prediction,
+    start_writer,
+    stop_writer,
+    write_behind_enabled,
+    write_behind_stats,
+)
 from .ml.utils import (
-    build_pdf_report,
     generate_recommendations,
     get_model_report,
     load_or_train_model,
     normalize_payload,
+    payloads_to_matrix,
+    predict_batch,
     predict_with_model,
 )
-from .etl.institucional import build_training_dataset
+from .ml.inference import get_compiled
+from .ml.online import ONLINE_BATCH_SIZE, iter_frame_batches, regresses, update_online_bundle
+from .ml.constants import FEATURE_COLUMNS, MODEL_PATH
+from .ml.registry import (
+    activate_version,
+    list_versions,
+    load_version,
+    previous_version,
+    save_version,
+    train_version,
+)
 from .models import (
+    ExporteReportesCreate,
     Prediccion,
     PrediccionCreate,
+    PrediccionLoteCreate,
+    PrediccionLoteResponse,
     PrediccionResponse,
+    PrediccionResultado,
     Usuario,
     UsuarioCreate,
     UsuarioLogin,
@@ -46,6 +106,8 @@ from .models import (
 SECRET_KEY = os.getenv("SECRET_KEY", "edupredict-uleam-2025-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 horas
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+NIVELES_RIESGO = {"alto", "medio", "bajo"}
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
@@ -53,6 +115,260 @@ security = HTTPBearer(auto_error=False)
 # Variables Globales
 MODEL_BUNDLE = {}
 SCHEDULER: Optional[BackgroundScheduler] = None
+TRAINING_EXECUTOR: Optional[ProcessPoolExecutor] = None
+PDF_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PDF_WORKERS", "4")), thread_name_prefix="pdf"
+)
+ONLINE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="online")
+# Exportes masivos de PDF: un hilo coordina (uno a la vez) y los procesos generan
+EXPORT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+EXPORT_POOL: Optional[ProcessPoolExecutor] = None
+
+# Cada worker vigila model.pkl: un reentrenamiento publicado por otro worker (o un
+# rollback) se carga sin reiniciar. La firma es (inode, mtime, tamano) del archivo.
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "5"))
+MODEL_STAMP: Optional[tuple] = None
+MODEL_WATCH_STOP = threading.Event()
+
+# Calentamiento en segundo plano: la API acepta conexiones antes de tener modelo
+MODEL_WAIT_SECONDS = float(os.getenv("MODEL_WAIT_SECONDS", "30"))
+MODEL_READY = threading.Event()
+READINESS = {
+    "estado": "sin_iniciar",  # sin_iniciar -> calentando -> listo | fallido
+    "fase": None,
+    "error": None,
+    "import_seconds": None,
+    "warmup_seconds": None,
+    "time_to_ready_seconds": None,
+}
+WARMUP_PAYLOAD = {
+    "promedio": 7.0,
+    "asistencia": 85.0,
+    "horas_estudio": 10.0,
+    "tendencia": 0.0,
+    "puntualidad": 90.0,
+    "habitos": 7.0,
+}
+
+
+def calentar_modelo() -> None:
+    """Carga (o entrena) el modelo y ejecuta una prediccion de calentamiento."""
+    global MODEL_BUNDLE, MODEL_STAMP
+    inicio = time.perf_counter()
+    try:
+        READINESS["fase"] = "cargando_modelo"
+        stamp = _model_stamp()
+        model_bundle = load_or_train_model()
+        READINESS["fase"] = "prediccion_calentamiento"
+        predict_with_model(model_bundle, WARMUP_PAYLOAD)
+        if not MODEL_BUNDLE:  # un rollback/reentrenamiento pudo publicar otro antes
+            MODEL_BUNDLE = model_bundle
+            MODEL_STAMP = stamp or _model_stamp()
+        ahora = time.perf_counter()
+        READINESS.update(
+            estado="listo",
+            fase=None,
+            warmup_seconds=round(ahora - inicio, 3),
+            time_to_ready_seconds=round(ahora - STARTED_AT, 3),
+        )
+        print(
+            f"🧠 Modelo de IA listo en {READINESS['warmup_seconds']:.2f} s "
+            f"(time-to-ready {READINESS['time_to_ready_seconds']:.2f} s)"
+        )
+    except Exception as exc:
+        traceback.print_exc()
+        READINESS.update(estado="fallido", error=str(exc))
+    finally:
+        MODEL_READY.set()
+
+
+def get_model_bundle() -> Dict:
+    """
+    Bundle vigente. Cada request toma una sola referencia para no mezclar versiones.
+    Durante el calentamiento espera hasta MODEL_WAIT_SECONDS y luego responde 503.
+    """
+    global MODEL_BUNDLE
+    if not MODEL_BUNDLE:
+        if READINESS["estado"] == "sin_iniciar":
+            # Sin lifespan (scripts, shell): carga sincrona
+            MODEL_BUNDLE = load_or_train_model()
+        elif not MODEL_READY.wait(MODEL_WAIT_SECONDS) or not MODEL_BUNDLE:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Modelo no disponible ({READINESS['estado']})",
+                headers={"Retry-After": "5"},
+            )
+    return MODEL_BUNDLE
+
+
+def swap_model_bundle(model_bundle: Dict, stamp: Optional[tuple] = None) -> None:
+    """
+    Publica un bundle ya cargado y compilado con una unica asignacion (atomica).
+    `stamp` es la firma del model.pkl del que se cargo (por defecto, la actual).
+    """
+    global MODEL_BUNDLE, MODEL_STAMP
+    get_compiled(model_bundle)
+    MODEL_BUNDLE = model_bundle
+    MODEL_STAMP = stamp or _model_stamp()
+    clear_prediction_cache()
+    purge_pdf_cache(model_bundle)
+
+
+def _model_stamp() -> Optional[tuple]:
+    try:
+        st = os.stat(MODEL_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def recargar_modelo_si_cambio() -> bool:
+    """Carga el model.pkl publicado por otro proceso si cambio desde la ultima carga."""
+    stamp = _model_stamp()
+    if stamp is None or stamp == MODEL_STAMP:
+        return False
+    model_bundle = load_or_train_model()
+    swap_model_bundle(model_bundle, stamp)
+    print(f"🔄 Modelo recargado desde disco (version {model_bundle.get('version')})")
+    return True
+
+
+def vigilar_modelo() -> None:
+    """Hilo por worker: revisa model.pkl cada MODEL_RELOAD_SECONDS."""
+    while not MODEL_WATCH_STOP.wait(MODEL_RELOAD_SECONDS):
+        if READINESS["estado"] != "listo":
+            continue
+        try:
+            recargar_modelo_si_cambio()
+        except Exception:  # un artefacto a medio publicar se reintenta en la proxima vuelta
+            traceback.print_exc()
+
+
+def get_training_executor() -> ProcessPoolExecutor:
+    """Un proceso dedicado al entrenamiento: no bloquea los hilos de la API."""
+    global TRAINING_EXECUTOR
+    if TRAINING_EXECUTOR is None:
+        TRAINING_EXECUTOR = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+    return TRAINING_EXECUTOR
+
+
+def _publicar_version(version: str) -> Dict:
+    # El proceso de entrenamiento ya publico model.pkl y su artefacto mmap
+    stamp = _model_stamp()
+    model_bundle = load_or_train_model()
+    if model_bundle.get("version") != version:
+        model_bundle = load_version(version)
+    swap_model_bundle(model_bundle, stamp)
+    return {"modelo": get_model_report(model_bundle)}
+
+
+def lanzar_reentrenamiento(df=None, tune: bool = False) -> Dict:
+    """
+    Encola un reentrenamiento; si ya hay uno en curso (sin datos nuevos ni busqueda)
+    lo reutiliza. Con `tune` busca hiperparametros antes de entrenar.
+    """
+    if df is None and not tune:
+        en_curso = find_active_job("reentrenamiento")
+        if en_curso:
+            return en_curso
+    return submit_job(
+        "reentrenamiento", get_training_executor(), train_version, df, tune=tune, on_success=_publicar_version
+    )
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    """Procesos que generan los PDFs de los exportes masivos (EXPORT_WORKERS)."""
+    global EXPORT_POOL
+    if EXPORT_POOL is None:
+        EXPORT_POOL = ProcessPoolExecutor(
+            max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return EXPORT_POOL
+
+
+def lanzar_exporte(filtro: Dict, formato: str) -> Dict:
+    """Encola un exporte de reportes; el avance queda en `progreso` del trabajo."""
+    purge_exports()
+    job_id = new_job_id()
+    return submit_job(
+        "exporte_reportes",
+        EXPORT_EXECUTOR,
+        run_export,
+        job_id,
+        engine,
+        filtro,
+        formato,
+        get_model_bundle(),
+        get_export_pool(),
+        job_id=job_id,
+        on_success=lambda _: {"url": f"/api/predictions/pdf/export/{job_id}/download"},
+    )
+
+
+def iter_resultados_confirmados(cursor=None, batch_size: int = ONLINE_BATCH_SIZE):
+    """Lotes (X, y, cursor) de predicciones con resultado confirmado posteriores a `cursor`."""
+    after = (datetime.fromisoformat(cursor[0]), cursor[1]) if cursor else None
+    with Session(engine) as session:
+        while True:
+            query = (
+                select(Prediccion)
+                .where(Prediccion.riesgo_real.is_not(None))
+                .order_by(Prediccion.confirmado_at, Prediccion.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                query = query.where(tuple_(Prediccion.confirmado_at, Prediccion.id) > after)
+            bloque = session.exec(query).all()
+            if not bloque:
+                return
+            X = np.array([[getattr(p, col) for col in FEATURE_COLUMNS] for p in bloque], dtype=float)
+            y = [p.riesgo_real for p in bloque]
+            after = (bloque[-1].confirmado_at, bloque[-1].id)
+            yield X, y, [after[0].isoformat(), after[1]]
+            session.expunge_all()
+
+
+def actualizar_modelo_incremental(df=None) -> Dict:
+    """
+    Aplica partial_fit con las filas etiquetadas nuevas (predicciones confirmadas o
+    un DataFrame del ETL) y publica la nueva version si hubo datos.
+    """
+    model_bundle = get_model_bundle()
+    if df is not None:
+        batches = iter_frame_batches(df)
+    else:
+        batches = iter_resultados_confirmados((model_bundle.get("online") or {}).get("cursor"))
+
+    updated, filas = update_online_bundle(model_bundle, batches)
+    if filas == 0:
+        return {"filas": 0, "version": model_bundle.get("version")}
+    prequential = updated["online"]["prequential"]
+    if regresses(updated):
+        # El cursor no avanza: las filas se vuelven a usar en el proximo ciclo
+        print(f"⚠️ Actualizacion incremental descartada (F1 online {prequential['online']['f1_weighted']:.3f} "
+              f"< vigente {prequential['vigente']['f1_weighted']:.3f})")
+        return {"filas": filas, "version": model_bundle.get("version"), "publicada": False, "prequential": prequential}
+
+    version = save_version(updated)
+    swap_model_bundle(activate_version(version))
+    return {"filas": filas, "version": version, "publicada": True, "prequential": prequential}
+
+
+def lanzar_actualizacion_incremental(df=None) -> Dict:
+    """Encola una actualizacion incremental (una a la vez, en un hilo dedicado)."""
+    if df is None:
+        en_curso = find_active_job("actualizacion_incremental")
+        if en_curso:
+            return en_curso
+    return submit_job(
+        "actualizacion_incremental",
+        ONLINE_EXECUTOR,
+        actualizar_modelo_incremental,
+        df,
+        on_success=lambda _: {"modelo": get_model_report(MODEL_BUNDLE)},
+    )
 
 # ============================================
 # LIFESPAN (INICIO Y CIERRE DE LA APP)
@@ -74,31 +390,55 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"❌ Error al crear tablas en BD: {e}")
 
-    # 2. CARGAR O ENTRENAR MODELO ML
-    global MODEL_BUNDLE
-    MODEL_BUNDLE = load_or_train_model()
-    print("🧠 Modelo de IA cargado y listo.")
+    start_writer(engine)
+
+    # 2. CARGAR O ENTRENAR MODELO ML (en segundo plano; ver /ready)
+    READINESS.update(estado="calentando", import_seconds=round(time.perf_counter() - STARTED_AT, 3))
+    threading.Thread(target=calentar_modelo, name="warmup", daemon=True).start()
+    print(f"⚡ API aceptando conexiones en {READINESS['import_seconds']:.2f} s; calentando el modelo...")
+    if MODEL_RELOAD_SECONDS > 0:
+        MODEL_WATCH_STOP.clear()
+        threading.Thread(target=vigilar_modelo, name="model-watch", daemon=True).start()
 
     # 3. SCHEDULER (OPCIONAL)
     enable_auto_retrain = os.getenv("ENABLE_AUTO_RETRAIN", "false").lower() in {"1", "true", "yes"}
-    if enable_auto_retrain:
+    online_update_minutes = float(os.getenv("ONLINE_UPDATE_MINUTES", "0"))
+    if enable_auto_retrain or online_update_minutes > 0:
         global SCHEDULER
         SCHEDULER = BackgroundScheduler()
-        # Reentrenar el 1 de marzo y 1 de septiembre a las 02:00 UTC
-        SCHEDULER.add_job(
-            func=lambda: load_or_train_model(force_retrain=True),
-            trigger=CronTrigger(month="3,9", day=1, hour=2, minute=0),
-            name="auto-semester-retrain",
-            replace_existing=True,
-        )
+        if enable_auto_retrain:
+            # Reentrenar el 1 de marzo y 1 de septiembre a las 02:00 UTC
+            SCHEDULER.add_job(
+                func=lanzar_reentrenamiento,
+                trigger=CronTrigger(month="3,9", day=1, hour=2, minute=0),
+                name="auto-semester-retrain",
+                replace_existing=True,
+            )
+            print("⏰ Auto-retrain habilitado (semestral)")
+        if online_update_minutes > 0:
+            SCHEDULER.add_job(
+                func=lanzar_actualizacion_incremental,
+                trigger=IntervalTrigger(minutes=online_update_minutes),
+                name="online-update",
+                replace_existing=True,
+            )
+            print(f"⏰ Actualizacion incremental cada {online_update_minutes:g} min")
         SCHEDULER.start()
-        print("⏰ Auto-retrain habilitado (semestral)")
 
     yield  # <-- Aqui la aplicacion corre y recibe peticiones
 
     # 4. LIMPIEZA AL APAGAR
+    MODEL_WATCH_STOP.set()
+    stop_writer()  # confirmar las predicciones en cola antes de cerrar
     if SCHEDULER:
         SCHEDULER.shutdown(wait=False)
+    if TRAINING_EXECUTOR:
+        TRAINING_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    PDF_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    EXPORT_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    if EXPORT_POOL:
+        EXPORT_POOL.shutdown(wait=False, cancel_futures=True)
+    ONLINE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
     print("🛑 Apagando EduPredict Backend...")
 
 
@@ -123,7 +463,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
+
+
+def _model_metrics():
+    """Colector de /metrics: version, duracion y fases del entrenamiento vigente."""
+    model_bundle = MODEL_BUNDLE
+    if not model_bundle:
+        return []
+    lines = gauge_lines(
+        "edupredict_model_info",
+        "Modelo servido (valor 1; version y algoritmo en etiquetas)",
+        [({"version": model_bundle.get("version") or "", "best_model": model_bundle.get("best_model") or ""}, 1)],
+    )
+    if READINESS["time_to_ready_seconds"] is not None:
+        lines += gauge_lines(
+            "edupredict_time_to_ready_seconds",
+            "Segundos desde el import de la API hasta tener el modelo listo",
+            [({}, READINESS["time_to_ready_seconds"])],
+        )
+    if model_bundle.get("training_seconds") is not None:
+        lines += gauge_lines(
+            "edupredict_model_training_seconds",
+            "Duracion total del entrenamiento del modelo servido",
+            [({}, model_bundle["training_seconds"])],
+        )
+    lines += gauge_lines(
+        "edupredict_model_training_phase_seconds",
+        "Duracion por fase de train_models del modelo servido",
+        [({"phase": phase}, seconds) for phase, seconds in (model_bundle.get("training_phases") or {}).items()],
+    )
+    return lines
+
+
+def _cache_metrics():
+    usuarios, pdf, predicciones = user_cache_stats(), pdf_cache_stats(), prediction_cache_stats()
+    return gauge_lines(
+        "edupredict_cache_events",
+        "Aciertos y fallos acumulados de las caches en proceso",
+        [
+            ({"cache": "usuarios", "event": "hit"}, usuarios["hits"]),
+            ({"cache": "usuarios", "event": "miss"}, usuarios["misses"]),
+            ({"cache": "pdf", "event": "hit"}, pdf["hits"] + pdf["disk_hits"]),
+            ({"cache": "pdf", "event": "miss"}, pdf["misses"]),
+            ({"cache": "predicciones", "event": "hit"}, predicciones["hits"]),
+            ({"cache": "predicciones", "event": "miss"}, predicciones["misses"]),
+        ],
+    ) + gauge_lines(
+        "edupredict_cache_entries",
+        "Entradas actuales de las caches en proceso",
+        [
+            ({"cache": "usuarios"}, usuarios["size"]),
+            ({"cache": "pdf"}, pdf["entries"]),
+            ({"cache": "predicciones"}, predicciones["size"]),
+        ],
+    )
+
+
+def _write_behind_metrics():
+    stats = write_behind_stats()
+    return gauge_lines(
+        "edupredict_write_behind_rows",
+        "Predicciones del escritor diferido (confirmadas, descartadas y en cola)",
+        [
+            ({"state": "committed"}, stats["filas"]),
+            ({"state": "dropped"}, stats["descartadas"]),
+            ({"state": "queued"}, stats["en_cola"]),
+        ],
+    ) + gauge_lines(
+        "edupredict_write_behind_groups",
+        "Commits agrupados realizados por el escritor diferido",
+        [({}, stats["grupos"])],
+    )
+
+
+register_collector(_model_metrics)
+register_collector(_cache_metrics)
+register_collector(_write_behind_metrics)
 
 
 # ============================================
@@ -157,29 +575,50 @@ def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
+        user_id = payload.get("id")
     except Exception:
         raise HTTPException(status_code=401, detail="Token invalido")
 
-    usuario = session.exec(select(Usuario).where(Usuario.email == email)).first()
+    usuario = get_cached_user(email, user_id)
+    if usuario:
+        return usuario
+
+    if user_id is not None:
+        usuario = session.get(Usuario, user_id)
+        if usuario and usuario.email != email:
+            usuario = None
+    else:
+        usuario = session.exec(select(Usuario).where(Usuario.email == email)).first()
     if not usuario:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
+
+    cache_user(email, user_id, usuario)
     return usuario
 
 
+# Rangos validos por variable (en el orden de FEATURE_COLUMNS) y mensaje de error
+RANGOS_PAYLOAD = {
+    "promedio": (0, 10, "promedio debe estar entre 0 y 10"),
+    "asistencia": (0, 100, "asistencia debe estar entre 0 y 100"),
+    "horas_estudio": (0, 60, "horas_estudio debe estar entre 0 y 60"),
+    "tendencia": (-10, 10, "tendencia fuera de rango (-10 a 10)"),
+    "puntualidad": (0, 100, "puntualidad debe estar entre 0 y 100"),
+    "habitos": (0, 10, "habitos debe estar entre 0 y 10"),
+}
+
+
 def validar_payload(payload: dict):
     """Valida rangos numericos basicos de la peticion /predict."""
-    if not (0 <= payload["promedio"] <= 10):
-        raise HTTPException(status_code=400, detail="promedio debe estar entre 0 y 10")
-    if not (0 <= payload["asistencia"] <= 100):
-        raise HTTPException(status_code=400, detail="asistencia debe estar entre 0 y 100")
-    if not (0 <= payload["horas_estudio"] <= 60):
-        raise HTTPException(status_code=400, detail="horas_estudio debe estar entre 0 y 60")
-    if not (-10 <= payload["tendencia"] <= 10):
-        raise HTTPException(status_code=400, detail="tendencia fuera de rango (-10 a 10)")
-    if not (0 <= payload["puntualidad"] <= 100):
-        raise HTTPException(status_code=400, detail="puntualidad debe estar entre 0 y 100")
-    if not (0 <= payload["habitos"] <= 10):
-        raise HTTPException(status_code=400, detail="habitos debe estar entre 0 y 10")
+    for key, (minimo, maximo, mensaje) in RANGOS_PAYLOAD.items():
+        if not (minimo <= payload[key] <= maximo):
+            raise HTTPException(status_code=400, detail=mensaje)
+
+
+def validar_lote(X: np.ndarray) -> np.ndarray:
+    """Valida una matriz de payloads (columnas FEATURE_COLUMNS); retorna mascara de invalidos."""
+    minimos = np.array([RANGOS_PAYLOAD[key][0] for key in FEATURE_COLUMNS], dtype=float)
+    maximos = np.array([RANGOS_PAYLOAD[key][1] for key in FEATURE_COLUMNS], dtype=float)
+    return ~((X >= minimos) & (X <= maximos))
 
 
 # ============================================
@@ -245,6 +684,21 @@ def login(credentials: UsuarioLogin, session: Session = Depends(get_session)):
 # RUTAS - PREDICCIONES
 # ============================================
 
+def predecir_con_cache(model_bundle: Dict, payload: Dict) -> Tuple[Dict, List[str]]:
+    """Resultado del modelo y recomendaciones, desde la cache de predicciones si ya se calcularon."""
+    key = prediction_key(model_bundle, payload)
+    cached = get_cached_prediction(key)
+    if cached is not None:
+        return cached
+    ml_result = predict_with_model(model_bundle, payload, explain=True)
+    explicacion = ml_result.get("explicacion")
+    recomendaciones = generate_recommendations(
+        ml_result["riesgo"], payload, explicacion["factores"] if explicacion else None
+    )
+    cache_prediction(key, ml_result, recomendaciones)
+    return ml_result, recomendaciones
+
+
 @app.post("/api/predict", response_model=PrediccionResponse, tags=["Predicciones"])
 def crear_prediccion(
     prediccion: PrediccionCreate,
@@ -252,15 +706,13 @@ def crear_prediccion(
     usuario: Optional[Usuario] = Depends(get_current_user),
 ):
     """Crear nueva prediccion de rendimiento academico."""
-    global MODEL_BUNDLE
-    if not MODEL_BUNDLE:
-        MODEL_BUNDLE = load_or_train_model()
+    model_bundle = get_model_bundle()
 
     payload = normalize_payload(prediccion.dict())
     validar_payload(payload)
 
-    ml_result = predict_with_model(MODEL_BUNDLE, payload)
-    recomendaciones = generate_recommendations(ml_result["riesgo"], payload)
+    ml_result, recomendaciones = predecir_con_cache(model_bundle, payload)
+    explicacion = ml_result.get("explicacion")
 
     db_prediccion = Prediccion(
         usuario_id=prediccion.usuario_id or (usuario.id if usuario else None),
@@ -273,57 +725,330 @@ def crear_prediccion(
         riesgo=ml_result["riesgo"],
         score=ml_result["score"],
         recomendacion=" ".join(recomendaciones),
-        modelo=MODEL_BUNDLE.get("best_model"),
+        modelo=model_bundle.get("best_model"),
+        modelo_version=model_bundle.get("version"),
     )
 
-    session.add(db_prediccion)
-    session.commit()
-    session.refresh(db_prediccion)
-
-    pdf_url = f"/api/predictions/{db_prediccion.id}/pdf"
+    if write_behind_enabled():
+        # Commit agrupado o diferido (PREDICTION_WRITE_MODE, ver app/write_behind.py):
+        # validar antes de encolar, el escritor ya no puede responder al cliente
+        if db_prediccion.usuario_id is not None and session.get(Usuario, db_prediccion.usuario_id) is None:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        errores = insert_errors(session, db_prediccion)
+        if errores:
+            raise HTTPException(status_code=400, detail="; ".join(errores))
+        try:
+            guardada = persist_prediction(db_prediccion)
+        except Exception as exc:  # modo group: el commit del grupo fallo para esta fila
+            raise HTTPException(status_code=500, detail=f"No se pudo guardar la prediccion: {exc}") from exc
+    else:
+        session.add(db_prediccion)
+        session.commit()
+        session.refresh(db_prediccion)
+        guardada = db_prediccion.dict()
+
+    pdf_url = f"/api/predictions/{guardada['id']}/pdf"
     return {
-        **db_prediccion.dict(),
+        **guardada,
         "recomendaciones": recomendaciones,
         "pdf_url": pdf_url,
-        "alerta_docente": db_prediccion.riesgo == "alto",
+        "alerta_docente": guardada["riesgo"] == "alto",
         "probabilidades": ml_result.get("probabilidades", {}),
+        "explicacion": explicacion,
     }
 
 
-@app.get("/api/predictions/{prediccion_id}/pdf", tags=["Predicciones"])
-def descargar_pdf(prediccion_id: int, session: Session = Depends(get_session)):
-    """Genera y descarga el PDF de una prediccion."""
+@app.patch("/api/predictions/{prediccion_id}/resultado", response_model=PrediccionResponse, tags=["Predicciones"])
+def confirmar_resultado(
+    prediccion_id: int,
+    resultado: PrediccionResultado,
+    session: Session = Depends(get_session),
+    usuario: Optional[Usuario] = Depends(get_current_user),
+):
+    """Registra el riesgo real observado; alimenta la actualizacion incremental del modelo."""
+    if resultado.riesgo_real not in NIVELES_RIESGO:
+        raise HTTPException(status_code=400, detail="riesgo_real debe ser alto, medio o bajo")
     pred = session.get(Prediccion, prediccion_id)
     if not pred:
         raise HTTPException(status_code=404, detail="Prediccion no encontrada")
 
-    buffer = build_pdf_report(pred.dict(), MODEL_BUNDLE)
+    pred.riesgo_real = resultado.riesgo_real
+    pred.confirmado_at = datetime.utcnow()
+    session.add(pred)
+    session.commit()
+    session.refresh(pred)
+    return prediccion_publica(pred)
+
+
+@app.post("/api/predict/batch", response_model=PrediccionLoteResponse, tags=["Predicciones"])
+def crear_predicciones_lote(
+    lote: PrediccionLoteCreate,
+    session: Session = Depends(get_session),
+    usuario: Optional[Usuario] = Depends(get_current_user),
+):
+    """Crear predicciones en lote (una seccion completa) con inferencia vectorizada."""
+    model_bundle = get_model_bundle()
+
+    payloads = [normalize_payload(p.dict()) for p in lote.predicciones]
+    X = payloads_to_matrix(payloads)
+    invalidos = validar_lote(X)
+    filas_validas = np.flatnonzero(~invalidos.any(axis=1))
+
+    errores = [
+        {
+            "indice": int(i),
+            "errores": [RANGOS_PAYLOAD[FEATURE_COLUMNS[j]][2] for j in np.flatnonzero(invalidos[i])],
+        }
+        for i in np.flatnonzero(invalidos.any(axis=1))
+    ]
+
+    ml_results = predict_batch(model_bundle, X[filas_validas], explain=True)
+    usuario_default = usuario.id if usuario else None
+    modelo, modelo_version = model_bundle.get("best_model"), model_bundle.get("version")
+
+    db_predicciones = []
+    recomendaciones_lote = []
+    for i, ml_result in zip(filas_validas, ml_results):
+        payload = payloads[i]
+        explicacion = ml_result.get("explicacion")
+        recomendaciones = generate_recommendations(
+            ml_result["riesgo"], payload, explicacion["factores"] if explicacion else None
+        )
+        recomendaciones_lote.append(recomendaciones)
+        db_predicciones.append(
+            Prediccion(
+                usuario_id=lote.predicciones[i].usuario_id or usuario_default,
+                promedio=payload["promedio"],
+                asistencia=payload["asistencia"],
+                horas_estudio=payload["horas_estudio"],
+                tendencia=payload["tendencia"],
+                puntualidad=payload["puntualidad"],
+                habitos=payload["habitos"],
+                riesgo=ml_result["riesgo"],
+                score=ml_result["score"],
+                recomendacion=" ".join(recomendaciones),
+                modelo=modelo,
+                modelo_version=modelo_version,
+            )
+        )
+
+    # Insercion masiva: un solo flush obtiene todos los ids sin refresh por fila
+    session.add_all(db_predicciones)
+    session.flush()
+    predicciones = [
+        {
+            **p.dict(),
+            "recomendaciones": recomendaciones,
+            "pdf_url": f"/api/predictions/{p.id}/pdf",
+            "alerta_docente": p.riesgo == "alto",
+            "probabilidades": ml_result.get("probabilidades", {}),
+            "explicacion": ml_result.get("explicacion"),
+        }
+        for p, recomendaciones, ml_result in zip(db_predicciones, recomendaciones_lote, ml_results)
+    ]
+    session.commit()
+
+    return {
+        "total": len(payloads),
+        "procesadas": len(predicciones),
+        "predicciones": predicciones,
+        "errores": errores,
+    }
+
+
+@app.get("/api/predictions/{prediccion_id}/pdf", tags=["Predicciones"])
+def descargar_pdf(prediccion_id: int, session: Session = Depends(get_session)):
+    """Descarga el PDF de una prediccion (desde la cache si ya fue generado)."""
+    # Con escritura diferida la prediccion puede seguir en cola: su URL ya es valida
+    prediccion = pending_prediction(prediccion_id)
+    if prediccion is None:
+        pred = session.get(Prediccion, prediccion_id)
+        if not pred:
+            error = failed_prediction(prediccion_id)
+            if error:
+                raise HTTPException(status_code=410, detail=f"La prediccion no se pudo guardar: {error}")
+            raise HTTPException(status_code=404, detail="Prediccion no encontrada")
+        prediccion = pred.dict()
+
+    model_bundle = get_model_bundle()
     filename = f"reporte-prediccion-{prediccion_id}.pdf"
-    return StreamingResponse(
-        buffer,
+    return RawResponse(
+        content=get_or_build_pdf(prediccion, model_bundle),
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "ETag": f'"{report_cache_key(prediccion, model_bundle)}"',
+        },
+    )
+
+
+@app.get("/api/predictions/pdf/zip", tags=["Predicciones"])
+def descargar_pdfs_zip(
+    ids: List[int] = Query([], max_length=1000),
+    session: Session = Depends(get_session),
+):
+    """Descarga varios reportes PDF en un unico ZIP generado en streaming."""
+    if not ids:
+        raise HTTPException(status_code=400, detail="Indique al menos un id")
+    predicciones = session.exec(select(Prediccion).where(Prediccion.id.in_(ids))).all()
+    if not predicciones:
+        raise HTTPException(status_code=404, detail="Predicciones no encontradas")
+
+    orden = {id_: i for i, id_ in enumerate(ids)}
+    filas = sorted((p.dict() for p in predicciones), key=lambda p: orden[p["id"]])
+    return StreamingResponse(
+        iter_pdf_zip(filas, get_model_bundle(), PDF_EXECUTOR),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="reportes-predicciones.zip"'},
     )
 
 
+@app.post("/api/predictions/pdf/export", status_code=202, tags=["Predicciones"])
+def exportar_reportes(filtro: ExporteReportesCreate, session: Session = Depends(get_session)):
+    """
+    Lanza en segundo plano el exporte de los reportes PDF que cumplen el filtro
+    (un ZIP o un unico PDF de varias paginas); consultar el avance en
+    /api/predictions/pdf/export/{job_id} y descargar con .../download.
+    """
+    if filtro.formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {filtro.formato} (zip o pdf)")
+    invalidos = set(filtro.riesgo or []) - NIVELES_RIESGO
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Riesgo invalido: {', '.join(sorted(invalidos))}")
+    if filtro.desde and filtro.hasta and filtro.desde > filtro.hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior o igual a 'hasta'")
+
+    criterios = filtro.dict(exclude={"formato"})
+    total = session.exec(select(func.count()).select_from(export_query(**criterios).subquery())).one()
+    if total == 0:
+        raise HTTPException(status_code=404, detail="No hay predicciones que cumplan el filtro")
+    if total > EXPORT_MAX_REPORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El filtro incluye {total} reportes (maximo {EXPORT_MAX_REPORTS}); acotelo por fechas o riesgo",
+        )
+    return {"mensaje": f"Exporte de {total} reportes en curso", "job": lanzar_exporte(criterios, filtro.formato)}
+
+
+@app.get("/api/predictions/pdf/export/{job_id}", tags=["Predicciones"])
+def estado_exporte(job_id: str):
+    """Estado y avance (`progreso`) de un exporte de reportes."""
+    job = get_job(job_id)
+    if not job or job["tipo"] != "exporte_reportes":
+        raise HTTPException(status_code=404, detail="Exporte no encontrado")
+    return job
+
+
+@app.get("/api/predictions/pdf/export/{job_id}/download", tags=["Predicciones"])
+def descargar_exporte(job_id: str):
+    """Descarga el archivo de un exporte completado."""
+    job = estado_exporte(job_id)
+    if job["estado"] != "completado":
+        raise HTTPException(status_code=409, detail=f"El exporte aun no esta listo ({job['estado']})")
+    formato = job["resultado"]["formato"]
+    path = export_path(job_id, formato)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="El archivo del exporte ya expiro")
+    return FileResponse(path, media_type=FORMATOS[formato], filename=path.name)
+
+
+def prediccion_publica(p: Prediccion) -> dict:
+    """Serializa una prediccion con su URL de PDF y la alerta docente."""
+    return {**p.dict(), "pdf_url": f"/api/predictions/{p.id}/pdf", "alerta_docente": p.riesgo == "alto"}
+
+
+def encode_cursor(p: Prediccion) -> str:
+    """Cursor opaco con la clave de orden (created_at, id) de la ultima fila."""
+    raw = f"{p.created_at.isoformat()}|{p.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id_)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+
+
+def paginar_predicciones(session: Session, after=None, limit: int = 100) -> List[Prediccion]:
+    """Pagina por keyset sobre (created_at, id): coste constante en paginas profundas."""
+    query = select(Prediccion).order_by(Prediccion.created_at, Prediccion.id).limit(limit)
+    if after is not None:
+        query = query.where(tuple_(Prediccion.created_at, Prediccion.id) > after)
+    return session.exec(query).all()
+
+
+def iter_export(formato: str) -> Iterator[str]:
+    """Genera el export por bloques de EXPORT_CHUNK_SIZE filas (memoria constante)."""
+    columnas = list(Prediccion.__fields__) + ["pdf_url", "alerta_docente"]
+    if formato == "csv":
+        yield ",".join(columnas) + "\r\n"
+
+    with Session(engine) as session:
+        after = None
+        while True:
+            bloque = paginar_predicciones(session, after=after, limit=EXPORT_CHUNK_SIZE)
+            if not bloque:
+                break
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if formato == "csv" else None
+            for p in bloque:
+                fila = prediccion_publica(p)
+                fila["created_at"] = p.created_at.isoformat()
+                valores = [fila[c] for c in columnas]
+                if writer:
+                    writer.writerow(valores)
+                else:
+                    buffer.write(json.dumps(dict(zip(columnas, valores)), ensure_ascii=False) + "\n")
+            yield buffer.getvalue()
+
+            after = (bloque[-1].created_at, bloque[-1].id)
+            session.expunge_all()
+            if len(bloque) < EXPORT_CHUNK_SIZE:
+                break
+
+
 @app.get("/api/students", response_model=List[PrediccionResponse], tags=["Predicciones"])
-def listar_predicciones(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
-    """Listar todas las predicciones."""
-    predicciones = session.exec(select(Prediccion).offset(skip).limit(limit)).all()
-    return [
-        {**p.dict(), "pdf_url": f"/api/predictions/{p.id}/pdf", "alerta_docente": p.riesgo == "alto"}
-        for p in predicciones
-    ]
+def listar_predicciones(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Listar todas las predicciones ordenadas por (created_at, id).
+    Usar el header X-Next-Cursor como `cursor` para la siguiente pagina.
+    """
+    if cursor:
+        predicciones = paginar_predicciones(session, after=decode_cursor(cursor), limit=limit)
+    else:
+        query = select(Prediccion).order_by(Prediccion.created_at, Prediccion.id)
+        predicciones = session.exec(query.offset(skip).limit(limit)).all()
+
+    if len(predicciones) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(predicciones[-1])
+    return [prediccion_publica(p) for p in predicciones]
+
+
+@app.get("/api/students/export", tags=["Predicciones"])
+def exportar_predicciones(formato: Literal["ndjson", "csv"] = "ndjson"):
+    """Exporta todas las predicciones en streaming (NDJSON o CSV)."""
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    filename = f"predicciones.{formato}"
+    return StreamingResponse(
+        iter_export(formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @app.get("/api/students/{usuario_id}", response_model=List[PrediccionResponse], tags=["Predicciones"])
 def listar_predicciones_usuario(usuario_id: int, session: Session = Depends(get_session)):
     """Listar predicciones de un usuario especifico."""
     predicciones = session.exec(select(Prediccion).where(Prediccion.usuario_id == usuario_id)).all()
-    return [
-        {**p.dict(), "pdf_url": f"/api/predictions/{p.id}/pdf", "alerta_docente": p.riesgo == "alto"}
-        for p in predicciones
-    ]
+    return [prediccion_publica(p) for p in predicciones]
 
 
 @app.get("/api/students/me/predicciones", response_model=List[PrediccionResponse], tags=["Predicciones"])
@@ -333,10 +1058,7 @@ def listar_predicciones_me(
 ):
     """Historial de predicciones del usuario autenticado."""
     predicciones = session.exec(select(Prediccion).where(Prediccion.usuario_id == usuario.id)).all()
-    return [
-        {**p.dict(), "pdf_url": f"/api/predictions/{p.id}/pdf", "alerta_docente": p.riesgo == "alto"}
-        for p in predicciones
-    ]
+    return [prediccion_publica(p) for p in predicciones]
 
 
 # ============================================
@@ -345,29 +1067,44 @@ def listar_predicciones_me(
 
 @app.get("/api/stats", tags=["Estadisticas"])
 def obtener_estadisticas(session: Session = Depends(get_session)):
-    """Estadisticas generales del sistema + distribucion de riesgo para dashboard."""
-    total_usuarios = len(session.exec(select(Usuario)).all())
-    predicciones = session.exec(select(Prediccion)).all()
-    total_predicciones = len(predicciones)
-    riesgo_alto = sum(1 for p in predicciones if p.riesgo == "alto")
-    riesgo_medio = sum(1 for p in predicciones if p.riesgo == "medio")
-    riesgo_bajo = sum(1 for p in predicciones if p.riesgo == "bajo")
-    avg_score = sum(p.score for p in predicciones) / total_predicciones if predicciones else 0
-
-    alerta_temprana = [p for p in predicciones if p.riesgo == "alto"]
-
+    """
+    Estadisticas generales del sistema + distribucion de riesgo para dashboard.
+    Lee la fila de `resumen_estadisticas` (costo constante, ver app/stats_summary.py).
+    """
     return {
-        "total_usuarios": total_usuarios,
-        "total_predicciones": total_predicciones,
-        "riesgo_alto": riesgo_alto,
-        "riesgo_medio": riesgo_medio,
-        "riesgo_bajo": riesgo_bajo,
-        "score_promedio": round(avg_score, 2),
-        "alertas_tempranas": len(alerta_temprana),
+        **summary_dict(read_summary(session)),
         "modelo": get_model_report(MODEL_BUNDLE),
     }
 
 
+@app.get("/api/stats/trend", tags=["Estadisticas"])
+def tendencia_riesgo(
+    bucket: Literal["day", "week", "month"] = "week",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    modelo: Optional[str] = None,
+    version: Optional[str] = None,
+    max_puntos: int = Query(TREND_MAX_POINTS, ge=1, le=1000),
+    session: Session = Depends(get_session),
+):
+    """
+    Evolucion de la mezcla de riesgo por dia, semana o mes (por defecto los ultimos 90 dias).
+    Se sirve desde `resumen_diario`; los rangos con mas de `max_puntos` buckets se agrupan.
+    `modelo` filtra por algoritmo (p. ej. random_forest) y `version` por version del registro.
+    El rango admite hasta TREND_MAX_DAYS dias.
+    """
+    hasta = hasta or datetime.utcnow().date()
+    try:
+        desde = desde or hasta - timedelta(days=89)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="'hasta' fuera del rango de fechas soportado")
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior o igual a 'hasta'")
+    if (hasta - desde).days + 1 > TREND_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango supera {TREND_MAX_DAYS} dias; acotelo")
+    return trend(session, bucket, desde, hasta, modelo=modelo, version=version, max_points=max_puntos)
+
+
 @app.get("/api/model/metrics", tags=["Estadisticas"])
 def metricas_modelo():
     """Metadatos del modelo entrenado."""
@@ -376,27 +1113,82 @@ def metricas_modelo():
     return get_model_report(MODEL_BUNDLE)
 
 
-@app.post("/api/model/retrain", tags=["Estadisticas"])
-def reentrenar_modelo(usuario: Optional[Usuario] = Depends(get_current_user)):
-    """Reentrena el modelo con los datos disponibles."""
-    global MODEL_BUNDLE
-    MODEL_BUNDLE = load_or_train_model(force_retrain=True)
+@app.post("/api/model/retrain", status_code=202, tags=["Estadisticas"])
+def reentrenar_modelo(tune: bool = False, usuario: Optional[Usuario] = Depends(get_current_user)):
+    """
+    Lanza el reentrenamiento en segundo plano; consultar /api/model/jobs/{id}.
+    Con `tune=true` busca hiperparametros (TUNE_BUDGET_SECONDS); si no, reutiliza
+    los de la ultima busqueda.
+    """
+    job = lanzar_reentrenamiento(tune=tune)
     return {
-        "message": "Modelo reentrenado",
-        "modelo": get_model_report(MODEL_BUNDLE),
+        "message": "Reentrenamiento en curso",
+        "job": job,
+    }
+
+
+@app.post("/api/model/online-update", status_code=202, tags=["Estadisticas"])
+def actualizar_modelo_online(usuario: Optional[Usuario] = Depends(get_current_user)):
+    """Lanza una actualizacion incremental (partial_fit) con los resultados confirmados nuevos."""
+    job = lanzar_actualizacion_incremental()
+    return {
+        "message": "Actualizacion incremental en curso",
+        "job": job,
     }
 
 
-@app.post("/api/etl/import", tags=["Estadisticas"])
+@app.get("/api/model/jobs/{job_id}", tags=["Estadisticas"])
+def estado_trabajo(job_id: str):
+    """Estado de un trabajo en segundo plano (pendiente, en_curso, completado, fallido)."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+
+@app.get("/api/model/versions", tags=["Estadisticas"])
+def versiones_modelo():
+    """Versiones registradas del modelo y version activa."""
+    return list_versions()
+
+
+@app.post("/api/model/rollback", tags=["Estadisticas"])
+def rollback_modelo(
+    version: Optional[str] = None,
+    usuario: Optional[Usuario] = Depends(get_current_user),
+):
+    """Vuelve a la version anterior del modelo (o a la indicada)."""
+    version = version or previous_version()
+    if not version:
+        raise HTTPException(status_code=409, detail="No hay una version anterior del modelo")
+    try:
+        model_bundle = activate_version(version)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+    swap_model_bundle(model_bundle)
+    return {
+        "message": f"Modelo restaurado a la version {version}",
+        "modelo": get_model_report(model_bundle),
+    }
+
+
+@app.post("/api/etl/import", status_code=202, tags=["Estadisticas"])
 def importar_datos_institucionales(
     notas_csv: Optional[str] = None,
     asistencia_csv: Optional[str] = None,
     actividades_csv: Optional[str] = None,
     materias_csv: Optional[str] = None,
     use_db: bool = False,
+    streaming: bool = False,
+    incremental: bool = False,
     usuario: Optional[Usuario] = Depends(get_current_user),
 ):
-    """Importa datos institucionales y reentrena."""
+    """
+    Importa datos institucionales y reentrena en segundo plano.
+    Con `streaming=true` los archivos (CSV o Parquet) se leen por bloques y se unen por estudiante.
+    Con `incremental=true` las filas etiquetadas actualizan el modelo con partial_fit.
+    """
     csv_config = {
         "notas": notas_csv,
         "asistencia": asistencia_csv,
@@ -404,18 +1196,22 @@ def importar_datos_institucionales(
         "materias": materias_csv,
     }
 
-    df = build_training_dataset(csv_config=csv_config, use_db=use_db)
+    from .etl.institucional import build_training_dataset  # pandas al primer import
+
+    df = build_training_dataset(csv_config=csv_config, use_db=use_db, streaming=streaming)
     if df.empty:
         raise HTTPException(status_code=400, detail="No se pudieron importar datos institucionales")
 
-    from .ml.train_models import train_models
-
-    global MODEL_BUNDLE
-    MODEL_BUNDLE = train_models(df=df)
+    if incremental:
+        if "riesgo" not in df.columns:
+            raise HTTPException(status_code=400, detail="La actualizacion incremental requiere la columna riesgo")
+        job = lanzar_actualizacion_incremental(df.dropna(subset=["riesgo"]))
+    else:
+        job = lanzar_reentrenamiento(df)
     return {
-        "message": "Datos importados y modelo reentrenado",
+        "message": "Datos importados; reentrenamiento en curso",
         "registros": len(df),
-        "modelo": get_model_report(MODEL_BUNDLE),
+        "job": job,
     }
 
 
@@ -432,6 +1228,30 @@ def root():
     }
 
 
+@app.get("/api/cache/stats", tags=["General"])
+def estadisticas_cache():
+    """Contadores de las caches en proceso (usuarios autenticados, PDFs y predicciones)."""
+    return {
+        "usuarios": user_cache_stats(),
+        "pdf": pdf_cache_stats(),
+        "predicciones": prediction_cache_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["General"])
+def metrics():
+    """Metricas en formato de exposicion de texto de Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health", tags=["General"])
 def health_check():
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
\ No newline at end of file
+    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+
+
+@app.get("/ready", tags=["General"])
+def readiness_check(response: Response):
+    """Listo para trafico: modelo cargado y prediccion de calentamiento ejecutada (503 si no)."""
+    if READINESS["estado"] != "listo":
+        response.status_code = 503
+    return {"status": "ready" if READINESS["estado"] == "listo" else "not_ready", **READINESS}
\ No newline at end of file
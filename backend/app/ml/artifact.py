@@ -0,0 +1,272 @@
+"""Artefacto del modelo mapeable en memoria (compartido entre workers de uvicorn).
+
+`joblib.load` deja en cada worker una copia privada del modelo (250 arboles del
+Random Forest, matriz de KNN...). Este artefacto guarda la ruta compilada
+(`inference.py`) como arrays NumPy alineados dentro de un unico archivo que se abre
+con `np.memmap` en solo lectura: los workers comparten las paginas via el page cache
+del sistema operativo.
+
+Formato (`model.mmap`, junto a `model.pkl`):
+    MAGIC (8 bytes) | version de formato (uint32) | reservado (uint32)
+    | largo del header (uint64) | header JSON | arrays alineados a 64 bytes
+
+El header registra la version de formato, el sha256 de la zona de arrays, el sha256
+del `model.pkl` de origen y los metadatos del bundle. Si el formato o el checksum no
+coinciden la carga falla de inmediato (`ArtifactError`); se regenera con:
+    python -m app.ml.artifact
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+
+from .constants import MODEL_PATH
+from .fileops import atomic_write, model_lock
+from .inference import build_kernel, get_compiled
+
+ARTIFACT_FORMAT_VERSION = 1
+MAGIC = b"EDUPMMAP"
+_PREFIX = struct.Struct("<8sIIQ")
+_ALIGN = 64
+MODEL_ARTIFACT_ENABLED = os.getenv("MODEL_ARTIFACT", "true").lower() in {"1", "true", "yes"}
+
+# Claves del bundle que no van al header (objetos o estado de proceso)
+_RUNTIME_KEYS = {"model", "compiled", "artifact"}
+
+
+class ArtifactError(RuntimeError):
+    """Artefacto invalido: formato distinto, checksum incorrecto o archivo danado."""
+
+
+def artifact_path(model_path: Path = MODEL_PATH) -> Path:
+    return model_path.with_suffix(".mmap")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _pad(size: int) -> int:
+    return -size % _ALIGN
+
+
+def export_arrays(model_bundle: Dict) -> Optional[Dict]:
+    """Header y arrays del artefacto, o None si el modelo no se puede reducir a arrays."""
+    compiled = get_compiled(model_bundle)
+    if compiled is None:
+        return None
+    kernel = build_kernel(compiled["estimator"])
+    if kernel is None:
+        return None
+    kernel_meta, kernel_arrays = kernel
+
+    arrays = {
+        "columns": np.asarray(compiled["columns"], dtype=np.int64),
+        "offset": compiled["offset"],
+        "factor": compiled["factor"],
+        **{f"kernel.{name}": array for name, array in kernel_arrays.items()},
+    }
+    header = {
+        "bundle": _json_safe({k: v for k, v in model_bundle.items() if k not in _RUNTIME_KEYS}),
+        "compiled": {
+            "feature_order": compiled["feature_order"],
+            "selected": compiled["selected"],
+            "minmax": compiled["minmax"],
+            "classes": compiled["classes"],
+            "kernel": kernel_meta,
+        },
+    }
+    return {"header": header, "arrays": arrays}
+
+
+def write_artifact(model_bundle: Dict, path: Path, source_sha256: Optional[str] = None) -> bool:
+    """Escribe el artefacto con reemplazo atomico. Retorna False si el modelo no es exportable."""
+    exported = export_arrays(model_bundle)
+    if exported is None:
+        return False
+
+    header = exported["header"]
+    table, payload, position = {}, hashlib.sha256(), 0
+    blobs = []
+    for name, array in exported["arrays"].items():
+        data = np.ascontiguousarray(array).tobytes()
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        blobs.append(data + b"\0" * _pad(len(data)))
+        position += len(blobs[-1])
+    for blob in blobs:
+        payload.update(blob)
+    header.update(
+        format_version=ARTIFACT_FORMAT_VERSION,
+        source_sha256=source_sha256,
+        payload_sha256=payload.hexdigest(),
+        payload_bytes=position,
+        arrays=table,
+    )
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * _pad(_PREFIX.size + len(header_bytes))
+
+    def _write(fh) -> None:
+        fh.write(_PREFIX.pack(MAGIC, ARTIFACT_FORMAT_VERSION, 0, len(header_bytes)))
+        fh.write(header_bytes)
+        for blob in blobs:
+            fh.write(blob)
+
+    atomic_write(path, _write)
+    return True
+
+
+def read_header(path: Path) -> Dict:
+    """Header del artefacto; falla si el archivo no es un artefacto o su formato no coincide."""
+    with open(path, "rb") as fh:
+        prefix = fh.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise ArtifactError(f"Artefacto truncado: {path}")
+        magic, version, _, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ArtifactError(f"No es un artefacto de modelo: {path}")
+        if version != ARTIFACT_FORMAT_VERSION:
+            raise ArtifactError(
+                f"Formato de artefacto {version} en {path}; se esperaba {ARTIFACT_FORMAT_VERSION}. "
+                "Regenerar con `python -m app.ml.artifact`."
+            )
+        header = json.loads(fh.read(header_len))
+    header["payload_start"] = _PREFIX.size + header_len
+    return header
+
+
+def load_artifact(path: Path, verify: bool = True) -> Dict:
+    """
+    Bundle servido desde el artefacto: los arrays son vistas de solo lectura sobre
+    un `np.memmap` (sin copia). Con `verify` se comprueba el sha256 de los arrays.
+    """
+    header = read_header(path)
+    start = header["payload_start"]
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(mapped) < start + header["payload_bytes"]:
+        raise ArtifactError(f"Artefacto truncado: {path}")
+    if verify and hashlib.sha256(mapped[start:start + header["payload_bytes"]]).hexdigest() != header["payload_sha256"]:
+        raise ArtifactError(f"Checksum invalido en {path}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        arrays[name] = np.ndarray(
+            tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=mapped, offset=start + spec["offset"]
+        )
+
+    meta = header["compiled"]
+    kernel = {**meta["kernel"]}
+    kernel.update({name[len("kernel."):]: array for name, array in arrays.items() if name.startswith("kernel.")})
+    compiled = {
+        "feature_order": meta["feature_order"],
+        "columns": arrays["columns"],
+        "selected": meta["selected"],
+        "offset": arrays["offset"],
+        "factor": arrays["factor"],
+        "minmax": meta["minmax"],
+        "classes": meta["classes"],
+        "estimator": None,
+        "kernel": kernel,
+    }
+    return {
+        **header["bundle"],
+        "compiled": compiled,
+        "artifact": {
+            "path": str(path),
+            "format_version": header["format_version"],
+            "source_sha256": header["source_sha256"],
+            "bytes": int(len(mapped)),
+        },
+    }
+
+
+def publish_artifact(model_bundle: Dict, model_path: Path = MODEL_PATH, source_sha256: Optional[str] = None) -> Dict:
+    """
+    Genera el artefacto del `model.pkl` recien escrito y retorna el bundle servido
+    desde el. Si el modelo no es exportable (o no se puede escribir) retorna el mismo bundle.
+    """
+    if not MODEL_ARTIFACT_ENABLED:
+        return model_bundle
+    path = artifact_path(model_path)
+    try:
+        source_sha256 = source_sha256 or file_sha256(model_path)
+        if not write_artifact(model_bundle, path, source_sha256):
+            path.unlink(missing_ok=True)
+            return model_bundle
+    except OSError as exc:
+        print(f"⚠️ No se pudo escribir el artefacto mmap ({exc}); se sirve desde el pickle")
+        return model_bundle
+    return load_artifact(path)
+
+
+def load_serving_bundle(model_path: Path = MODEL_PATH) -> Dict:
+    """
+    Bundle para servir predicciones: el artefacto mmap si corresponde al `model.pkl`
+    vigente; si falta o quedo viejo (otro modelo publicado) se regenera desde el pickle
+    bajo el lock del modelo (un solo worker lo escribe, el resto lo reutiliza).
+    """
+    if not MODEL_ARTIFACT_ENABLED:
+        return joblib.load(model_path)
+    path = artifact_path(model_path)
+    if path.exists() and read_header(path).get("source_sha256") == file_sha256(model_path):
+        return load_artifact(path)
+    with model_lock(model_path):
+        source_sha256 = file_sha256(model_path)
+        if path.exists() and read_header(path).get("source_sha256") == source_sha256:
+            return load_artifact(path)
+        return publish_artifact(joblib.load(model_path), model_path, source_sha256)
+
+
+def load_pipeline(model_bundle: Dict):
+    """Pipeline de scikit-learn del bundle (desde el `model.pkl` de origen si se sirve del artefacto)."""
+    if model_bundle.get("model") is not None:
+        return model_bundle["model"]
+    artifact = model_bundle["artifact"]
+    source = Path(artifact["path"]).with_suffix(".pkl")
+    if file_sha256(source) != artifact["source_sha256"]:
+        raise ArtifactError(f"{source} ya no corresponde al artefacto servido")
+    return joblib.load(source)["model"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenera el artefacto mmap desde model.pkl")
+    parser.add_argument("--model-path", type=Path, default=MODEL_PATH)
+    args = parser.parse_args()
+
+    path = artifact_path(args.model_path)
+    bundle = publish_artifact(joblib.load(args.model_path), args.model_path)
+    if "artifact" in bundle:
+        print(f"Artefacto escrito en {path} ({bundle['artifact']['bytes']} bytes)")
+    else:
+        print(f"El modelo {bundle.get('best_model')} no se puede exportar a arrays; se sirve desde el pickle")
+
+
+if __name__ == "__main__":
+    main()
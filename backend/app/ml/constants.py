@@ -0,0 +1,17 @@
+"""Constantes del paquete ML, importables sin pandas ni scikit-learn (arranque rapido)."""
+
+from pathlib import Path
+from typing import List
+
+# Caracteristicas esperadas por el pipeline
+FEATURE_COLUMNS: List[str] = [
+    "promedio",
+    "asistencia",
+    "horas_estudio",
+    "tendencia",
+    "puntualidad",
+    "habitos",
+]
+
+# Artefacto del modelo activo
+MODEL_PATH = Path(__file__).resolve().parent / "model.pkl"
@@ -0,0 +1,108 @@
+"""Escritura atomica y lock entre procesos para los artefactos del modelo.
+
+Con `uvicorn --workers N` cada worker es un proceso: el lock sobre `model.lock`
+(junto a `model.pkl`) garantiza que un solo proceso entrene o publique a la vez y
+que los demas esperen y carguen el resultado. Los archivos se escriben en un
+temporal del mismo directorio y se renombran (os.replace), de modo que un lector
+nunca ve un archivo a medio escribir.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from .constants import MODEL_PATH
+
+try:  # POSIX
+    import fcntl
+
+    def _try_lock(fh) -> None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(fh) -> None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _try_lock(fh) -> None:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(fh) -> None:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+MODEL_LOCK_TIMEOUT = float(os.getenv("MODEL_LOCK_TIMEOUT", "1800"))  # segundos
+
+_held = threading.local()
+
+
+def atomic_write(path: Path, writer) -> None:
+    """Escribe en un temporal del mismo directorio y lo renombra sobre `path`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            writer(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path, timeout: Optional[float] = None, poll: float = 0.1):
+    """
+    Lock exclusivo entre procesos sobre `path`. Reentrante dentro del mismo hilo;
+    otros hilos y procesos esperan. Lanza TimeoutError si no se obtiene en `timeout`.
+    """
+    key = str(Path(path).resolve())
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = set()
+    if key in held:
+        yield
+        return
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with open(path, "a+b") as fh:
+        while True:
+            try:
+                _try_lock(fh)
+                break
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"No se obtuvo el lock {path} en {timeout:g} s")
+                time.sleep(poll)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            _unlock(fh)
+
+
+def model_lock(model_path: Path = MODEL_PATH, timeout: Optional[float] = MODEL_LOCK_TIMEOUT):
+    """Lock del modelo activo (`model.lock`): entrenar, publicar o regenerar el artefacto."""
+    return file_lock(model_path.with_suffix(".lock"), timeout=timeout)
+
+
+def training_lock(model_path: Path = MODEL_PATH, timeout: Optional[float] = MODEL_LOCK_TIMEOUT):
+    """Lock de reentrenamiento (`model.train.lock`): un entrenamiento a la vez entre workers.
+
+    Es distinto del lock del modelo para que publicar o hacer rollback no espere
+    a que termine un entrenamiento en curso.
+    """
+    return file_lock(model_path.with_suffix(".train.lock"), timeout=timeout)
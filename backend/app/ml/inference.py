@@ -0,0 +1,348 @@
+"""Ruta de inferencia compilada: el Pipeline entrenado reducido a arrays NumPy.
+
+El Pipeline de `train_models._build_pipeline` (scaler -> SelectKBest -> modelo) se
+reduce al cargar el bundle a:
+- indices de las columnas seleccionadas por SelectKBest,
+- media/escala del scaler restringidas a esas columnas,
+- el estimador final (que se entreno sobre arrays, sin nombres de columnas).
+
+Asi una prediccion evita construir un DataFrame y recorre el pipeline una sola vez
+(`predict_proba` + argmax en lugar de `predict` y `predict_proba`).
+
+Explicaciones (`compiled_explain`): contribucion de cada variable seleccionada a la
+clase predicha. En modelos lineales es coeficiente x entrada escalada (en logits);
+en arboles y bosques es la contribucion por camino (Saabas): al construir el kernel
+se precalcula, por nodo, la suma de los cambios de probabilidad de cada variable
+desde la raiz, asi explicar cuesta lo mismo que predecir (una hoja por arbol).
+
+El estimador final tambien puede reducirse a un "kernel" de arrays planos
+(`build_kernel`): coeficientes lineales, nodos de todos los arboles concatenados o la
+matriz de entrenamiento de KNN. Es lo que se guarda en el artefacto mapeable en
+memoria (`artifact.py`) y se evalua con NumPy, sin objetos de scikit-learn.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .constants import FEATURE_COLUMNS
+
+_local = threading.local()
+
+
+def compile_pipeline(pipeline, feature_order: List[str] = FEATURE_COLUMNS) -> Optional[Dict]:
+    """
+    Reduce un Pipeline scaler/selector/modelo ya entrenado a arrays NumPy.
+    Retorna None si el pipeline no tiene la forma esperada (se usa la ruta pandas).
+    """
+    # Se compila despues de deserializar el bundle: scikit-learn ya esta cargado
+    from sklearn.feature_selection import SelectKBest
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+    if not isinstance(pipeline, Pipeline) or list(pipeline.named_steps) != ["scaler", "selector", "model"]:
+        return None
+
+    scaler = pipeline.named_steps["scaler"]
+    selector = pipeline.named_steps["selector"]
+    estimator = pipeline.named_steps["model"]
+    if not isinstance(selector, SelectKBest) or not hasattr(estimator, "predict_proba"):
+        return None
+
+    n_features = len(feature_order)
+    if isinstance(scaler, StandardScaler):
+        # (x - mean) / scale, igual que StandardScaler.transform
+        minmax = False
+        offset = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        factor = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    elif isinstance(scaler, MinMaxScaler) and not scaler.clip:
+        # x * scale + min, igual que MinMaxScaler.transform
+        minmax = True
+        offset = scaler.min_
+        factor = scaler.scale_
+    else:
+        return None
+
+    columns = np.flatnonzero(selector.get_support())
+    return {
+        "feature_order": list(feature_order),
+        "columns": columns,
+        "selected": [feature_order[i] for i in columns],
+        "offset": np.ascontiguousarray(offset[columns], dtype=float),
+        "factor": np.ascontiguousarray(factor[columns], dtype=float),
+        "minmax": minmax,
+        "estimator": estimator,
+        "classes": [str(cls) for cls in estimator.classes_],
+    }
+
+
+def _transform_inplace(compiled: Dict, X: np.ndarray) -> np.ndarray:
+    if compiled["minmax"]:
+        X *= compiled["factor"]
+        X += compiled["offset"]
+    else:
+        X -= compiled["offset"]
+        X /= compiled["factor"]
+    return X
+
+
+KERNEL_BLOCK_ROWS = 2048  # filas por bloque al evaluar arboles/KNN (memoria acotada)
+
+
+def build_kernel(estimator) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """
+    Reduce el estimador final a (meta, arrays) evaluables con `kernel_predict_proba`.
+    Retorna None si el tipo de estimador no esta soportado.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    classes = [str(cls) for cls in estimator.classes_]
+    if isinstance(estimator, (LogisticRegression, SGDClassifier)):
+        if isinstance(estimator, SGDClassifier) and estimator.loss != "log_loss":
+            return None
+        # LogisticRegression (lbfgs) es multinomial; SGD(log_loss) normaliza uno-contra-resto
+        softmax = isinstance(estimator, LogisticRegression) and estimator.solver != "liblinear"
+        meta = {"kind": "linear", "link": "softmax" if softmax else "ovr", "classes": classes}
+        return meta, {
+            "coef": np.ascontiguousarray(estimator.coef_, dtype=float),
+            "intercept": np.ascontiguousarray(estimator.intercept_, dtype=float),
+        }
+
+    if isinstance(estimator, (DecisionTreeClassifier, RandomForestClassifier)):
+        trees = estimator.estimators_ if isinstance(estimator, RandomForestClassifier) else [estimator]
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in (t.tree_ for t in trees):
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            # Las hojas apuntan a si mismas: recorrer `depth` pasos deja cada fila en su hoja
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            proba = tree.value[:, 0, :].astype(float)
+            totals = proba.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            value.append(proba / totals)
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+        meta = {"kind": "trees", "depth": int(depth), "classes": classes}
+        arrays = {
+            "left": np.concatenate(left).astype(np.int32),
+            "right": np.concatenate(right).astype(np.int32),
+            "feature": np.concatenate(feature).astype(np.int32),
+            "threshold": np.concatenate(threshold).astype(float),
+            "value": np.concatenate(value),
+            "roots": np.asarray(roots, dtype=np.int32),
+        }
+        arrays["contrib"] = path_contributions(arrays, int(estimator.n_features_in_))
+        return meta, arrays
+
+    if isinstance(estimator, KNeighborsClassifier):
+        if estimator.effective_metric_ != "euclidean" or estimator.weights not in {"uniform", "distance"}:
+            return None
+        meta = {
+            "kind": "knn",
+            "n_neighbors": int(estimator.n_neighbors),
+            "weights": estimator.weights,
+            "classes": classes,
+        }
+        return meta, {
+            "fit_X": np.ascontiguousarray(estimator._fit_X, dtype=float),
+            "fit_y": np.ascontiguousarray(estimator._y, dtype=np.int32),
+        }
+    return None
+
+
+def _linear_proba(kernel: Dict, X: np.ndarray) -> np.ndarray:
+    scores = X @ kernel["coef"].T + kernel["intercept"]
+    if scores.shape[1] == 1:
+        positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+        return np.column_stack([1.0 - positive, positive])
+    if kernel["link"] == "softmax":
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    else:
+        scores = 1.0 / (1.0 + np.exp(-scores))
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+def path_contributions(kernel: Dict, n_features: int) -> np.ndarray:
+    """
+    Por clase y nodo (clases x nodos x variables): suma, desde la raiz, del cambio
+    de probabilidad en cada division atribuido a la variable que divide. En una
+    hoja, valor de la raiz + contribuciones = probabilidad de la hoja.
+    """
+    left, right, feature, value = kernel["left"], kernel["right"], kernel["feature"], kernel["value"]
+    contrib = np.zeros((len(value), n_features, value.shape[1]), dtype=np.float32)
+    frontier = np.asarray(kernel["roots"])
+    while frontier.size:
+        internal = frontier[left[frontier] != frontier]
+        for child in (left[internal], right[internal]):
+            contrib[child] = contrib[internal]
+            contrib[child, feature[internal]] += value[child] - value[internal]
+        frontier = np.concatenate([left[internal], right[internal]])
+    # Por clase y nodo las variables quedan contiguas: explicar es un solo `take`
+    return np.ascontiguousarray(contrib.transpose(2, 0, 1))
+
+
+def _tree_leaves(kernel: Dict, X: np.ndarray) -> np.ndarray:
+    """Hoja de cada fila en cada arbol (filas x arboles)."""
+    # Los arboles de scikit-learn comparan en float32 contra umbrales float64
+    X32 = X.astype(np.float32)
+    rows = np.arange(len(X))[:, None]
+    nodes = np.broadcast_to(kernel["roots"], (len(X), len(kernel["roots"])))
+    for _ in range(kernel["depth"]):
+        go_left = X32[rows, kernel["feature"][nodes]] <= kernel["threshold"][nodes]
+        nodes = np.where(go_left, kernel["left"][nodes], kernel["right"][nodes])
+    return nodes
+
+
+def _trees_proba(kernel: Dict, X: np.ndarray) -> np.ndarray:
+    return kernel["value"][_tree_leaves(kernel, X)].mean(axis=1)
+
+
+def _knn_proba(kernel: Dict, X: np.ndarray) -> np.ndarray:
+    fit_X, fit_y, k = kernel["fit_X"], kernel["fit_y"], kernel["n_neighbors"]
+    # Candidatos con la expansion |a-b|^2; distancias exactas solo para los k vecinos
+    d2 = (X * X).sum(axis=1)[:, None] - 2.0 * X @ fit_X.T + (fit_X * fit_X).sum(axis=1)
+    neighbors = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    dist = np.sqrt(((X[:, None, :] - fit_X[neighbors]) ** 2).sum(axis=2))
+    if kernel["weights"] == "distance":
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / dist
+        exact = np.isinf(weights)
+        exact_rows = exact.any(axis=1)
+        weights[exact_rows] = exact[exact_rows]
+    else:
+        weights = np.ones_like(dist)
+    proba = np.zeros((len(X), len(kernel["classes"])))
+    np.add.at(proba, (np.arange(len(X))[:, None], fit_y[neighbors]), weights)
+    totals = proba.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    return proba / totals
+
+
+_KERNELS = {"linear": _linear_proba, "trees": _trees_proba, "knn": _knn_proba}
+
+
+def kernel_predict_proba(kernel: Dict, X: np.ndarray) -> np.ndarray:
+    """Probabilidades del kernel sobre filas ya escaladas y seleccionadas."""
+    fn = _KERNELS[kernel["kind"]]
+    if len(X) <= KERNEL_BLOCK_ROWS:
+        return fn(kernel, X)
+    return np.concatenate(
+        [fn(kernel, X[start:start + KERNEL_BLOCK_ROWS]) for start in range(0, len(X), KERNEL_BLOCK_ROWS)]
+    )
+
+
+def _linear_explain(kernel: Dict, X: np.ndarray):
+    proba = _linear_proba(kernel, X)
+    labels = proba.argmax(axis=1)
+    coef, intercept = kernel["coef"], kernel["intercept"]
+    if coef.shape[0] == 1:  # binario: un solo logit a favor de la clase positiva
+        coef, intercept = np.vstack([-coef, coef]), np.concatenate([-intercept, intercept])
+    else:
+        # Logit relativo: clase k frente a la media de las demas (el logit absoluto
+        # de softmax no dice si la variable favorece a k sobre las otras clases)
+        n = coef.shape[0]
+        coef = (n * coef - coef.sum(axis=0)) / (n - 1)
+        intercept = (n * intercept - intercept.sum()) / (n - 1)
+    return proba, X * coef[labels], intercept[labels]
+
+
+def _trees_explain(kernel: Dict, X: np.ndarray):
+    estimator = kernel.get("estimator")
+    if estimator is not None:  # modelo en memoria: hojas con el recorrido en C de scikit-learn
+        leaves = estimator.apply(X).reshape(len(X), -1) + kernel["roots"]
+    else:
+        leaves = _tree_leaves(kernel, X)
+    proba = kernel["value"][leaves].mean(axis=1)
+    labels = proba.argmax(axis=1)
+    # Solo la clase predicha: filas x arboles x variables
+    table = kernel["contrib"]
+    rows = np.take(table.reshape(-1, table.shape[2]), leaves + (labels * table.shape[1])[:, None], axis=0)
+    contrib = np.add.reduce(rows, axis=1, dtype=float) / leaves.shape[1]
+    base = kernel["value"][kernel["roots"]].mean(axis=0)[labels]
+    return proba, contrib, base
+
+
+_EXPLAINERS = {"linear": _linear_explain, "trees": _trees_explain}
+
+
+def get_explainer(compiled: Dict) -> Optional[Dict]:
+    """
+    Kernel con el que se explican las predicciones (lineal o arboles), o None si el
+    modelo no lo admite (KNN). Si el artefacto no trae la tabla de contribuciones
+    por nodo se calcula una vez desde los arrays del kernel.
+    """
+    if "explainer" not in compiled:
+        kernel = compiled.get("kernel")
+        if kernel is None and compiled.get("estimator") is not None:
+            built = build_kernel(compiled["estimator"])
+            kernel = {**built[0], **built[1], "estimator": compiled["estimator"]} if built else None
+        if kernel is not None and kernel["kind"] not in _EXPLAINERS:
+            kernel = None
+        if kernel is not None and kernel["kind"] == "trees" and "contrib" not in kernel:
+            kernel = {**kernel, "contrib": path_contributions(kernel, len(compiled["selected"]))}
+        compiled["explainer"] = kernel
+    return compiled["explainer"]
+
+
+def compiled_explain(compiled: Dict, X: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    (probabilidades, contribuciones filas x variables seleccionadas, base por fila) para
+    la clase predicha de cada fila. Las probabilidades coinciden con
+    `compiled_predict_proba`. None si el modelo no admite explicaciones.
+    """
+    kernel = get_explainer(compiled)
+    if kernel is None:
+        return None
+    X_sel = _transform_inplace(compiled, np.array(X[:, compiled["columns"]], dtype=float))
+    fn = _EXPLAINERS[kernel["kind"]]
+    blocks = [fn(kernel, X_sel[start:start + KERNEL_BLOCK_ROWS]) for start in range(0, len(X_sel), KERNEL_BLOCK_ROWS)]
+    return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+
+def _estimator_proba(compiled: Dict, X: np.ndarray) -> np.ndarray:
+    kernel = compiled.get("kernel")
+    if kernel is not None:
+        return kernel_predict_proba(kernel, X)
+    return compiled["estimator"].predict_proba(X)
+
+
+def compiled_predict_proba(compiled: Dict, X: np.ndarray) -> np.ndarray:
+    """Probabilidades para una matriz en el orden `feature_order` del bundle."""
+    X_sel = np.array(X[:, compiled["columns"]], dtype=float)
+    return _estimator_proba(compiled, _transform_inplace(compiled, X_sel))
+
+
+def compiled_predict_one(compiled: Dict, payload: Dict) -> np.ndarray:
+    """
+    Probabilidades para un payload normalizado, usando un buffer float
+    preasignado por hilo (solo con las columnas seleccionadas).
+    """
+    selected = compiled["selected"]
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or buffer.shape[1] != len(selected):
+        buffer = _local.buffer = np.empty((1, len(selected)), dtype=float)
+
+    row = buffer[0]
+    for i, key in enumerate(selected):
+        row[i] = payload[key]
+    return _estimator_proba(compiled, _transform_inplace(compiled, buffer))[0]
+
+
+def get_compiled(model_bundle: Dict) -> Optional[Dict]:
+    """Devuelve la version compilada del bundle, compilandola la primera vez."""
+    if "compiled" not in model_bundle:
+        model_bundle["compiled"] = compile_pipeline(
+            model_bundle["model"], model_bundle.get("feature_order", FEATURE_COLUMNS)
+        )
+    return model_bundle["compiled"]
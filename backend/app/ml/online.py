@@ -0,0 +1,199 @@
+"""Actualizacion incremental (online) del modelo con estimadores `partial_fit`.
+
+El modelo online tiene la misma forma que el de `train_models` (scaler -> selector ->
+modelo) para reutilizar la ruta compilada y el registro de versiones:
+- StandardScaler actualizado con `partial_fit` (media/varianza incrementales),
+- el selector (columnas) del modelo vigente,
+- SGDClassifier(log_loss), que expone `predict_proba`.
+
+Cada ciclo consume solo las filas etiquetadas nuevas, en lotes pequenos, sin releer
+el historico. La primera vez (modelo vigente no online) el estimador se inicializa
+con datos reales: todas las filas etiquetadas disponibles (resultados confirmados o
+el DataFrame del ETL), nunca con el dataset sintetico. La ultima fraccion
+ONLINE_BOOTSTRAP_HOLDOUT de esas filas se evalua de forma progresiva como las nuevas.
+
+Las `metrics` del bundle siguen siendo las del holdout del entrenamiento; la
+evaluacion progresiva (predecir cada lote antes de aprender de el) queda en
+`online["prequential"]` junto con la del modelo vigente sobre las mismas filas, y
+`regresses` decide si la version nueva se publica.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .artifact import load_pipeline
+from .constants import FEATURE_COLUMNS
+
+ONLINE_MODEL_NAME = "sgd_online"
+ONLINE_BATCH_SIZE = int(os.getenv("ONLINE_BATCH_SIZE", "256"))
+ONLINE_MIN_BOOTSTRAP = int(os.getenv("ONLINE_MIN_BOOTSTRAP", "100"))  # filas reales minimas
+ONLINE_BOOTSTRAP_HOLDOUT = float(os.getenv("ONLINE_BOOTSTRAP_HOLDOUT", "0.2"))
+ONLINE_BOOTSTRAP_EPOCHS = int(os.getenv("ONLINE_BOOTSTRAP_EPOCHS", "10"))
+ONLINE_TOLERANCE = float(os.getenv("ONLINE_TOLERANCE", "0.0"))  # caida de F1 aceptada
+
+
+def _is_online(model_bundle: Dict) -> bool:
+    return model_bundle.get("best_model") == ONLINE_MODEL_NAME and "online" in model_bundle
+
+
+def bootstrap_online_bundle(model_bundle: Dict, X: np.ndarray, y: np.ndarray, random_state: int = 42) -> Dict:
+    """
+    Crea el bundle online a partir del vigente: copia su scaler (con sus estadisticas)
+    y su selector, e inicializa el SGD con filas reales etiquetadas (X, y).
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    pipeline = load_pipeline(model_bundle)
+    scaler = pipeline.named_steps["scaler"]
+    scaler = copy.deepcopy(scaler) if isinstance(scaler, StandardScaler) else StandardScaler()
+    if hasattr(scaler, "feature_names_in_"):
+        del scaler.feature_names_in_  # el modelo online se alimenta con arrays
+    selector = copy.deepcopy(pipeline.named_steps["selector"])
+    classes = np.array(sorted(str(c) for c in pipeline.classes_))
+
+    y = np.asarray(y).astype(str)
+    if not hasattr(scaler, "mean_"):
+        scaler.partial_fit(X)
+
+    estimator = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=random_state)
+    X_sel = selector.transform(scaler.transform(X))
+    # Varias pasadas barajadas: las filas reales del arranque suelen ser pocas
+    rng = np.random.default_rng(random_state)
+    for _ in range(ONLINE_BOOTSTRAP_EPOCHS):
+        order = rng.permutation(len(X_sel))
+        for start in range(0, len(X_sel), ONLINE_BATCH_SIZE):
+            idx = order[start:start + ONLINE_BATCH_SIZE]
+            estimator.partial_fit(X_sel[idx], y[idx], classes=classes)
+
+    return {
+        **{k: v for k, v in model_bundle.items() if k not in {"compiled", "version", "artifact"}},
+        "model": Pipeline([("scaler", scaler), ("selector", selector), ("model", estimator)]),
+        "best_model": ONLINE_MODEL_NAME,
+        "trained_at": datetime.utcnow().isoformat(),
+        "online": {
+            "cursor": None,
+            "rows_seen": len(X),
+            "updates": 0,
+            "base_model": model_bundle.get("best_model"),
+            "prequential": None,
+        },
+    }
+
+
+def _split_bootstrap(batches) -> Optional[Tuple[np.ndarray, np.ndarray, list]]:
+    """
+    Lee todas las filas reales disponibles y separa el arranque del SGD de la ultima
+    fraccion ONLINE_BOOTSTRAP_HOLDOUT, que se devuelve como lotes a evaluar.
+    None si no alcanzan ONLINE_MIN_BOOTSTRAP filas.
+    """
+    chunks = [(X, np.asarray(y).astype(str), cursor) for X, y, cursor in batches if len(X)]
+    if not chunks:
+        return None
+    X = np.concatenate([X for X, _, _ in chunks])
+    y = np.concatenate([y for _, y, _ in chunks])
+    if len(X) < ONLINE_MIN_BOOTSTRAP:
+        print(f"⚠️ Actualizacion incremental: {len(X)} filas reales, se necesitan {ONLINE_MIN_BOOTSTRAP} para iniciar")
+        return None
+    cut = int(len(X) * (1 - ONLINE_BOOTSTRAP_HOLDOUT))
+    cursor = next((c for _, _, c in reversed(chunks) if c is not None), None)
+    rest = [
+        (X[start:min(start + ONLINE_BATCH_SIZE, len(X))], y[start:min(start + ONLINE_BATCH_SIZE, len(X))], None)
+        for start in range(cut, len(X), ONLINE_BATCH_SIZE)
+    ]
+    if rest:
+        rest[-1] = (*rest[-1][:2], cursor)
+    return X[:cut], y[:cut], rest
+
+
+def regresses(updated: Dict, tolerance: float = ONLINE_TOLERANCE) -> bool:
+    """True si el modelo online rinde peor que el vigente sobre las mismas filas nuevas."""
+    prequential = (updated.get("online") or {}).get("prequential")
+    if not prequential:
+        return True  # sin evaluacion no se reemplaza el modelo vigente
+    return prequential["online"]["f1_weighted"] < prequential["vigente"]["f1_weighted"] - tolerance
+
+
+def update_online_bundle(
+    model_bundle: Dict,
+    batches: Iterable[Tuple[np.ndarray, np.ndarray, Optional[list]]],
+) -> Tuple[Dict, int]:
+    """
+    Aplica `partial_fit` lote a lote. `batches` produce (X, y, cursor) con X en orden
+    FEATURE_COLUMNS; el cursor del ultimo lote queda guardado en el bundle. Si el
+    modelo vigente no es online, `batches` debe traer todas las filas reales
+    disponibles (ver `_split_bootstrap`).
+    Retorna un bundle nuevo (el vigente no se modifica) y el numero de filas usadas.
+    """
+    from .utils import predict_batch
+
+    boot_rows = 0
+    if _is_online(model_bundle):
+        base = model_bundle
+    else:
+        split = _split_bootstrap(batches)
+        if split is None:
+            return model_bundle, 0
+        X_boot, y_boot, batches = split
+        base = bootstrap_online_bundle(model_bundle, X_boot, y_boot)
+        boot_rows = len(X_boot)
+    online = copy.deepcopy({"model": load_pipeline(base), "online": base["online"]})
+    pipeline = online["model"]
+    scaler = pipeline.named_steps["scaler"]
+    selector = pipeline.named_steps["selector"]
+    estimator = pipeline.named_steps["model"]
+    state = online["online"]
+
+    rows = 0
+    y_true, y_pred, y_vigente = [], [], []
+    for X, y, cursor in batches:
+        if len(X) == 0:
+            continue
+        y = np.asarray(y).astype(str)
+        # Evaluacion progresiva: se predice antes de aprender del lote, con el
+        # modelo online y con el vigente (el que se reemplazaria)
+        y_true.extend(y)
+        y_pred.extend(pipeline.predict(X))
+        y_vigente.extend(r["riesgo"] for r in predict_batch(model_bundle, X))
+
+        scaler.partial_fit(X)
+        estimator.partial_fit(selector.transform(scaler.transform(X)), y)
+        rows += len(X)
+        if cursor is not None:
+            state["cursor"] = cursor
+
+    if rows == 0:
+        return model_bundle, 0
+
+    from .evaluate import evaluate_model
+
+    state["rows_seen"] += rows
+    state["updates"] += 1
+    # `metrics` (holdout del entrenamiento) no cambia: la evaluacion progresiva va aparte
+    state["prequential"] = {
+        "filas": len(y_true),
+        "online": evaluate_model(y_true, y_pred),
+        "vigente": evaluate_model(y_true, y_vigente),
+    }
+    updated = {
+        **{k: v for k, v in base.items() if k not in {"compiled", "version", "artifact"}},
+        "model": pipeline,
+        "online": state,
+        "trained_at": datetime.utcnow().isoformat(),
+    }
+    return updated, boot_rows + rows
+
+
+def iter_frame_batches(df, batch_size: int = ONLINE_BATCH_SIZE):
+    """Lotes (X, y, None) desde un DataFrame etiquetado (por ejemplo filas del ETL)."""
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    y = df["riesgo"].astype(str).to_numpy()
+    for start in range(0, len(X), batch_size):
+        yield X[start:start + batch_size], y[start:start + batch_size], None
@@ -9,15 +9,7 @@ import numpy as np
 import pandas as pd
 from sklearn.feature_selection import mutual_info_classif
 
-# Caracteristicas esperadas por el pipeline
-FEATURE_COLUMNS: List[str] = [
-    "promedio",
-    "asistencia",
-    "horas_estudio",
-    "tendencia",
-    "puntualidad",
-    "habitos",
-]
+from .constants import FEATURE_COLUMNS
 
 
 def load_from_sources(
@@ -77,6 +69,7 @@ def generate_synthetic_students(
     """
     Genera un dataset sintético que mezcla calificaciones, asistencia
     y hábitos de estudio para entrenar los modelos requeridos.
+    Para datasets grandes o por bloques usar `synthetic.py` (escala de score fija).
     """
     rng = np.random.default_rng(random_state)
 
@@ -134,11 +127,15 @@ def prepare_dataset(
     return df
 
 
-def rank_features(X: pd.DataFrame, y: pd.Series) -> List[Tuple[str, float]]:
+def rank_features(
+    X: pd.DataFrame, y: pd.Series, scores: Optional[np.ndarray] = None
+) -> List[Tuple[str, float]]:
     """
     Calcula la relevancia de cada variable usando mutual information.
-    Retorna una lista ordenada descendentemente.
+    Retorna una lista ordenada descendentemente. Acepta `scores` ya calculados
+    para no repetir el calculo de MI.
     """
-    scores = mutual_info_classif(X, y, random_state=42)
+    if scores is None:
+        scores = mutual_info_classif(X, y, random_state=42)
     ranking = sorted(zip(X.columns, scores), key=lambda pair: pair[1], reverse=True)
     return ranking
@@ -0,0 +1,185 @@
+"""Registro de versiones del modelo junto a `ml/model.pkl`.
+
+Cada entrenamiento se guarda como `registry/model-<version>.pkl` y se registra en
+`registry/index.json`. La version activa se publica copiando su artefacto sobre
+`model.pkl` con escritura atomica (archivo temporal + os.replace), de modo que un
+lector nunca ve un archivo a medio escribir. Publicar y actualizar el indice se hace
+bajo el lock del modelo (`fileops.model_lock`), compartido por todos los workers.
+
+Tras cada version nueva se conservan las ultimas REGISTRY_KEEP (0 = todas) mas la
+activa y la anterior a ella (destino de un rollback); el resto se borra.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+
+from .artifact import publish_artifact
+from .constants import MODEL_PATH
+from .fileops import atomic_write, model_lock, training_lock
+
+REGISTRY_DIR = MODEL_PATH.parent / "registry"
+REGISTRY_KEEP = int(os.getenv("REGISTRY_KEEP", "10"))
+
+
+def _index_path(registry_dir: Path) -> Path:
+    return registry_dir / "index.json"
+
+
+def _artifact_path(version: str, registry_dir: Path) -> Path:
+    return registry_dir / f"model-{version}.pkl"
+
+
+def dump_bundle(model_bundle: Dict, path: Path) -> None:
+    """Persiste un bundle de forma atomica (sin la ruta compilada, que se recalcula)."""
+    data = {k: v for k, v in model_bundle.items() if k not in {"compiled", "artifact"}}
+    atomic_write(path, lambda fh: joblib.dump(data, fh))
+
+
+def _read_index(registry_dir: Path) -> Dict:
+    path = _index_path(registry_dir)
+    if not path.exists():
+        return {"active": None, "versions": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_index(index: Dict, registry_dir: Path) -> None:
+    payload = json.dumps(index, indent=2, ensure_ascii=False).encode("utf-8")
+    atomic_write(_index_path(registry_dir), lambda fh: fh.write(payload))
+
+
+def list_versions(registry_dir: Path = REGISTRY_DIR) -> Dict:
+    """Versiones registradas (mas antigua primero) y version activa."""
+    return _read_index(registry_dir)
+
+
+def save_version(
+    model_bundle: Dict,
+    registry_dir: Path = REGISTRY_DIR,
+    model_path: Path = MODEL_PATH,
+) -> str:
+    """Guarda un bundle como nueva version del registro y retorna su identificador."""
+    with model_lock(model_path):
+        index = _read_index(registry_dir)
+        if not index["versions"] and model_path.exists():
+            # Primer uso del registro: conservar el model.pkl vigente para poder volver a el
+            index = _register(joblib.load(model_path), index, registry_dir)
+            index["active"] = index["versions"][-1]["version"]
+
+        index = _register(model_bundle, index, registry_dir)
+        index = _prune(index, registry_dir, REGISTRY_KEEP)
+        _write_index(index, registry_dir)
+        return index["versions"][-1]["version"]
+
+
+def _prune(index: Dict, registry_dir: Path, keep: int) -> Dict:
+    """Quita del indice y borra las versiones fuera de las ultimas `keep` (salvo activa y anterior)."""
+    versions = [entry["version"] for entry in index["versions"]]
+    if keep <= 0 or len(versions) <= keep:
+        return index
+    conservar = set(versions[-keep:])
+    if index["active"] in versions:
+        position = versions.index(index["active"])
+        conservar.update(versions[max(position - 1, 0):position + 1])
+    for version in versions:
+        if version not in conservar:
+            _artifact_path(version, registry_dir).unlink(missing_ok=True)
+    index["versions"] = [entry for entry in index["versions"] if entry["version"] in conservar]
+    return index
+
+
+def _register(model_bundle: Dict, index: Dict, registry_dir: Path) -> Dict:
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    model_bundle["version"] = version
+    dump_bundle(model_bundle, _artifact_path(version, registry_dir))
+    index["versions"].append(
+        {
+            "version": version,
+            "best_model": model_bundle.get("best_model"),
+            "trained_at": model_bundle.get("trained_at"),
+            "metrics": model_bundle.get("metrics", {}),
+        }
+    )
+    return index
+
+
+def load_version(version: str, registry_dir: Path = REGISTRY_DIR) -> Dict:
+    """Carga el bundle de una version registrada."""
+    path = _artifact_path(version, registry_dir)
+    if not path.exists():
+        raise FileNotFoundError(f"Version de modelo no encontrada: {version}")
+    model_bundle = joblib.load(path)
+    model_bundle["version"] = version
+    return model_bundle
+
+
+def activate_version(
+    version: str,
+    registry_dir: Path = REGISTRY_DIR,
+    model_path: Path = MODEL_PATH,
+) -> Dict:
+    """
+    Publica una version como `model.pkl` (reemplazo atomico) y la marca activa.
+    Retorna el bundle servido desde el artefacto mmap regenerado (si es exportable).
+    """
+    model_bundle = load_version(version, registry_dir)
+    with model_lock(model_path):
+        dump_bundle(model_bundle, model_path)
+        model_bundle = publish_artifact(model_bundle, model_path)
+
+        index = _read_index(registry_dir)
+        index["active"] = version
+        _write_index(index, registry_dir)
+    return model_bundle
+
+
+def previous_version(registry_dir: Path = REGISTRY_DIR) -> Optional[str]:
+    """Version registrada inmediatamente anterior a la activa."""
+    index = _read_index(registry_dir)
+    versions: List[str] = [entry["version"] for entry in index["versions"]]
+    if index["active"] not in versions:
+        return versions[-2] if len(versions) > 1 else None
+    position = versions.index(index["active"])
+    return versions[position - 1] if position > 0 else None
+
+
+def train_version(
+    df=None,
+    scaler: str = "standard",
+    registry_dir: Path = REGISTRY_DIR,
+    model_path: Path = MODEL_PATH,
+    tune: bool = False,
+    tune_budget: Optional[float] = None,
+    tune_configs: Optional[int] = None,
+) -> str:
+    """
+    Entrena, registra y publica una nueva version. Pensado para ejecutarse en un
+    proceso aparte: retorna solo el identificador y el proceso principal carga el
+    artefacto desde disco. Con el lock del modelo, reentrenamientos lanzados desde
+    varios workers se ejecutan uno tras otro en lugar de competir por los nucleos.
+
+    Con `tune` busca hiperparametros (`tuning.py`); si no, reutiliza los de la
+    version publicada.
+    """
+    # scikit-learn solo en el proceso de entrenamiento
+    from .train_models import train_models
+    from .tuning import load_tuning
+
+    with training_lock(model_path):
+        model_bundle = train_models(
+            df=df,
+            scaler=scaler,
+            tuning=None if tune else load_tuning(model_path),
+            tune=tune,
+            tune_budget=tune_budget,
+            tune_configs=tune_configs,
+        )
+        version = save_version(model_bundle, registry_dir=registry_dir, model_path=model_path)
+        activate_version(version, registry_dir=registry_dir, model_path=model_path)
+    return version
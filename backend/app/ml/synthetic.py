@@ -0,0 +1,246 @@
+"""Generador de datasets sinteticos por bloques para pruebas de escala (ETL y entrenamiento).
+
+A diferencia de `preprocessing.generate_synthetic_students` (todo en memoria y con
+un reescalado min/max que depende de la muestra: la proporcion de clases cambia con
+el tamano), aqui:
+- el score usa una escala fija (`SCORE_RANGE`, los extremos teoricos de la suma
+  ponderada con las variables recortadas a sus rangos), igual en todos los bloques;
+- los umbrales de riesgo salen de las proporciones de clase pedidas, calibradas una
+  sola vez sobre una muestra con semilla fija;
+- las filas se escriben en bloques de tamano fijo a CSV o Parquet (pyarrow).
+
+Opciones: ids de estudiante y cohorte (varias filas por estudiante para ejercitar la
+agregacion del ETL), correlacion entre variables (factor latente comun), ruido de
+medicion correlacionado y desbalance de clases. Con varias filas por estudiante cada
+estudiante tiene un perfil latente y un riesgo propios; sus filas son el perfil mas
+una variacion por fila (`row_spread`), no sorteos independientes.
+
+Uso (desde backend/):
+    python -m app.ml.synthetic data/sinteticos.parquet --filas 5000000 --ids --cohortes 6
+    python -m app.ml.synthetic data/sinteticos.csv --filas 1000000 --proporciones alto=0.1,medio=0.6,bajo=0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .constants import FEATURE_COLUMNS
+
+# (media, desviacion, minimo, maximo) de cada variable, como en generate_synthetic_students
+FEATURE_SPECS: Dict[str, Tuple[float, float, float, float]] = {
+    "promedio": (7.2, 1.4, 0, 10),
+    "asistencia": (86, 9, 40, 100),
+    "horas_estudio": (12, 5, 0, 50),
+    "tendencia": (0.2, 1.2, -3, 3),
+    "puntualidad": (88, 8, 40, 100),
+    "habitos": (7.0, 2.0, 0, 10),
+}
+# Pesos del score sobre cada variable (ya en escala 0-10 salvo tendencia)
+SCORE_WEIGHTS = {
+    "promedio": 0.35,
+    "asistencia": 0.2 / 10,
+    "horas_estudio": 0.15 / 10,
+    "tendencia": 0.5,
+    "puntualidad": 0.15 / 10,
+    "habitos": 0.1,
+}
+SCORE_RANGE = (
+    sum(w * FEATURE_SPECS[c][2] for c, w in SCORE_WEIGHTS.items()),
+    sum(w * FEATURE_SPECS[c][3] for c, w in SCORE_WEIGHTS.items()),
+)
+# Proporciones por defecto: similares a generate_synthetic_students con 800 filas
+DEFAULT_PROPORTIONS = {"alto": 0.60, "medio": 0.32, "bajo": 0.08}
+CALIBRATION_ROWS = 200_000
+PROFILE_BLOCK = 4096  # estudiantes por semilla de perfiles (independiente del bloque de filas)
+ROW_SPREAD = 0.3  # variacion de cada fila alrededor del perfil (fraccion de la desviacion)
+
+
+def stable_score(df: pd.DataFrame) -> np.ndarray:
+    """Score 0-10 con escala fija (no depende del bloque ni del tamano del dataset)."""
+    raw = sum(df[col].to_numpy(dtype=float) * w for col, w in SCORE_WEIGHTS.items())
+    low, high = SCORE_RANGE
+    return np.clip((raw - low) / (high - low) * 10, 0, 10)
+
+
+def _features(rng: np.random.Generator, n: int, correlation: float) -> pd.DataFrame:
+    """Variables con correlacion `correlation` via un factor latente comun (compromiso)."""
+    common = rng.standard_normal(n)
+    data = {}
+    for col in FEATURE_COLUMNS:
+        mean, sd, low, high = FEATURE_SPECS[col]
+        z = np.sqrt(correlation) * common + np.sqrt(1 - correlation) * rng.standard_normal(n)
+        data[col] = np.clip(mean + sd * z, low, high)
+    return pd.DataFrame(data)
+
+
+def _add_noise(rng: np.random.Generator, df: pd.DataFrame, noise: float, correlation: float) -> None:
+    """Ruido de medicion (fraccion de la desviacion de cada variable), correlacionado entre variables."""
+    if noise <= 0:
+        return
+    common = rng.standard_normal(len(df))
+    for col in FEATURE_COLUMNS:
+        _, sd, low, high = FEATURE_SPECS[col]
+        z = np.sqrt(correlation) * common + np.sqrt(1 - correlation) * rng.standard_normal(len(df))
+        df[col] = np.clip(df[col].to_numpy() + noise * sd * z, low, high)
+
+
+def _profiles(students: np.ndarray, seed: int, correlation: float) -> pd.DataFrame:
+    """
+    Perfil latente de cada estudiante de `students` (ids crecientes). Se sortea por
+    grupos de PROFILE_BLOCK estudiantes con semilla propia: un estudiante cuyas filas
+    caen en dos bloques de filas recibe el mismo perfil en ambos.
+    """
+    unique, inverse = np.unique(students, return_inverse=True)
+    parts = []
+    for block in range(unique[0] // PROFILE_BLOCK, unique[-1] // PROFILE_BLOCK + 1):
+        rng = np.random.default_rng([seed, 0x57D, block])
+        profiles = _features(rng, PROFILE_BLOCK, correlation)
+        wanted = unique[(unique // PROFILE_BLOCK) == block] - block * PROFILE_BLOCK
+        parts.append(profiles.iloc[wanted])
+    return pd.concat(parts, ignore_index=True).iloc[inverse].reset_index(drop=True)
+
+
+def parse_proportions(value: Optional[str]) -> Dict[str, float]:
+    """'alto=0.2,medio=0.5,bajo=0.3' -> dict normalizado a 1."""
+    if not value:
+        return dict(DEFAULT_PROPORTIONS)
+    proportions = {k: 0.0 for k in DEFAULT_PROPORTIONS}
+    for part in value.split(","):
+        key, _, number = part.partition("=")
+        if key.strip() not in proportions:
+            raise ValueError(f"Clase desconocida: {key!r} (alto, medio, bajo)")
+        proportions[key.strip()] = float(number)
+    total = sum(proportions.values())
+    if total <= 0 or min(proportions.values()) < 0:
+        raise ValueError("Las proporciones deben ser no negativas y sumar mas de 0")
+    return {k: v / total for k, v in proportions.items()}
+
+
+def calibrate_thresholds(
+    proportions: Dict[str, float], correlation: float = 0.0, seed: int = 42
+) -> Tuple[float, float]:
+    """Umbrales (alto|medio, medio|bajo) del score estable para las proporciones pedidas."""
+    rng = np.random.default_rng([seed, 0xCA1])
+    scores = stable_score(_features(rng, CALIBRATION_ROWS, correlation))
+    return (
+        float(np.quantile(scores, proportions["alto"])),
+        float(np.quantile(scores, proportions["alto"] + proportions["medio"])),
+    )
+
+
+def iter_synthetic_chunks(
+    n_rows: int,
+    chunk_size: int = 100_000,
+    seed: int = 42,
+    correlation: float = 0.0,
+    noise: float = 0.0,
+    proportions: Optional[Dict[str, float]] = None,
+    ids: bool = False,
+    rows_per_student: int = 1,
+    cohorts: int = 0,
+    row_spread: float = ROW_SPREAD,
+) -> Iterator[pd.DataFrame]:
+    """
+    Bloques de `chunk_size` filas. El riesgo se etiqueta sobre las variables reales
+    y luego se aplica el ruido de medicion. Cada bloque usa su propia semilla
+    derivada de (seed, indice), asi la salida es reproducible.
+
+    Con `rows_per_student` > 1 el riesgo se etiqueta sobre el perfil del estudiante
+    y cada fila agrega una variacion de `row_spread` desviaciones alrededor de el.
+    """
+    if not 0 <= correlation < 1:
+        raise ValueError("correlation debe estar en [0, 1)")
+    low, high = calibrate_thresholds(proportions or DEFAULT_PROPORTIONS, correlation, seed)
+    for index, start in enumerate(range(0, n_rows, chunk_size)):
+        n = min(chunk_size, n_rows - start)
+        rng = np.random.default_rng([seed, index])
+        student = (start + np.arange(n)) // max(rows_per_student, 1)
+        df = _profiles(student, seed, correlation) if rows_per_student > 1 else _features(rng, n, correlation)
+        score = stable_score(df)
+        df["riesgo"] = np.where(score < low, "alto", np.where(score < high, "medio", "bajo"))
+        if rows_per_student > 1:
+            _add_noise(rng, df, row_spread, correlation)
+        _add_noise(rng, df, noise, correlation)
+
+        if ids:
+            df.insert(0, "estudiante_id", student)
+            if cohorts > 0:
+                cohort = student % cohorts
+                df.insert(1, "cohorte", [f"{2018 + c // 2}-{c % 2 + 1}" for c in cohort])
+        yield df
+
+
+def write_synthetic_dataset(path: Path, n_rows: int, chunk_size: int = 100_000, **options) -> Dict:
+    """Escribe el dataset por bloques (CSV o Parquet segun la extension) y retorna un resumen."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    parquet = path.suffix.lower() in {".parquet", ".pq"}
+    writer = None
+    if parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Instale pyarrow para escribir archivos Parquet") from exc
+
+    counts = {"alto": 0, "medio": 0, "bajo": 0}
+    try:
+        for index, chunk in enumerate(iter_synthetic_chunks(n_rows, chunk_size, **options)):
+            for label, count in chunk["riesgo"].value_counts().items():
+                counts[label] += int(count)
+            if parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="snappy")
+                writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode="w" if index == 0 else "a", header=index == 0, index=False, float_format="%.4f")
+    finally:
+        if writer is not None:
+            writer.close()
+    return {"path": str(path), "filas": n_rows, "clases": counts, "bytes": path.stat().st_size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("salida", type=Path, help="Archivo .csv o .parquet")
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--bloque", type=int, default=100_000, help="Filas por bloque")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--correlacion", type=float, default=0.0, help="Correlacion entre variables [0, 1)")
+    parser.add_argument("--ruido", type=float, default=0.0, help="Ruido de medicion (fraccion de la desviacion)")
+    parser.add_argument("--proporciones", default=None, help="Ej.: alto=0.2,medio=0.5,bajo=0.3")
+    parser.add_argument("--ids", action="store_true", help="Agregar estudiante_id")
+    parser.add_argument("--filas-por-estudiante", type=int, default=1)
+    parser.add_argument("--cohortes", type=int, default=0, help="Agregar cohorte (requiere --ids)")
+    parser.add_argument(
+        "--variacion", type=float, default=ROW_SPREAD, help="Variacion de las filas de un estudiante alrededor de su perfil"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = write_synthetic_dataset(
+        args.salida,
+        args.filas,
+        args.bloque,
+        seed=args.semilla,
+        correlation=args.correlacion,
+        noise=args.ruido,
+        proportions=parse_proportions(args.proporciones),
+        ids=args.ids,
+        rows_per_student=args.filas_por_estudiante,
+        cohorts=args.cohortes,
+        row_spread=args.variacion,
+    )
+    elapsed = time.perf_counter() - start
+    clases = ", ".join(f"{k}={v / args.filas:.1%}" for k, v in summary["clases"].items())
+    print(f"{summary['filas']} filas en {summary['path']} ({summary['bytes'] / 1e6:.1f} MB, {elapsed:.1f} s): {clases}")
+
+
+if __name__ == "__main__":
+    main()
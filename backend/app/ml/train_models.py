@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import multiprocessing
+import os
 from pathlib import Path
+import time
 from typing import Dict, Optional
 
 import joblib
@@ -17,15 +21,76 @@ from sklearn.preprocessing import MinMaxScaler, StandardScaler
 from sklearn.tree import DecisionTreeClassifier
 
 from .evaluate import build_confusion_matrix, evaluate_model
+from .constants import MODEL_PATH
+from .fileops import atomic_write
 from .preprocessing import FEATURE_COLUMNS, prepare_dataset, rank_features
 
-MODEL_PATH = Path(__file__).resolve().parent / "model.pkl"
 
+def _build_pipeline(model, scaler: str = "standard", memory=None) -> Pipeline:
+    scaler_step = StandardScaler() if scaler == "standard" else MinMaxScaler()
+    selector = SelectKBest(mutual_info_classif, k=min(len(FEATURE_COLUMNS), 5))
+    return Pipeline([("scaler", scaler_step), ("selector", selector), ("model", model)], memory=memory)
+
+
+def build_candidates(random_state: int = 42, params: Optional[Dict[str, Dict]] = None, search: bool = False) -> Dict:
+    """
+    Los cuatro candidatos con sus hiperparametros por defecto, sobrescritos por
+    `params` (los `best_params` de una busqueda). Con `search` el Random Forest usa
+    un solo hilo: durante la busqueda el paralelismo esta entre evaluaciones.
+    """
+    candidates = {
+        "logistic_regression": LogisticRegression(
+            max_iter=1200, class_weight="balanced", solver="lbfgs"
+        ),
+        "decision_tree": DecisionTreeClassifier(
+            max_depth=6, min_samples_split=6, random_state=random_state
+        ),
+        "random_forest": RandomForestClassifier(
+            n_estimators=250,
+            max_depth=9,
+            min_samples_split=4,
+            random_state=random_state,
+            n_jobs=1 if search else -1,
+        ),
+        "knn": KNeighborsClassifier(n_neighbors=7, weights="distance"),
+    }
+    for name, overrides in (params or {}).items():
+        if name in candidates:
+            candidates[name].set_params(**overrides)
+    return candidates
 
-def _build_pipeline(model, scaler: str = "standard") -> Pipeline:
+
+def _shared_preprocessing(X_train, y_train, scaler: str = "standard"):
+    """
+    Ajusta una sola vez el scaler y la mutual information y los comparte entre
+    candidatos. El selector queda en el mismo estado que tras SelectKBest.fit.
+    """
     scaler_step = StandardScaler() if scaler == "standard" else MinMaxScaler()
+    X_scaled = scaler_step.fit_transform(X_train)
+
+    # MI es invariante a la escala: se calcula sobre los datos originales una vez
+    mi_scores = mutual_info_classif(X_train, y_train, random_state=42)
     selector = SelectKBest(mutual_info_classif, k=min(len(FEATURE_COLUMNS), 5))
-    return Pipeline([("scaler", scaler_step), ("selector", selector), ("model", model)])
+    selector.scores_ = mi_scores
+    selector.pvalues_ = None
+    selector.n_features_in_ = X_scaled.shape[1]
+    return scaler_step, selector, mi_scores
+
+
+def _fit_candidate(name: str, estimator, X_train, y_train, X_test, y_test, labels):
+    """Ajusta y evalua un candidato sobre features ya escaladas y seleccionadas."""
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start
+
+    y_pred = estimator.predict(X_test)
+    metrics = evaluate_model(y_test, y_pred)
+    cm = build_confusion_matrix(y_test, y_pred, labels=labels)
+    return name, estimator, metrics, cm, train_seconds
+
+
+def _default_workers(n_candidates: int) -> int:
+    return int(os.getenv("TRAIN_WORKERS", min(n_candidates, os.cpu_count() or 1)))
 
 
 def train_models(
@@ -33,13 +98,36 @@ def train_models(
     scaler: str = "standard",
     test_size: float = 0.2,
     random_state: int = 42,
+    n_workers: Optional[int] = None,
+    tuning: Optional[Dict] = None,
+    tune: bool = False,
+    tune_budget: Optional[float] = None,
+    tune_configs: Optional[int] = None,
 ) -> Dict:
     """
     Entrena Regresion Logistica, Decision Tree, Random Forest y KNN.
     Devuelve el bundle del mejor modelo (segun F1 y accuracy).
+
+    El escalado y la mutual information se calculan una sola vez y los candidatos
+    se ajustan en paralelo en `n_workers` procesos (env TRAIN_WORKERS; 1 = secuencial).
+    La duracion de cada fase queda en `training_phases` del bundle.
+
+    Con `tune` se buscan hiperparametros (`tuning.py`) sobre el conjunto de
+    entrenamiento; si no, se usan los de `tuning` (una busqueda anterior) o los
+    valores por defecto. El resultado de la busqueda se guarda en `tuning` del bundle.
     """
+    phases: Dict[str, float] = {}
+    started = last = time.perf_counter()
+
+    def _phase(name: str) -> None:
+        nonlocal last
+        now = time.perf_counter()
+        phases[name] = round(now - last, 4)
+        last = now
+
     if df is None:
         df = prepare_dataset()
+    _phase("load_data")
 
     X = df[FEATURE_COLUMNS]
     y = df["riesgo"]
@@ -47,40 +135,58 @@ def train_models(
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, stratify=y, random_state=random_state
     )
+    _phase("split")
 
-    candidates = {
-        "logistic_regression": LogisticRegression(
-            max_iter=1200, multi_class="auto", class_weight="balanced", solver="lbfgs"
-        ),
-        "decision_tree": DecisionTreeClassifier(
-            max_depth=6, min_samples_split=6, random_state=random_state
-        ),
-        "random_forest": RandomForestClassifier(
-            n_estimators=250,
-            max_depth=9,
-            min_samples_split=4,
+    if tune:
+        from .tuning import TUNE_BUDGET_SECONDS, TUNE_CONFIGS, tune_candidates
+
+        tuning = tune_candidates(
+            X_train,
+            y_train,
+            scaler=scaler,
+            budget_seconds=tune_budget or TUNE_BUDGET_SECONDS,
+            n_configs=tune_configs or TUNE_CONFIGS,
             random_state=random_state,
-            n_jobs=-1,
-        ),
-        "knn": KNeighborsClassifier(n_neighbors=7, weights="distance"),
-    }
+        )
+        _phase("tuning")
+
+    candidates = build_candidates(random_state, params=(tuning or {}).get("best_params"))
+
+    scaler_step, selector, mi_scores = _shared_preprocessing(X_train, y_train, scaler=scaler)
+    feature_ranking = rank_features(X_train, y_train, scores=mi_scores)
+    X_train_sel = selector.transform(scaler_step.transform(X_train))
+    X_test_sel = selector.transform(scaler_step.transform(X_test))
+    labels = sorted(y.unique().tolist())
+    _phase("preprocessing")
+
+    n_workers = n_workers or _default_workers(len(candidates))
+    if n_workers > 1:
+        # El paralelismo esta entre candidatos: un forest con n_jobs=-1 en cada
+        # proceso sobresuscribiria la CPU
+        candidates["random_forest"].set_params(n_jobs=1)
+    jobs = [
+        (name, estimator, X_train_sel, y_train, X_test_sel, y_test, labels)
+        for name, estimator in candidates.items()
+    ]
+    if n_workers > 1:
+        # spawn: la API tiene hilos (uvicorn, scheduler) y fork copiaria sus locks
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            fitted = list(executor.map(_fit_candidate, *zip(*jobs)))
+    else:
+        fitted = [_fit_candidate(*job) for job in jobs]
+    _phase("fit_candidates")
 
-    feature_ranking = rank_features(X_train, y_train)
     results: Dict[str, Dict] = {}
     best_model_name: Optional[str] = None
     best_score = -1.0
     best_bundle: Optional[Dict] = None
 
-    for name, estimator in candidates.items():
-        pipeline = _build_pipeline(estimator, scaler=scaler)
-        pipeline.fit(X_train, y_train)
-        y_pred = pipeline.predict(X_test)
-
-        metrics = evaluate_model(y_test, y_pred)
-        cm = build_confusion_matrix(y_test, y_pred, labels=sorted(y.unique().tolist()))
+    # Mismo orden que `candidates`: el desempate del mejor modelo no cambia
+    for name, estimator, metrics, cm, train_seconds in fitted:
         results[name] = {
             **metrics,
             "confusion_matrix": cm,
+            "train_seconds": round(train_seconds, 4),
         }
 
         # score combinado para elegir mejor modelo
@@ -89,13 +195,16 @@ def train_models(
             best_score = score_global
             best_model_name = name
             best_bundle = {
-                "model": pipeline,
+                "model": Pipeline(
+                    [("scaler", scaler_step), ("selector", selector), ("model", estimator)]
+                ),
                 "metrics": metrics,
                 "confusion_matrix": cm,
             }
 
     if not best_bundle or best_model_name is None:
         raise RuntimeError("No se pudo seleccionar un modelo entrenado")
+    _phase("select_best")
 
     model_bundle = {
         **best_bundle,
@@ -104,16 +213,24 @@ def train_models(
         "all_metrics": results,
         "best_model": best_model_name,
         "trained_at": datetime.utcnow().isoformat(),
+        "training_phases": phases,
+        "training_seconds": round(time.perf_counter() - started, 4),
     }
+    if tuning:
+        model_bundle["tuning"] = tuning
 
     return model_bundle
 
 
 def train_and_save_best_model(
-    output_path: Path = MODEL_PATH, scaler: str = "standard"
+    output_path: Path = MODEL_PATH, scaler: str = "standard", tune: bool = False
 ) -> Dict:
-    """Entrena y persiste el mejor modelo en disco."""
-    model_bundle = train_models(scaler=scaler)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model_bundle, output_path)
+    """
+    Entrena y persiste el mejor modelo en disco (escritura atomica). Sin `tune`
+    reutiliza los hiperparametros buscados para el modelo que reemplaza.
+    """
+    from .tuning import load_tuning
+
+    model_bundle = train_models(scaler=scaler, tune=tune, tuning=None if tune else load_tuning(output_path))
+    atomic_write(output_path, lambda fh: joblib.dump(model_bundle, fh))
     return model_bundle
@@ -0,0 +1,286 @@
+"""Busqueda de hiperparametros por successive halving con presupuesto de tiempo.
+
+Por cada candidato de `train_models` se muestrean `n_configs` configuraciones al azar
+(`SEARCH_SPACES`) y se evaluan con validacion cruzada sobre una fraccion creciente
+del conjunto de entrenamiento: en cada ronda sobrevive el mejor tercio y se triplica
+el numero de filas. Las evaluaciones (configuracion x fold) se reparten entre los
+nucleos con joblib. El Pipeline usa `memory` (joblib.Memory en un directorio
+temporal): el scaler y el SelectKBest ajustados para un fold y tamano se reutilizan
+en todas las configuraciones en lugar de recalcular la mutual information cada vez.
+
+El presupuesto (`budget_seconds`) se reparte entre los candidatos; antes de cada
+ronda se estima su costo con la ronda anterior y, si no alcanza, se detiene y se
+usa el mejor de la ultima ronda. Una ronda que excede el plazo se corta: cuentan las
+configuraciones con todos sus folds evaluados (si no hay ninguna, el candidato
+conserva sus valores por defecto). Si la busqueda no termino, la configuracion
+elegida solo se acepta cuando supera a los valores por defecto evaluados con las
+mismas filas y folds de la ultima ronda. El resultado queda en `tuning` del bundle
+y un reentrenamiento normal reutiliza las configuraciones aceptadas sin volver a buscar.
+
+Uso (desde backend/; entrena, registra y publica una nueva version):
+    python -m app.ml.tuning --presupuesto 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+from scipy.stats import loguniform, randint
+from sklearn.base import clone
+from sklearn.model_selection import ParameterSampler, StratifiedKFold
+
+from .constants import MODEL_PATH
+from .evaluate import evaluate_model
+
+TUNE_BUDGET_SECONDS = float(os.getenv("TUNE_BUDGET_SECONDS", "300"))
+TUNE_CONFIGS = int(os.getenv("TUNE_CONFIGS", "27"))
+HALVING_FACTOR = 3
+CV_FOLDS = 3
+MIN_RESOURCES = 150  # filas minimas por ronda (cada fold conserva todas las clases)
+
+# Espacios de busqueda sobre el paso "model" del Pipeline. KNN se limita a distancia
+# euclidiana para que el modelo siga siendo exportable al artefacto mmap.
+SEARCH_SPACES: Dict[str, Dict] = {
+    "logistic_regression": {
+        "model__C": loguniform(1e-2, 1e2),
+        "model__class_weight": [None, "balanced"],
+    },
+    "decision_tree": {
+        "model__max_depth": [3, 4, 5, 6, 8, 10, 12, None],
+        "model__min_samples_split": randint(2, 20),
+        "model__min_samples_leaf": randint(1, 10),
+        "model__criterion": ["gini", "entropy"],
+    },
+    "random_forest": {
+        "model__n_estimators": randint(100, 400),
+        "model__max_depth": [6, 8, 9, 10, 12, 16, None],
+        "model__min_samples_split": randint(2, 12),
+        "model__max_features": ["sqrt", "log2", None],
+    },
+    "knn": {
+        "model__n_neighbors": randint(3, 40),
+        "model__weights": ["uniform", "distance"],
+    },
+}
+
+
+def _plain(value):
+    """Valores de numpy a tipos de Python (el bundle va al header JSON del artefacto)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _score(metrics: Dict[str, float]) -> float:
+    # Mismo criterio que la seleccion del mejor modelo en train_models
+    return metrics["f1_weighted"] + metrics["accuracy"]
+
+
+def _evaluate(pipeline, params: Dict, X: np.ndarray, y: np.ndarray, train_idx, val_idx) -> float:
+    """Score de una configuracion en un fold (-inf si el ajuste falla)."""
+    model = clone(pipeline).set_params(**params)
+    try:
+        model.fit(X[train_idx], y[train_idx])
+        return _score(evaluate_model(y[val_idx], model.predict(X[val_idx])))
+    except ValueError:
+        return float("-inf")
+
+
+def successive_halving(
+    pipeline,
+    space: Dict,
+    X: np.ndarray,
+    y: np.ndarray,
+    deadline: float,
+    n_configs: int = TUNE_CONFIGS,
+    n_jobs: int = 1,
+    random_state: int = 42,
+) -> Dict:
+    """
+    Successive halving sobre `n_configs` configuraciones de `space`. Retorna la mejor
+    configuracion, su score de validacion cruzada, el detalle de cada ronda y si se
+    acepta (`accepted`): busqueda completa o mejor que los valores por defecto.
+    """
+    configs = [
+        {k: _plain(v) for k, v in params.items()}
+        for params in ParameterSampler(space, n_iter=n_configs, random_state=random_state)
+    ]
+    n_rounds = max(1, math.ceil(math.log(len(configs), HALVING_FACTOR)) + 1)
+    resources = max(MIN_RESOURCES, len(X) // HALVING_FACTOR ** (n_rounds - 1))
+    order = np.random.default_rng(random_state).permutation(len(X))
+    cv = StratifiedKFold(n_splits=CV_FOLDS, shuffle=True, random_state=random_state)
+
+    rounds, scores, last_seconds, completed, last_round = [], None, None, False, None
+    with joblib.Parallel(n_jobs=n_jobs, return_as="generator") as parallel:
+        while True:
+            n_rows = min(resources, len(X))
+            if last_seconds is not None:
+                # Costo estimado: proporcional a configuraciones x filas
+                estimate = last_seconds * (len(configs) / rounds[-1]["configs"]) * (n_rows / rounds[-1]["rows"])
+                if time.perf_counter() + estimate > deadline:
+                    break
+
+            start = time.perf_counter()
+            subset = order[:n_rows]
+            Xs, ys = X[subset], y[subset]
+            folds = list(cv.split(Xs, ys))
+            # Resultados en orden (mejores configuraciones primero desde la 2a ronda);
+            # al vencer el plazo se cierra el generador y joblib cancela lo pendiente
+            fold_scores = []
+            results = parallel(
+                joblib.delayed(_evaluate)(pipeline, params, Xs, ys, train_idx, val_idx)
+                for params in configs
+                for train_idx, val_idx in folds
+            )
+            for score in results:
+                fold_scores.append(score)
+                if time.perf_counter() > deadline and len(fold_scores) < len(configs) * len(folds):
+                    results.close()
+                    break
+            evaluated = len(fold_scores) // len(folds)
+            if evaluated == 0:
+                break
+            truncated = evaluated < len(configs)
+            configs = configs[:evaluated]
+            scores = np.asarray(fold_scores[: evaluated * len(folds)], dtype=float).reshape(evaluated, -1).mean(axis=1)
+            last_seconds = time.perf_counter() - start
+            last_round = (Xs, ys, folds)
+            rounds.append(
+                {"configs": len(configs), "rows": n_rows, "best_score": round(float(scores.max()), 4),
+                 "seconds": round(last_seconds, 4)}
+            )
+
+            ranking = np.argsort(-scores, kind="stable")
+            configs = [configs[i] for i in ranking]
+            scores = scores[ranking]
+            if truncated:
+                break
+            if len(configs) == 1 or n_rows == len(X):
+                completed = True
+                break
+            keep = max(1, len(configs) // HALVING_FACTOR)
+            configs, scores = configs[:keep], scores[:keep]
+            resources *= HALVING_FACTOR
+
+        default_score = None
+        if scores is not None and not completed:
+            # Busqueda cortada: el ganador solo vio parte de las filas, se compara con
+            # los valores por defecto en las mismas filas y folds
+            Xs, ys, folds = last_round
+            default_score = float(np.mean(list(parallel(
+                joblib.delayed(_evaluate)(pipeline, {}, Xs, ys, train_idx, val_idx) for train_idx, val_idx in folds
+            ))))
+
+    if scores is None:
+        return {"params": {}, "cv_score": None, "rounds": rounds, "completed": False, "accepted": False}
+    best = {k.split("__", 1)[1]: v for k, v in configs[0].items()}
+    return {
+        "params": best,
+        "cv_score": round(float(scores[0]), 4),
+        "default_cv_score": None if default_score is None else round(default_score, 4),
+        "rounds": rounds,
+        "completed": completed,
+        "accepted": completed or float(scores[0]) > default_score,
+    }
+
+
+def tune_candidates(
+    X_train,
+    y_train,
+    scaler: str = "standard",
+    budget_seconds: float = TUNE_BUDGET_SECONDS,
+    n_configs: int = TUNE_CONFIGS,
+    n_jobs: Optional[int] = None,
+    random_state: int = 42,
+) -> Dict:
+    """
+    Busca hiperparametros para cada candidato de `SEARCH_SPACES` dentro de
+    `budget_seconds` (repartido entre candidatos; lo que sobra pasa al siguiente).
+    """
+    from .train_models import _build_pipeline, build_candidates
+
+    n_jobs = n_jobs or int(os.getenv("TRAIN_WORKERS", os.cpu_count() or 1))
+    X = np.asarray(X_train, dtype=float)
+    y = np.asarray(y_train)
+    started = time.perf_counter()
+    cache_dir = tempfile.mkdtemp(prefix="edupredict-tune-")
+    results: Dict[str, Dict] = {}
+    try:
+        memory = joblib.Memory(cache_dir, verbose=0)
+        # Un solo hilo por ajuste: el paralelismo esta en las evaluaciones
+        candidates = build_candidates(random_state, search=True)
+        names = [name for name in candidates if name in SEARCH_SPACES]
+        for position, name in enumerate(names):
+            remaining = budget_seconds - (time.perf_counter() - started)
+            deadline = time.perf_counter() + remaining / (len(names) - position)
+            pipeline = _build_pipeline(candidates[name], scaler=scaler, memory=memory)
+            start = time.perf_counter()
+            result = successive_halving(
+                pipeline, SEARCH_SPACES[name], X, y, deadline,
+                n_configs=n_configs, n_jobs=n_jobs, random_state=random_state,
+            )
+            result["seconds"] = round(time.perf_counter() - start, 4)
+            results[name] = result
+            estado = "" if result["accepted"] else f", descartada: por defecto {result.get('default_cv_score')}"
+            print(f"🔎 {name}: {result['params']} (cv {result['cv_score']}{estado}, {result['seconds']} s)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {
+        # Solo configuraciones aceptadas: el resto conserva los valores por defecto
+        "best_params": {name: result["params"] for name, result in results.items() if result["accepted"]},
+        "candidates": results,
+        "searched_at": datetime.utcnow().isoformat(),
+        "budget_seconds": budget_seconds,
+        "search_seconds": round(time.perf_counter() - started, 4),
+        "n_configs": n_configs,
+        "rows": len(X),
+    }
+
+
+def load_tuning(model_path: Path = MODEL_PATH) -> Optional[Dict]:
+    """
+    Resultado de la ultima busqueda guardado en el modelo publicado (si lo hay). Los
+    bundles anteriores a `accepted` solo conservan las busquedas completas.
+    """
+    if not model_path.exists():
+        return None
+    try:
+        tuning = joblib.load(model_path).get("tuning")
+    except Exception:  # modelo ilegible: se entrena con los valores por defecto
+        return None
+    if tuning:
+        candidates = tuning.get("candidates", {})
+        tuning["best_params"] = {
+            name: params
+            for name, params in tuning.get("best_params", {}).items()
+            if candidates.get(name, {}).get("accepted", candidates.get(name, {}).get("completed", False))
+        }
+    return tuning
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presupuesto", type=float, default=TUNE_BUDGET_SECONDS, help="Segundos para la busqueda")
+    parser.add_argument("--configs", type=int, default=TUNE_CONFIGS, help="Configuraciones por candidato")
+    args = parser.parse_args()
+
+    from .registry import load_version, train_version
+
+    version = train_version(tune=True, tune_budget=args.presupuesto, tune_configs=args.configs)
+    bundle = load_version(version)
+    print(f"Version {version}: {bundle['best_model']} {bundle['metrics']}")
+    for name, params in bundle["tuning"]["best_params"].items():
+        print(f"  {name}: {params}")
+
+
+if __name__ == "__main__":
+    main()
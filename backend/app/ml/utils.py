@@ -2,29 +2,91 @@
 
 from __future__ import annotations
 
+import os
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
 import joblib
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-
-from .preprocessing import FEATURE_COLUMNS, prepare_dataset
-from .train_models import MODEL_PATH, train_and_save_best_model
+import numpy as np
+
+from ..metrics import timed
+from .artifact import load_serving_bundle, publish_artifact
+from .constants import FEATURE_COLUMNS, MODEL_PATH
+from .fileops import model_lock
+from .inference import compiled_explain, compiled_predict_one, compiled_predict_proba, get_compiled
+
+# pandas, scikit-learn y ReportLab se importan al primer uso (ruta no compilada,
+# entrenamiento y PDF) para que importar la API no los cargue.
+
+MAX_FACTORES = 3  # variables que mas empujan hacia el riesgo predicho
+# Contribucion minima para contar como factor (logit relativo / probabilidad)
+MIN_FACTOR_LOGIT = float(os.getenv("MIN_FACTOR_LOGIT", "0.1"))
+MIN_FACTOR_PROBA = float(os.getenv("MIN_FACTOR_PROBA", "0.02"))
+
+# Por debajo de estos valores la variable es una debilidad del estudiante
+UMBRALES_DEBILIDAD = {
+    "promedio": 7.0,
+    "asistencia": 80,
+    "horas_estudio": 10,
+    "tendencia": 0,
+    "puntualidad": 90,
+    "habitos": 6,
+}
+
+# Recomendacion por variable: (cuando empuja hacia riesgo alto/medio, cuando sostiene riesgo bajo)
+RECOMENDACIONES_VARIABLE = {
+    "promedio": (
+        "Tu promedio esta elevando tu riesgo: prioriza las asignaturas con menor nota y prepara las evaluaciones con anticipacion.",
+        "Tu promedio sostiene el buen resultado; mantenlo con repasos periodicos.",
+    ),
+    "asistencia": (
+        "Regulariza tu asistencia y solicita seguimiento a docentes para evitar atrasos.",
+        "Tu asistencia constante es una fortaleza; sigue asi.",
+    ),
+    "horas_estudio": (
+        "Incrementa progresivamente tus horas de estudio a al menos 10-12 horas semanales.",
+        "Tus horas de estudio son adecuadas; distribuyelas en sesiones regulares.",
+    ),
+    "tendencia": (
+        "Revisa unidades pendientes y repasa exámenes previos para revertir la tendencia negativa.",
+        "Tu tendencia academica es positiva; aprovechala para afianzar contenidos.",
+    ),
+    "puntualidad": (
+        "Refuerza la puntualidad en entregas y clases; los retrasos estan afectando tu resultado.",
+        "Tu puntualidad ayuda a tu rendimiento; mantenla.",
+    ),
+    "habitos": (
+        "Implementa técnicas Pomodoro y espacios de estudio sin distracciones para mejorar hábitos.",
+        "Tus habitos de estudio son solidos; compartelos en grupos de estudio.",
+    ),
+}
 
 
 def load_or_train_model(force_retrain: bool = False, model_path: Path = MODEL_PATH) -> Dict:
-    """Carga el modelo desde disco o entrena uno nuevo si no existe."""
+    """
+    Carga el modelo desde disco o entrena uno nuevo si no existe. Se sirve desde el
+    artefacto mapeable en memoria (`artifact.py`) cuando el modelo es exportable.
+
+    Entre workers solo uno entrena: el resto espera el lock del modelo y, al
+    obtenerlo, encuentra el `model.pkl` ya escrito y lo carga.
+    """
     if model_path.exists() and not force_retrain:
-        return joblib.load(model_path)
+        model_bundle = load_serving_bundle(model_path)
+    else:
+        with model_lock(model_path):
+            if model_path.exists() and not force_retrain:
+                model_bundle = load_serving_bundle(model_path)
+            else:
+                from .train_models import train_and_save_best_model
 
-    model_path.parent.mkdir(parents=True, exist_ok=True)
-    return train_and_save_best_model(output_path=model_path)
+                print(f"🏋️ Entrenando modelo (pid {os.getpid()})...")
+                model_bundle = publish_artifact(train_and_save_best_model(output_path=model_path), model_path)
+
+    # Ruta de inferencia compilada (arrays NumPy) lista desde la carga
+    get_compiled(model_bundle)
+    return model_bundle
 
 
 def normalize_payload(payload: Dict) -> Dict:
@@ -42,15 +104,65 @@ def normalize_payload(payload: Dict) -> Dict:
     return normalized
 
 
-def predict_with_model(model_bundle: Dict, payload: Dict) -> Dict:
+def _explanation(compiled: Dict, riesgo: str, contributions: np.ndarray, base: float) -> Dict:
+    """Contribuciones de una fila (ordenadas por magnitud) y factores que empujan hacia `riesgo`."""
+    ranked = sorted(zip(compiled["selected"], map(float, contributions)), key=lambda item: -abs(item[1]))
+    linear = compiled["explainer"]["kind"] == "linear"
+    minimo = MIN_FACTOR_LOGIT if linear else MIN_FACTOR_PROBA
+    return {
+        "clase": riesgo,
+        "escala": "logit" if linear else "probabilidad",
+        "base": round(float(base), 4),
+        "contribuciones": {name: round(value, 4) for name, value in ranked},
+        "factores": [name for name, value in sorted(ranked, key=lambda item: -item[1]) if value >= minimo][:MAX_FACTORES],
+    }
+
+
+def _results(classes: List[str], proba: np.ndarray, explained=None, compiled: Optional[Dict] = None) -> List[Dict]:
+    labels = proba.argmax(axis=1)
+    results = [
+        {
+            "riesgo": classes[label],
+            "score": round(float(row[label]) * 100, 2),
+            "probabilidades": dict(zip(classes, map(float, row))),
+        }
+        for label, row in zip(labels, proba)
+    ]
+    if explained is not None:
+        _, contributions, base = explained
+        for result, row, row_base in zip(results, contributions, base):
+            result["explicacion"] = _explanation(compiled, result["riesgo"], row, row_base)
+    return results
+
+
+@timed("predict_with_model")
+def predict_with_model(model_bundle: Dict, payload: Dict, explain: bool = False) -> Dict:
     """
     Realiza la prediccion usando el modelo entrenado.
-    Retorna riesgo, score (0-100) y probabilidades por clase.
+    Retorna riesgo, score (0-100) y probabilidades por clase; con `explain` agrega
+    `explicacion` (contribucion de cada variable) si el modelo lo admite.
     """
     if not model_bundle:
         raise RuntimeError("Modelo no disponible")
 
     normalized = normalize_payload(payload)
+    compiled = get_compiled(model_bundle)
+    if compiled is not None and explain:
+        X = np.array([[normalized[key] for key in compiled["feature_order"]]], dtype=float)
+        explained = compiled_explain(compiled, X)
+        if explained is not None:
+            return _results(compiled["classes"], explained[0], explained, compiled)[0]
+    if compiled is not None:
+        proba = compiled_predict_one(compiled, normalized)
+        probabilities = {cls: float(prob) for cls, prob in zip(compiled["classes"], proba)}
+        return {
+            "riesgo": compiled["classes"][int(proba.argmax())],
+            "score": round(float(proba.max()) * 100, 2),
+            "probabilidades": probabilities,
+        }
+
+    import pandas as pd
+
     feature_order = model_bundle.get("feature_order", FEATURE_COLUMNS)
     model = model_bundle["model"]
 
@@ -73,8 +185,62 @@ def predict_with_model(model_bundle: Dict, payload: Dict) -> Dict:
     }
 
 
-def generate_recommendations(riesgo: str, payload: Dict) -> List[str]:
-    """Recomendaciones basadas en el nivel de riesgo y las variables clave."""
+def payloads_to_matrix(payloads: Iterable[Dict]) -> np.ndarray:
+    """Convierte payloads normalizados en una matriz float (filas x FEATURE_COLUMNS)."""
+    rows = [[payload[key] for key in FEATURE_COLUMNS] for payload in payloads]
+    return np.asarray(rows, dtype=float).reshape(len(rows), len(FEATURE_COLUMNS))
+
+
+@timed("predict_batch")
+def predict_batch(model_bundle: Dict, X: np.ndarray, explain: bool = False) -> List[Dict]:
+    """
+    Prediccion vectorizada sobre una matriz (columnas en orden FEATURE_COLUMNS).
+    Ejecuta un unico predict_proba y toma la etiqueta por argmax. Con `explain` las
+    contribuciones salen del mismo recorrido del modelo (ver `inference.compiled_explain`).
+    """
+    if not model_bundle:
+        raise RuntimeError("Modelo no disponible")
+    if len(X) == 0:
+        return []
+
+    feature_order = model_bundle.get("feature_order", FEATURE_COLUMNS)
+    if feature_order != FEATURE_COLUMNS:
+        X = X[:, [FEATURE_COLUMNS.index(col) for col in feature_order]]
+
+    compiled = get_compiled(model_bundle)
+    explained = compiled_explain(compiled, X) if compiled is not None and explain else None
+    if explained is not None:
+        return _results(compiled["classes"], explained[0], explained, compiled)
+    if compiled is not None:
+        proba = compiled_predict_proba(compiled, X)
+        classes = compiled["classes"]
+    else:
+        import pandas as pd
+
+        model = model_bundle["model"]
+        frame = pd.DataFrame(X, columns=feature_order)
+        if not hasattr(model, "predict_proba"):
+            return [
+                {"riesgo": str(label), "score": 100.0, "probabilidades": {str(label): 1.0}}
+                for label in model.predict(frame)
+            ]
+        proba = model.predict_proba(frame)
+        classes = [str(cls) for cls in model.classes_]
+
+    return _results(classes, proba)
+
+
+@timed("generate_recommendations")
+def generate_recommendations(riesgo: str, payload: Dict, factores: Optional[List[str]] = None) -> List[str]:
+    """
+    Recomendaciones basadas en el nivel de riesgo y las variables clave. Con
+    `factores` (las variables que mas empujan hacia el riesgo predicho, de la
+    explicacion del modelo, aunque sea vacia) se recomienda sobre esas variables,
+    en ese orden, y sobre las que esten bajo `UMBRALES_DEBILIDAD`.
+    """
+    if factores is not None:
+        return _recommendations_from_factors(riesgo, payload, factores)
+
     promedio = payload.get("promedio", 0)
     asistencia = payload.get("asistencia", 0)
     horas_estudio = payload.get("horas_estudio", 0)
@@ -106,8 +272,40 @@ def generate_recommendations(riesgo: str, payload: Dict) -> List[str]:
     return recs
 
 
+def _is_weak(payload: Dict, variable: str) -> bool:
+    return variable in UMBRALES_DEBILIDAD and payload.get(variable, 0) < UMBRALES_DEBILIDAD[variable]
+
+
+def _recommendations_from_factors(riesgo: str, payload: Dict, factores: List[str]) -> List[str]:
+    """
+    Recomendaciones sobre los factores del modelo, validadas contra el payload: un
+    factor solo recibe texto de debilidad si su valor esta bajo el umbral (y de
+    fortaleza si no lo esta). Las debilidades fuera de los factores se recomiendan igual.
+    """
+    fortaleza = riesgo not in {"alto", "medio"}
+    if riesgo == "alto":
+        recs = ["Agendar tutorias semanales y sesiones de refuerzo en las asignaturas con menor promedio."]
+    elif riesgo == "medio":
+        recs = ["Mantén constancia con un plan de estudio estructurado y descansos programados."]
+    else:
+        recs = ["Excelente desempeño. Continúa con tus hábitos actuales y apóyate en grupos de estudio."]
+    for factor in factores:
+        if factor in RECOMENDACIONES_VARIABLE and fortaleza != _is_weak(payload, factor):
+            recs.append(RECOMENDACIONES_VARIABLE[factor][fortaleza])
+    for variable in UMBRALES_DEBILIDAD:
+        if _is_weak(payload, variable) and not (variable in factores and not fortaleza):
+            recs.append(RECOMENDACIONES_VARIABLE[variable][0])
+    return recs
+
+
+@timed("build_pdf_report")
 def build_pdf_report(prediccion: Dict, model_bundle: Dict) -> BytesIO:
     """Genera un PDF con el resultado de la prediccion y las recomendaciones."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
@@ -182,8 +380,16 @@ def get_model_report(model_bundle: Dict) -> Dict:
     """Devuelve metadatos del modelo serializables para el dashboard."""
     return {
         "best_model": model_bundle.get("best_model"),
+        "version": model_bundle.get("version"),
         "trained_at": model_bundle.get("trained_at"),
+        "training_seconds": model_bundle.get("training_seconds"),
+        "tuning": {
+            key: model_bundle["tuning"][key] for key in ("best_params", "searched_at", "search_seconds")
+        } if model_bundle.get("tuning") else None,
         "metrics": model_bundle.get("metrics", {}),
+        "online": {
+            key: model_bundle["online"].get(key) for key in ("rows_seen", "updates", "base_model", "prequential")
+        } if model_bundle.get("online") else None,
         "all_metrics": model_bundle.get("all_metrics", {}),
         "feature_order": model_bundle.get("feature_order", FEATURE_COLUMNS),
         "selected_features": model_bundle.get("selected_features", FEATURE_COLUMNS),
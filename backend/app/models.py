@@ -3,9 +3,10 @@ Modelos de datos para EduPredict
 SQLModel (SQLAlchemy + Pydantic)
 """
 
+from sqlalchemy import JSON, Column, Index
 from sqlmodel import SQLModel, Field
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import date, datetime
 
 # ============================================
 # MODELOS DE USUARIO
@@ -55,20 +56,28 @@ class UsuarioResponse(SQLModel):
 class Prediccion(SQLModel, table=True):
     """Modelo de Prediccion en BD"""
     __tablename__ = "predicciones"
+    __table_args__ = (
+        # Paginacion por keyset y lectura incremental de resultados confirmados
+        Index("ix_predicciones_created_at_id", "created_at", "id"),
+        Index("ix_predicciones_confirmado_at_id", "confirmado_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    usuario_id: Optional[int] = Field(default=None, foreign_key="usuarios.id")
+    usuario_id: Optional[int] = Field(default=None, foreign_key="usuarios.id", index=True)
     promedio: float = Field(ge=0, le=10)  # 0-10
     asistencia: float = Field(ge=0, le=100)  # 0-100%
     horas_estudio: float = Field(ge=0, le=60)  # 0-60 horas/semana
     tendencia: float = Field(default=0)  # tendencia academica (diferencia con periodos previos)
     puntualidad: float = Field(ge=0, le=100)  # 0-100%
     habitos: float = Field(ge=0, le=10)  # auto-reporte de habitos de estudio
-    riesgo: str = Field(max_length=20)  # bajo, medio, alto
+    riesgo: str = Field(max_length=20, index=True)  # bajo, medio, alto
     score: float = Field(ge=0, le=100)  # score calculado 0-100
     recomendacion: str = Field(max_length=500)
-    modelo: Optional[str] = Field(default=None, max_length=100)
+    modelo: Optional[str] = Field(default=None, max_length=100)  # algoritmo (best_model)
+    modelo_version: Optional[str] = Field(default=None, max_length=40)  # version del registro
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    riesgo_real: Optional[str] = Field(default=None, max_length=20)  # resultado confirmado
+    confirmado_at: Optional[datetime] = Field(default=None)
 
 
 class PrediccionCreate(SQLModel):
@@ -96,8 +105,105 @@ class PrediccionResponse(SQLModel):
     score: float
     recomendacion: str
     modelo: Optional[str]
+    modelo_version: Optional[str] = None
     created_at: datetime
+    riesgo_real: Optional[str] = None
+    confirmado_at: Optional[datetime] = None
     recomendaciones: Optional[list] = None
     pdf_url: Optional[str] = None
     alerta_docente: Optional[bool] = None
     probabilidades: Optional[dict] = None
+    explicacion: Optional[dict] = None  # contribucion de cada variable al riesgo predicho
+
+
+class PrediccionResultado(SQLModel):
+    """Schema para confirmar el resultado real de una prediccion"""
+    riesgo_real: str
+
+
+class PrediccionLoteCreate(SQLModel):
+    """Schema para crear predicciones en lote"""
+    predicciones: List[PrediccionCreate]
+
+
+class ExporteReportesCreate(SQLModel):
+    """Filtro de un exporte masivo de reportes PDF (todos los campos son opcionales)"""
+    riesgo: Optional[List[str]] = None  # alto, medio, bajo
+    desde: Optional[date] = None
+    hasta: Optional[date] = None  # inclusive
+    usuario_ids: Optional[List[int]] = None
+    formato: str = "zip"  # zip (un PDF por prediccion) o pdf (un solo PDF de varias paginas)
+
+
+class PrediccionLoteError(SQLModel):
+    """Fila rechazada dentro de un lote"""
+    indice: int
+    errores: List[str]
+
+
+class PrediccionLoteResponse(SQLModel):
+    """Schema de respuesta de prediccion en lote"""
+    total: int
+    procesadas: int
+    predicciones: List[PrediccionResponse]
+    errores: List[PrediccionLoteError]
+
+
+# ============================================
+# RESUMEN DE ESTADISTICAS
+# ============================================
+
+class ResumenEstadisticas(SQLModel, table=True):
+    """Contadores del dashboard (una sola fila, id=1), mantenidos en la misma transaccion
+    que cada insercion de Prediccion/Usuario (ver `app/stats_summary.py`)."""
+    __tablename__ = "resumen_estadisticas"
+
+    id: int = Field(default=1, primary_key=True)
+    total_usuarios: int = Field(default=0)
+    total_predicciones: int = Field(default=0)
+    riesgo_alto: int = Field(default=0)
+    riesgo_medio: int = Field(default=0)
+    riesgo_bajo: int = Field(default=0)
+    suma_score: float = Field(default=0)
+    alertas_tempranas: int = Field(default=0)
+    actualizado_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ResumenDiario(SQLModel, table=True):
+    """Predicciones por dia, algoritmo y version del modelo (base de `/api/stats/trend`),
+    mantenidas como el resumen."""
+    __tablename__ = "resumen_diario"
+
+    dia: date = Field(primary_key=True)
+    modelo: str = Field(default="", primary_key=True, max_length=100)  # "" = sin modelo
+    version: str = Field(default="", primary_key=True, max_length=40)  # "" = sin version
+    total: int = Field(default=0)
+    riesgo_alto: int = Field(default=0)
+    riesgo_medio: int = Field(default=0)
+    riesgo_bajo: int = Field(default=0)
+    suma_score: float = Field(default=0)
+
+
+class SecuenciaId(SQLModel, table=True):
+    """Bloques de ids reservados por adelantado en SQLite (escritura diferida de predicciones).
+    En PostgreSQL se usa la secuencia de la columna id."""
+    __tablename__ = "secuencias_id"
+
+    nombre: str = Field(primary_key=True, max_length=50)
+    valor: int = Field(default=0)  # ultimo id reservado
+
+
+# ============================================
+# TRABAJOS EN SEGUNDO PLANO
+# ============================================
+
+class Trabajo(SQLModel, table=True):
+    """Estado de un trabajo en segundo plano (ver `app/jobs.py`), compartido entre workers."""
+    __tablename__ = "trabajos"
+
+    id: str = Field(primary_key=True, max_length=32)
+    tipo: str = Field(index=True, max_length=50)
+    estado: str = Field(index=True, max_length=20)
+    creado: datetime = Field(default_factory=datetime.utcnow)
+    actualizado: datetime = Field(default_factory=datetime.utcnow)
+    datos: Dict = Field(default_factory=dict, sa_column=Column(JSON))  # estado completo del trabajo
@@ -0,0 +1,236 @@
+"""Cache de reportes PDF direccionada por contenido.
+
+La clave es un hash de lo que determina el PDF: id de la prediccion, version del
+modelo y sus metricas. Los PDFs viven en un LRU en memoria limitado por bytes
+(PDF_CACHE_MAX_BYTES); lo que sale del LRU se vuelca a disco (PDF_CACHE_DIR) y se
+vuelve a promover a memoria cuando se pide de nuevo.
+
+En disco cada version del modelo tiene su directorio: al publicar otra version se
+borran los de las anteriores (`purge_pdf_cache`). El disco ademas se limita por
+bytes (PDF_CACHE_DISK_MAX_BYTES) y por antiguedad (PDF_CACHE_TTL_HOURS): al
+excederse se borran primero los vencidos y luego los usados hace mas tiempo.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .ml.utils import build_pdf_report
+
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PDF_CACHE_DIR = Path(os.getenv("PDF_CACHE_DIR", "./data/pdf_cache"))
+PDF_CACHE_DISK_MAX_BYTES = int(os.getenv("PDF_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+PDF_CACHE_TTL_HOURS = float(os.getenv("PDF_CACHE_TTL_HOURS", "168"))
+ZIP_WINDOW = 32  # PDFs en vuelo por ventana al armar un ZIP
+
+_MEMORY: "OrderedDict[str, bytes]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"bytes": 0, "hits": 0, "disk_hits": 0, "misses": 0, "disk_bytes": None, "disk_purged": 0}
+
+
+def version_tag(model_bundle: Dict) -> str:
+    """Prefijo de las claves (y directorio en disco) de una version del modelo."""
+    version = (model_bundle or {}).get("version") or (model_bundle or {}).get("trained_at")
+    return hashlib.sha256(str(version).encode("utf-8")).hexdigest()[:12]
+
+
+def report_cache_key(prediccion: Dict, model_bundle: Dict) -> str:
+    """Clave del PDF: prediccion + version y metricas del modelo con que se genera."""
+    metrics = (model_bundle or {}).get("metrics", {})
+    raw = "|".join(
+        [
+            str(prediccion.get("id")),
+            str((model_bundle or {}).get("version") or (model_bundle or {}).get("trained_at")),
+            f"{metrics.get('accuracy', 0):.6f}",
+            f"{metrics.get('f1_weighted', 0):.6f}",
+        ]
+    )
+    return f"{version_tag(model_bundle)}-{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def _disk_path(key: str) -> Path:
+    tag, digest = key.split("-", 1)
+    return PDF_CACHE_DIR / tag / digest[:2] / f"{digest}.pdf"
+
+
+def _disk_files() -> List[Path]:
+    return list(PDF_CACHE_DIR.glob("*/*/*.pdf")) if PDF_CACHE_DIR.exists() else []
+
+
+def _trim_disk() -> None:
+    """Borra los PDFs vencidos y, si aun se excede el limite, los usados hace mas tiempo."""
+    limite = time.time() - PDF_CACHE_TTL_HOURS * 3600
+    entries = []
+    for path in _disk_files():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    purged = 0
+    # Se baja al 90% del limite para no recorrer el directorio en cada volcado
+    for mtime, size, path in entries:
+        if mtime >= limite and total <= PDF_CACHE_DISK_MAX_BYTES * 0.9:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        purged += 1
+    with _LOCK:
+        _STATS["disk_bytes"] = total
+        _STATS["disk_purged"] += purged
+
+
+def _spill(key: str, data: bytes) -> None:
+    path = _disk_path(key)
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    with _LOCK:
+        known = _STATS["disk_bytes"] is not None
+        if known:
+            _STATS["disk_bytes"] += len(data)
+        over = not known or _STATS["disk_bytes"] > PDF_CACHE_DISK_MAX_BYTES
+    if over:
+        _trim_disk()
+
+
+def purge_pdf_cache(model_bundle: Dict) -> None:
+    """Descarta los PDFs de versiones distintas a la de `model_bundle` (memoria y disco)."""
+    tag = version_tag(model_bundle)
+    with _LOCK:
+        for key in [key for key in _MEMORY if not key.startswith(f"{tag}-")]:
+            _STATS["bytes"] -= len(_MEMORY.pop(key))
+    if PDF_CACHE_DIR.exists():
+        for path in PDF_CACHE_DIR.iterdir():
+            if path.name == tag:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+    _trim_disk()
+
+
+def _remember(key: str, data: bytes) -> None:
+    """Inserta en el LRU y vuelca a disco lo que exceda el limite de bytes."""
+    evicted = []
+    with _LOCK:
+        if key in _MEMORY:
+            _MEMORY.move_to_end(key)
+            return
+        _MEMORY[key] = data
+        _STATS["bytes"] += len(data)
+        while _STATS["bytes"] > PDF_CACHE_MAX_BYTES and len(_MEMORY) > 1:
+            old_key, old_data = _MEMORY.popitem(last=False)
+            _STATS["bytes"] -= len(old_data)
+            evicted.append((old_key, old_data))
+    for old_key, old_data in evicted:
+        _spill(old_key, old_data)
+
+
+def get_cached_pdf(key: str) -> Optional[bytes]:
+    """PDF desde memoria o, si fue volcado, desde disco (se promueve al LRU)."""
+    with _LOCK:
+        data = _MEMORY.get(key)
+        if data is not None:
+            _MEMORY.move_to_end(key)
+            _STATS["hits"] += 1
+            return data
+
+    path = _disk_path(key)
+    try:
+        data = path.read_bytes()
+        os.utime(path)  # la antiguedad cuenta desde el ultimo uso
+    except FileNotFoundError:  # nunca volcado, o borrado por los limites de disco
+        data = None
+    if data is not None:
+        with _LOCK:
+            _STATS["disk_hits"] += 1
+        _remember(key, data)
+        return data
+    return None
+
+
+def get_or_build_pdf(prediccion: Dict, model_bundle: Dict) -> bytes:
+    """PDF de una prediccion desde la cache, generandolo con ReportLab si no existe."""
+    key = report_cache_key(prediccion, model_bundle)
+    data = get_cached_pdf(key)
+    if data is None:
+        with _LOCK:
+            _STATS["misses"] += 1
+        data = build_pdf_report(prediccion, model_bundle).getvalue()
+        _remember(key, data)
+    return data
+
+
+def pdf_cache_stats() -> Dict:
+    with _LOCK:
+        return {
+            **_STATS,
+            "entries": len(_MEMORY),
+            "max_bytes": PDF_CACHE_MAX_BYTES,
+            "disk_max_bytes": PDF_CACHE_DISK_MAX_BYTES,
+        }
+
+
+class _ZipSink(io.RawIOBase):
+    """Destino no buscable para zipfile: acumula bytes hasta que se drenan."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_pdf_zip(predicciones: List[Dict], model_bundle: Dict, executor: Executor) -> Iterator[bytes]:
+    """
+    Genera un ZIP en streaming con el PDF de cada prediccion. Los fallos de cache
+    se generan en el executor por ventanas de ZIP_WINDOW para acotar la memoria.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for start in range(0, len(predicciones), ZIP_WINDOW):
+            window = predicciones[start:start + ZIP_WINDOW]
+            pending = []
+            for pred in window:
+                data = get_cached_pdf(report_cache_key(pred, model_bundle))
+                if data is None:
+                    data = executor.submit(get_or_build_pdf, pred, model_bundle)
+                pending.append((pred, data))
+
+            for pred, data in pending:
+                if not isinstance(data, bytes):
+                    data = data.result()
+                archive.writestr(f"reporte-prediccion-{pred['id']}.pdf", data)
+                yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,75 @@
+"""Cache en proceso de resultados de prediccion (LRU acotado por tamano).
+
+Los estudiantes reenvian el formulario con los mismos valores mientras lo prueban.
+La clave es la version del modelo mas el vector exacto de variables normalizadas (sin
+redondear: el score y los umbrales de las recomendaciones, como `asistencia < 80`,
+dependen del valor exacto), y el valor es el resultado del modelo junto con sus
+recomendaciones. Al reemplazar
+MODEL_BUNDLE la cache se vacia (`clear_prediction_cache` en `swap_model_bundle`);
+la version en la clave evita ademas que un resultado calculado con el modelo
+anterior se sirva con el nuevo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .ml.constants import FEATURE_COLUMNS
+
+PREDICTION_CACHE_MAX = int(os.getenv("PREDICTION_CACHE_MAX", "4096"))  # 0 = deshabilitada
+
+_CACHE: "OrderedDict[Tuple, Tuple[Dict, List[str]]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def prediction_key(model_bundle: Dict, payload: Dict) -> Tuple:
+    """Version del modelo + variables normalizadas exactas."""
+    version = model_bundle.get("version") or model_bundle.get("trained_at") or id(model_bundle)
+    return (version, *(float(payload[key]) for key in FEATURE_COLUMNS))
+
+
+def get_cached_prediction(key: Tuple) -> Optional[Tuple[Dict, List[str]]]:
+    """(resultado del modelo, recomendaciones) o None. El resultado es compartido: no modificarlo."""
+    if PREDICTION_CACHE_MAX <= 0:
+        return None
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            _STATS["misses"] += 1
+            return None
+        _CACHE.move_to_end(key)
+        _STATS["hits"] += 1
+        return entry
+
+
+def cache_prediction(key: Tuple, ml_result: Dict, recomendaciones: List[str]) -> None:
+    if PREDICTION_CACHE_MAX <= 0:
+        return
+    with _LOCK:
+        _CACHE[key] = (ml_result, recomendaciones)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > PREDICTION_CACHE_MAX:
+            _CACHE.popitem(last=False)
+
+
+def clear_prediction_cache() -> None:
+    """Vacia la cache (el modelo servido cambio)."""
+    with _LOCK:
+        _CACHE.clear()
+        _STATS["invalidations"] += 1
+
+
+def prediction_cache_stats() -> Dict:
+    with _LOCK:
+        total = _STATS["hits"] + _STATS["misses"]
+        return {
+            **_STATS,
+            "hit_ratio": round(_STATS["hits"] / total, 4) if total else 0.0,
+            "size": len(_CACHE),
+            "max_size": PREDICTION_CACHE_MAX,
+            "decimals": PREDICTION_CACHE_DECIMALS,
+        }
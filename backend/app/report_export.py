@@ -0,0 +1,190 @@
+"""Exportes masivos de reportes PDF en segundo plano.
+
+Al cierre de cada parcial se piden los reportes de toda una cohorte (por ejemplo,
+todos los estudiantes en riesgo alto). En vez de pedir `/api/predictions/{id}/pdf`
+uno por uno, un exporte:
+- se lanza con un filtro (riesgo, rango de fechas, usuarios) y retorna un trabajo,
+- lee las predicciones en streaming (`yield_per`) y envia cada bloque de
+  EXPORT_PDF_CHUNK en cuanto se llena a un pool de procesos (EXPORT_WORKERS) que los
+  genera con `build_pdf_report`, fuera de los hilos de la API (ReportLab es Python
+  puro y competiria por el GIL); a lo sumo 2 x EXPORT_WORKERS bloques en vuelo,
+- publica el avance en el trabajo (`progreso`) a medida que termina cada bloque,
+- arma un unico PDF de varias paginas (pypdf) o un ZIP en EXPORT_DIR, que se
+  descarga cuando el trabajo esta completado y se borra pasadas EXPORT_TTL_HOURS.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Executor, wait
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .jobs import update_job
+from .ml.utils import build_pdf_report
+from .models import Prediccion
+
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", "./data/exports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_PDF_CHUNK = int(os.getenv("EXPORT_PDF_CHUNK", "50"))
+EXPORT_MAX_REPORTS = int(os.getenv("EXPORT_MAX_REPORTS", "5000"))
+EXPORT_TTL_HOURS = float(os.getenv("EXPORT_TTL_HOURS", "24"))
+FORMATOS = {"pdf": "application/pdf", "zip": "application/zip"}
+
+
+def export_path(job_id: str, formato: str) -> Path:
+    return EXPORT_DIR / f"reportes-{job_id}.{formato}"
+
+
+def export_query(
+    riesgo: Optional[List[str]] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    usuario_ids: Optional[List[int]] = None,
+):
+    """Consulta de las predicciones que cumplen el filtro (`hasta` inclusive)."""
+    query = select(Prediccion)
+    if riesgo:
+        query = query.where(Prediccion.riesgo.in_(riesgo))
+    if desde:
+        query = query.where(Prediccion.created_at >= datetime.combine(desde, datetime.min.time()))
+    if hasta:
+        query = query.where(Prediccion.created_at < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    if usuario_ids:
+        query = query.where(Prediccion.usuario_id.in_(usuario_ids))
+    return query
+
+
+def purge_exports() -> None:
+    """Borra los archivos de exportes mas antiguos que EXPORT_TTL_HOURS."""
+    if not EXPORT_DIR.exists():
+        return
+    limite = time.time() - EXPORT_TTL_HOURS * 3600
+    for path in EXPORT_DIR.iterdir():
+        try:
+            if path.stat().st_mtime >= limite:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError:
+            pass
+
+
+# ============================================
+# EN LOS PROCESOS DEL POOL
+# ============================================
+def render_chunk(predicciones: List[Dict], model_bundle: Dict, formato: str, part_path: str) -> int:
+    """Genera los PDFs de un bloque en `part_path` (un PDF de varias paginas o un ZIP)."""
+    if formato == "pdf":
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for pred in predicciones:
+            writer.append(build_pdf_report(pred, model_bundle))
+        with open(part_path, "wb") as fh:
+            writer.write(fh)
+    else:
+        # Sin comprimir: el ZIP final comprime una sola vez
+        with zipfile.ZipFile(part_path, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for pred in predicciones:
+                archive.writestr(f"reporte-prediccion-{pred['id']}.pdf", build_pdf_report(pred, model_bundle).getvalue())
+    return len(predicciones)
+
+
+def assemble_export(parts: List[str], formato: str, output: str) -> int:
+    """Une los bloques en el archivo final (escritura atomica) y retorna su tamano."""
+    tmp = f"{output}.tmp"
+    if formato == "pdf":
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        with open(tmp, "wb") as fh:
+            writer.write(fh)
+    else:
+        with zipfile.ZipFile(tmp, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for part in parts:
+                with zipfile.ZipFile(part) as chunk:
+                    for info in chunk.infolist():
+                        archive.writestr(info.filename, chunk.read(info))
+    os.replace(tmp, output)
+    return os.path.getsize(output)
+
+
+# ============================================
+# COORDINACION (HILO DEL EXPORTE)
+# ============================================
+def run_export(
+    job_id: str,
+    engine,
+    filtro: Dict,
+    formato: str,
+    model_bundle: Dict,
+    executor: Executor,
+) -> Dict:
+    """
+    Lee las predicciones del filtro por bloques, los reparte en `executor` (procesos)
+    a medida que se llenan y arma el archivo final. Corre en un hilo: solo espera
+    resultados del pool. En memoria hay a lo sumo los bloques en vuelo.
+    """
+    start = time.perf_counter()
+    query = export_query(**filtro)
+    # Los PDFs solo usan las metricas del modelo: no enviar los pipelines a cada proceso
+    report_bundle = {"metrics": (model_bundle or {}).get("metrics", {})}
+    parts_dir = EXPORT_DIR / f"reportes-{job_id}.partes"
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    parts: List[str] = []
+    pending = set()
+    hechos = 0
+
+    def _collect(return_when) -> None:
+        nonlocal pending, hechos
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            hechos += future.result()
+        if done:
+            update_job(
+                job_id,
+                progreso={"hechos": hechos, "total": total, "porcentaje": round(100 * hechos / max(total, 1), 1)},
+            )
+
+    try:
+        with Session(engine) as session:
+            total = session.exec(select(func.count()).select_from(query.subquery())).one()
+            update_job(job_id, progreso={"hechos": 0, "total": total, "porcentaje": 0.0})
+            rows = session.exec(
+                query.order_by(Prediccion.created_at, Prediccion.id).execution_options(yield_per=EXPORT_PDF_CHUNK)
+            )
+            try:
+                for bloque in rows.partitions(EXPORT_PDF_CHUNK):
+                    part = str(parts_dir / f"{len(parts):07d}.{formato}")
+                    parts.append(part)
+                    pending.add(executor.submit(render_chunk, [p.dict() for p in bloque], report_bundle, formato, part))
+                    if len(pending) >= 2 * EXPORT_WORKERS:
+                        _collect(FIRST_COMPLETED)
+            finally:
+                rows.close()  # cursor abierto: si un bloque falla, liberar la conexion
+        _collect(ALL_COMPLETED)
+        output = export_path(job_id, formato)
+        size = executor.submit(assemble_export, parts, formato, str(output)).result()
+    finally:
+        for future in pending:
+            future.cancel()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return {
+        "reportes": hechos,
+        "formato": formato,
+        "bytes": size,
+        "segundos": round(time.perf_counter() - start, 3),
+    }
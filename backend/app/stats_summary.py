@@ -0,0 +1,321 @@
+"""Resumen de estadisticas del dashboard mantenido de forma incremental.
+
+`/api/stats` recorria `predicciones` en cada consulta del dashboard. La tabla
+`resumen_estadisticas` guarda una sola fila con los contadores (usuarios,
+predicciones por riesgo, suma de scores y alertas) y la consulta pasa a ser una
+lectura por clave primaria, sin importar cuantas predicciones haya.
+
+Un listener `after_flush` de la Session suma los deltas de los Usuario/Prediccion
+insertados o borrados en cada flush con un unico UPDATE relativo (`col = col + :n`)
+en la misma transaccion: si la transaccion se revierte, el resumen tambien. El UPDATE
+relativo es seguro entre workers (bloqueo de fila en PostgreSQL, de escritura en SQLite).
+
+El mismo listener mantiene `resumen_diario` (predicciones por dia, algoritmo y version
+del modelo del registro, con un upsert por flush): `/api/stats/trend` agrega esas filas en dias, semanas o meses
+sin leer `predicciones`, y si el rango tiene mas de `max_puntos` buckets los une de
+a k consecutivos (los contadores son sumables, el resultado es exacto).
+
+Lo que no pasa por la Session (inserciones masivas con Core, SQL manual) no se
+refleja; el resumen y los rollups se reconstruyen desde cero con:
+    python -m app.stats_summary
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, event, func, insert, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from .models import Prediccion, ResumenDiario, ResumenEstadisticas, Usuario
+
+SUMMARY_ID = 1
+RIESGOS = ("alto", "medio", "bajo")
+BUCKETS = ("day", "week", "month")
+TREND_MAX_POINTS = 120
+TREND_MAX_DAYS = 3660  # rango maximo de `/api/stats/trend` (~10 anos)
+_DAILY_COLUMNS = ("total", "riesgo_alto", "riesgo_medio", "riesgo_bajo", "suma_score")
+
+
+def _deltas(session) -> Counter:
+    deltas: Counter = Counter()
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if isinstance(obj, Usuario):
+                deltas["total_usuarios"] += sign
+            elif isinstance(obj, Prediccion):
+                deltas["total_predicciones"] += sign
+                deltas["suma_score"] += sign * float(obj.score or 0)
+                if obj.riesgo in RIESGOS:
+                    deltas[f"riesgo_{obj.riesgo}"] += sign
+                if obj.riesgo == "alto":  # misma regla que `alerta_docente`
+                    deltas["alertas_tempranas"] += sign
+    return deltas
+
+
+def _daily_deltas(session) -> List[Dict]:
+    """Deltas de `resumen_diario` por (dia, modelo, version) de las predicciones del flush."""
+    rows: Dict = defaultdict(Counter)
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if isinstance(obj, Prediccion):
+                row = rows[((obj.created_at or datetime.utcnow()).date(), obj.modelo or "", obj.modelo_version or "")]
+                row["total"] += sign
+                row["suma_score"] += sign * float(obj.score or 0)
+                if obj.riesgo in RIESGOS:
+                    row[f"riesgo_{obj.riesgo}"] += sign
+    return [
+        {"dia": dia, "modelo": modelo, "version": version, **{column: row.get(column, 0) for column in _DAILY_COLUMNS}}
+        for (dia, modelo, version), row in rows.items()
+    ]
+
+
+def _upsert_daily(connection, rows: List[Dict]) -> None:
+    """Suma los deltas en `resumen_diario` (INSERT ... ON CONFLICT DO UPDATE)."""
+    table = ResumenDiario.__table__
+    dialect = connection.dialect.name
+    if dialect in {"sqlite", "postgresql"}:
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["dia", "modelo", "version"],
+                set_={column: table.c[column] + stmt.excluded[column] for column in _DAILY_COLUMNS},
+            )
+        )
+        return
+    for row in rows:  # otros motores: UPDATE y, si no existia, INSERT
+        result = connection.execute(
+            update(table)
+            .where(table.c.dia == row["dia"], table.c.modelo == row["modelo"], table.c.version == row["version"])
+            .values({column: table.c[column] + row[column] for column in _DAILY_COLUMNS})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(row))
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _update_summary(session, flush_context) -> None:
+    # En after_flush `new` y `deleted` aun tienen el estado previo al flush
+    deltas = {column: delta for column, delta in _deltas(session).items() if delta}
+    if not deltas:
+        return
+    table = ResumenEstadisticas.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c.id == SUMMARY_ID)
+        .values(
+            {column: table.c[column] + delta for column, delta in deltas.items()}
+            | {"actualizado_at": datetime.utcnow()}
+        )
+    )
+    daily = _daily_deltas(session)
+    if daily:
+        _upsert_daily(session.connection(), daily)
+
+
+def rebuild_summary(session: Session) -> ResumenEstadisticas:
+    """
+    Recalcula el resumen y `resumen_diario` desde `predicciones` y `usuarios`
+    (reparacion de consistencia).
+    """
+    table = ResumenEstadisticas.__table__
+    # Tomar primero el bloqueo de la fila: los inserts concurrentes esperan y suman despues
+    session.exec(update(table).where(table.c.id == SUMMARY_ID).values(actualizado_at=datetime.utcnow()))
+    _rebuild_daily(session)
+
+    por_riesgo = {
+        riesgo: (count, float(suma or 0))
+        for riesgo, count, suma in session.exec(
+            select(Prediccion.riesgo, func.count(), func.sum(Prediccion.score)).group_by(Prediccion.riesgo)
+        ).all()
+    }
+    resumen = session.get(ResumenEstadisticas, SUMMARY_ID) or ResumenEstadisticas(id=SUMMARY_ID)
+    resumen.total_usuarios = session.exec(select(func.count()).select_from(Usuario)).one()
+    resumen.total_predicciones = sum(count for count, _ in por_riesgo.values())
+    resumen.suma_score = sum(suma for _, suma in por_riesgo.values())
+    for riesgo in RIESGOS:
+        setattr(resumen, f"riesgo_{riesgo}", por_riesgo.get(riesgo, (0, 0.0))[0])
+    resumen.alertas_tempranas = resumen.riesgo_alto
+    resumen.actualizado_at = datetime.utcnow()
+    session.add(resumen)
+    session.commit()
+    session.refresh(resumen)
+    return resumen
+
+
+def _rebuild_daily(session: Session) -> None:
+    dia = func.date(Prediccion.created_at)
+    grouped = session.exec(
+        select(dia, Prediccion.modelo, Prediccion.modelo_version, Prediccion.riesgo, func.count(), func.sum(Prediccion.score))
+        .group_by(dia, Prediccion.modelo, Prediccion.modelo_version, Prediccion.riesgo)
+    ).all()
+    rows: Dict = {}
+    for day, modelo, version, riesgo, count, suma in grouped:
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        row = rows.setdefault(
+            (day, modelo or "", version or ""),
+            {"dia": day, "modelo": modelo or "", "version": version or "", **dict.fromkeys(_DAILY_COLUMNS, 0)},
+        )
+        row["total"] += count
+        row["suma_score"] += float(suma or 0)
+        if riesgo in RIESGOS:
+            row[f"riesgo_{riesgo}"] += count
+    table = ResumenDiario.__table__
+    session.exec(delete(table))
+    if rows:
+        session.exec(insert(table), params=list(rows.values()))
+
+
+def _migrate_daily(session: Session) -> bool:
+    """
+    `resumen_diario` sin la columna `version` (clave anterior dia + modelo): como es
+    derivada, se recrea vacia con la clave nueva. Retorna True si se recreo.
+    """
+    connection = session.connection()
+    if "version" in {col["name"] for col in inspect(connection).get_columns(ResumenDiario.__tablename__)}:
+        return False
+    ResumenDiario.__table__.drop(connection)
+    ResumenDiario.__table__.create(connection)
+    session.commit()
+    return True
+
+
+def ensure_summary(session: Session) -> None:
+    """
+    Crea el resumen (calculado desde los datos existentes) si la fila no existe, o si
+    `resumen_diario` esta vacio con predicciones ya guardadas (BD anterior a los rollups
+    o a la clave por version).
+    """
+    _migrate_daily(session)
+    if session.get(ResumenEstadisticas, SUMMARY_ID) is None:
+        rebuild_summary(session)
+    elif session.exec(select(ResumenDiario.dia).limit(1)).first() is None and session.exec(
+        select(Prediccion.id).limit(1)
+    ).first() is not None:
+        rebuild_summary(session)
+
+
+def read_summary(session: Session) -> ResumenEstadisticas:
+    """Fila del resumen; si falta (BD creada sin `create_db_and_tables`) se reconstruye."""
+    resumen = session.get(ResumenEstadisticas, SUMMARY_ID)
+    if resumen is not None:
+        return resumen
+    try:
+        return rebuild_summary(session)
+    except IntegrityError:  # otro worker la creo al mismo tiempo
+        session.rollback()
+        return session.get(ResumenEstadisticas, SUMMARY_ID)
+
+
+def summary_dict(resumen: ResumenEstadisticas) -> Dict:
+    return {
+        "total_usuarios": resumen.total_usuarios,
+        "total_predicciones": resumen.total_predicciones,
+        "riesgo_alto": resumen.riesgo_alto,
+        "riesgo_medio": resumen.riesgo_medio,
+        "riesgo_bajo": resumen.riesgo_bajo,
+        "score_promedio": round(resumen.suma_score / resumen.total_predicciones, 2)
+        if resumen.total_predicciones else 0.0,
+        "alertas_tempranas": resumen.alertas_tempranas,
+    }
+
+
+def _bucket_index(day: date, bucket: str) -> int:
+    """Numero absoluto del bucket que contiene `day` (dias, semanas ISO o meses)."""
+    if bucket == "week":
+        return (day.toordinal() - 1) // 7  # date.min (0001-01-01) es lunes
+    if bucket == "month":
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def _bucket_start(index: int, bucket: str) -> date:
+    if bucket == "week":
+        return date.fromordinal(index * 7 + 1)
+    if bucket == "month":
+        return date(index // 12, index % 12 + 1, 1)
+    return date.fromordinal(index)
+
+
+def trend(
+    session: Session,
+    bucket: str,
+    desde: date,
+    hasta: date,
+    modelo: Optional[str] = None,
+    version: Optional[str] = None,
+    max_points: int = TREND_MAX_POINTS,
+) -> Dict:
+    """
+    Serie de la mezcla de riesgo por bucket (day, week o month) entre `desde` y `hasta`
+    (inclusive), desde `resumen_diario`. Los buckets sin predicciones van en cero; si
+    hay mas de `max_points` se agrupan de a `paso` buckets consecutivos. El costo
+    depende de los puntos devueltos y de las filas del rango, no del largo del rango.
+    `modelo` filtra por algoritmo y `version` por version del registro.
+    """
+    query = select(ResumenDiario).where(ResumenDiario.dia >= desde, ResumenDiario.dia <= hasta)
+    if modelo is not None:
+        query = query.where(ResumenDiario.modelo == modelo)
+    if version is not None:
+        query = query.where(ResumenDiario.version == version)
+
+    first = _bucket_index(desde, bucket)
+    n_buckets = _bucket_index(hasta, bucket) - first + 1
+    step = max(1, math.ceil(n_buckets / max_points))
+    points = [
+        {"inicio": _bucket_start(first + i, bucket).isoformat(), **dict.fromkeys(_DAILY_COLUMNS, 0)}
+        for i in range(0, n_buckets, step)
+    ]
+    modelos, versiones = set(), set()
+    for row in session.exec(query):
+        point = points[(_bucket_index(row.dia, bucket) - first) // step]
+        for column in _DAILY_COLUMNS:
+            point[column] += getattr(row, column)
+        modelos.add(row.modelo or None)
+        versiones.add(row.version or None)
+
+    for point in points:
+        total, suma = point["total"], point.pop("suma_score")
+        point["score_promedio"] = round(suma / total, 2) if total else None
+        point["proporciones"] = {
+            riesgo: round(point[f"riesgo_{riesgo}"] / total, 4) if total else None for riesgo in RIESGOS
+        }
+    return {
+        "bucket": bucket,
+        "paso": step,  # buckets agrupados por punto (1 = sin submuestreo)
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "modelo": modelo,
+        "version": version,
+        "modelos": sorted(modelos, key=lambda m: m or ""),
+        "versiones": sorted(versiones, key=lambda v: v or ""),
+        "puntos": points,
+    }
+
+
+def main():
+    from .database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        anterior = session.get(ResumenEstadisticas, SUMMARY_ID)
+        anterior = summary_dict(anterior) if anterior else None
+        nuevo = summary_dict(rebuild_summary(session))
+    if anterior is None or anterior == nuevo:
+        print(f"✅ Resumen de estadisticas consistente: {nuevo}")
+    else:
+        diferencias = {k: (anterior[k], v) for k, v in nuevo.items() if anterior[k] != v}
+        print(f"🔧 Resumen de estadisticas reparado (antes, ahora): {diferencias}")
+
+
+if __name__ == "__main__":
+    main()
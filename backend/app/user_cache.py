@@ -0,0 +1,73 @@
+"""Cache en proceso de usuarios autenticados (TTL + LRU acotado por tamano).
+
+La clave es el par (sub, id) del JWT. Las entradas de un usuario se invalidan
+cuando ese usuario se actualiza o elimina (eventos de SQLAlchemy sobre Usuario).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from .models import Usuario
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "1024"))
+
+_CACHE: "OrderedDict[Tuple[str, Optional[int]], Tuple[float, Dict]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0}
+
+
+def get_cached_user(sub: str, user_id: Optional[int]) -> Optional[Usuario]:
+    """Usuario cacheado (copia transitoria) o None si no existe o expiro."""
+    key = (sub, user_id)
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del _CACHE[key]
+            _STATS["misses"] += 1
+            return None
+        _CACHE.move_to_end(key)
+        _STATS["hits"] += 1
+        data = entry[1]
+    return Usuario(**data)
+
+
+def cache_user(sub: str, user_id: Optional[int], usuario: Usuario) -> None:
+    with _LOCK:
+        _CACHE[(sub, user_id)] = (time.monotonic() + USER_CACHE_TTL, usuario.dict())
+        _CACHE.move_to_end((sub, user_id))
+        while len(_CACHE) > USER_CACHE_MAX:
+            _CACHE.popitem(last=False)
+
+
+def invalidate_user(user_id: Optional[int]) -> None:
+    """Elimina todas las entradas de un usuario."""
+    with _LOCK:
+        for key in [key for key, (_, data) in _CACHE.items() if data.get("id") == user_id]:
+            del _CACHE[key]
+
+
+def user_cache_stats() -> Dict:
+    with _LOCK:
+        total = _STATS["hits"] + _STATS["misses"]
+        return {
+            **_STATS,
+            "hit_ratio": round(_STATS["hits"] / total, 4) if total else 0.0,
+            "size": len(_CACHE),
+            "max_size": USER_CACHE_MAX,
+            "ttl_seconds": USER_CACHE_TTL,
+        }
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _on_usuario_change(mapper, connection, target) -> None:
+    invalidate_user(target.id)
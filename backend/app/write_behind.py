@@ -0,0 +1,300 @@
+"""Escritura diferida (write-behind) de predicciones con commit agrupado.
+
+En semana de examenes `POST /api/predict` pasa la mayor parte del tiempo en el
+commit (fsync en SQLite, ida y vuelta en PostgreSQL). PREDICTION_WRITE_MODE elige
+la garantia de durabilidad:
+- "sync" (por defecto): commit y refresh por request, como siempre.
+- "group": el request encola la fila y espera el commit de su grupo. La respuesta
+  sigue siendo durable, pero un solo commit (y un fsync) cubre a todo el grupo.
+- "async": el id se reserva por adelantado, el request responde de inmediato y el
+  escritor confirma despues (a lo sumo WRITE_BEHIND_MAX_MS mas tarde). Si el
+  proceso muere sin apagado ordenado se pierde lo que estaba en cola; al apagar,
+  `stop_writer` (lifespan) vacia la cola.
+
+El escritor es un hilo que junta hasta WRITE_BEHIND_BATCH filas o espera
+WRITE_BEHIND_MAX_MS desde la primera, y las confirma con un flush del ORM (el
+listener de `stats_summary` aplica un solo UPDATE de contadores por grupo). Si el
+grupo falla, se reintenta fila por fila para aislar la que falla. Antes de reservar
+el id y encolar, `insert_errors` comprueba lo que haria fallar el INSERT (usuario
+inexistente, columnas obligatorias, largo de texto): en modo async el escritor ya no
+puede responder al cliente. Si aun asi una fila falla, queda registrada en
+WRITE_BEHIND_FAILED_PATH (JSONL) y su PDF responde 410 con el error.
+
+Ids en modo async: en PostgreSQL se toman bloques de la secuencia de `id` (la misma
+que usan los demas inserts); en SQLite, de la tabla `secuencias_id`, y mientras el
+escritor corre toda Prediccion que se inserte por el ORM en este proceso recibe un
+id reservado (ver `_assign_ids`). Los inserts masivos con Core (benchmarks) deben
+hacerse con el modo "sync". Los ids reservados y no usados quedan como huecos.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+
+from .models import Prediccion, SecuenciaId, Usuario
+
+PREDICTION_WRITE_MODE = os.getenv("PREDICTION_WRITE_MODE", "sync").lower()  # sync, group, async
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "256"))
+WRITE_BEHIND_MAX_MS = float(os.getenv("WRITE_BEHIND_MAX_MS", "20"))
+WRITE_BEHIND_QUEUE_MAX = int(os.getenv("WRITE_BEHIND_QUEUE_MAX", "10000"))  # cola llena = el request espera
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "100"))
+WRITE_BEHIND_FAILED_PATH = Path(os.getenv("WRITE_BEHIND_FAILED_PATH", "./data/write_behind_fallidas.jsonl"))
+FAILED_MEMORY = 1000  # errores recientes por id (para el 410 del PDF)
+MODOS = ("sync", "group", "async")
+
+_QUEUE: "queue.Queue[Optional[Tuple[Prediccion, Optional[Future]]]]" = queue.Queue(maxsize=WRITE_BEHIND_QUEUE_MAX)
+_PENDING: Dict[int, Dict] = {}  # modo async: filas en cola, por id (PDF antes del commit)
+_FAILED: "OrderedDict[int, str]" = OrderedDict()
+_IDS: Deque[int] = deque()
+_LOCK = threading.Lock()
+_ID_LOCK = threading.Lock()  # la reserva de un bloque va a la BD: no bloquear _PENDING
+_STATE = {"engine": None, "thread": None}
+_STATS = {"filas": 0, "grupos": 0, "reintentos": 0, "descartadas": 0, "ids_reservados": 0, "ultimo_error": None}
+
+
+def write_behind_enabled() -> bool:
+    return PREDICTION_WRITE_MODE in {"group", "async"} and _STATE["thread"] is not None
+
+
+# ============================================
+# RESERVA DE IDS
+# ============================================
+def reserve_ids(engine, n: int) -> List[int]:
+    """Reserva `n` ids de `predicciones` para este proceso (transaccion propia)."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            return list(conn.execute(
+                text("SELECT nextval(pg_get_serial_sequence('predicciones', 'id')) FROM generate_series(1, :n)"),
+                {"n": n},
+            ).scalars())
+
+        # Nunca por debajo del maximo existente (filas insertadas sin reserva)
+        table = SecuenciaId.__table__
+        maximo = select(func.coalesce(func.max(Prediccion.id), 0)).scalar_subquery()
+        avanzar = (
+            update(table)
+            .where(table.c.nombre == "predicciones")
+            .values(valor=func.max(table.c.valor, maximo) + n)
+        )
+        if conn.execute(avanzar).rowcount == 0:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(table).values(nombre="predicciones", valor=0))
+            except IntegrityError:  # otro proceso creo la fila
+                pass
+            conn.execute(avanzar)
+        valor = conn.execute(select(table.c.valor).where(table.c.nombre == "predicciones")).scalar_one()
+    return list(range(valor - n + 1, valor + 1))
+
+
+def next_prediction_id() -> int:
+    with _ID_LOCK:
+        if not _IDS:
+            _IDS.extend(reserve_ids(_STATE["engine"], ID_BLOCK_SIZE))
+            _STATS["ids_reservados"] += ID_BLOCK_SIZE
+        return _IDS.popleft()
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _assign_ids(session, flush_context, instances) -> None:
+    # Los inserts del ORM no deben tomar (max(id) + 1) un id reservado que sigue en cola
+    if PREDICTION_WRITE_MODE != "async" or not write_behind_enabled():
+        return
+    for obj in session.new:
+        if isinstance(obj, Prediccion) and obj.id is None:
+            obj.id = next_prediction_id()
+
+
+# ============================================
+# ENCOLADO (HILOS DE LA API)
+# ============================================
+def insert_errors(session, prediccion: Prediccion) -> List[str]:
+    """Lo que haria fallar el INSERT de la fila; vacio si se puede encolar."""
+    errores = []
+    for column in Prediccion.__table__.columns:
+        value = getattr(prediccion, column.name)
+        if value is None and not column.nullable and not column.primary_key:
+            errores.append(f"{column.name} es obligatorio")
+        length = getattr(column.type, "length", None)
+        if length and isinstance(value, str) and len(value) > length:
+            errores.append(f"{column.name} supera {length} caracteres")
+    if prediccion.usuario_id is not None and session.get(Usuario, prediccion.usuario_id) is None:
+        errores.append(f"usuario {prediccion.usuario_id} no existe")
+    return errores
+
+
+def persist_prediction(prediccion: Prediccion, timeout: float = 30.0) -> Dict:
+    """
+    Guarda la prediccion segun PREDICTION_WRITE_MODE y retorna sus campos (con id).
+    En "group" espera el commit de su grupo; en "async" retorna antes del commit.
+    """
+    if PREDICTION_WRITE_MODE == "async":
+        prediccion.id = next_prediction_id()
+        data = prediccion.dict()  # copia antes de que el escritor toque el objeto
+        with _LOCK:
+            _PENDING[prediccion.id] = data
+        _QUEUE.put((prediccion, None))
+        return data
+
+    future: Future = Future()
+    _QUEUE.put((prediccion, future))
+    future.result(timeout=timeout)
+    return prediccion.dict()
+
+
+def pending_prediction(prediccion_id: int) -> Optional[Dict]:
+    """Prediccion aun en cola (modo async) o None."""
+    with _LOCK:
+        return _PENDING.get(prediccion_id)
+
+
+def failed_prediction(prediccion_id: int) -> Optional[str]:
+    """Error con que el escritor descarto la prediccion (si es reciente) o None."""
+    with _LOCK:
+        return _FAILED.get(prediccion_id)
+
+
+def _record_failure(data: Dict, error: Exception) -> None:
+    """Registro durable de la fila descartada (una linea JSON por fila)."""
+    mensaje = f"{type(error).__name__}: {error}".splitlines()[0]
+    print(f"❌ Prediccion {data.get('id')} no se pudo guardar: {mensaje}")
+    with _LOCK:
+        _STATS["descartadas"] += 1
+        _STATS["ultimo_error"] = mensaje
+        if data.get("id") is not None:
+            _FAILED[data["id"]] = mensaje
+            while len(_FAILED) > FAILED_MEMORY:
+                _FAILED.popitem(last=False)
+    try:
+        WRITE_BEHIND_FAILED_PATH.parent.mkdir(parents=True, exist_ok=True)
+        linea = {"fecha": datetime.utcnow().isoformat(), "error": mensaje, "prediccion": data}
+        with open(WRITE_BEHIND_FAILED_PATH, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(linea, default=str, ensure_ascii=False) + "\n")
+    except OSError:
+        traceback.print_exc()
+
+
+# ============================================
+# ESCRITOR (HILO EN SEGUNDO PLANO)
+# ============================================
+def _take_group() -> Tuple[List[Tuple[Prediccion, Optional[Future]]], bool]:
+    """Hasta WRITE_BEHIND_BATCH filas dentro de WRITE_BEHIND_MAX_MS; (grupo, detener)."""
+    first = _QUEUE.get()
+    if first is None:
+        return [], True
+    group = [first]
+    deadline = time.monotonic() + WRITE_BEHIND_MAX_MS / 1000
+    while len(group) < WRITE_BEHIND_BATCH:
+        try:
+            item = _QUEUE.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        if item is None:
+            return group, True
+        group.append(item)
+    return group, False
+
+
+def _commit(engine, predicciones: List[Prediccion]) -> None:
+    # expire_on_commit=False: los ids y campos quedan cargados sin refresh
+    with Session(engine, expire_on_commit=False) as session:
+        session.add_all(predicciones)
+        session.commit()
+
+
+def _write_group(engine, group: List[Tuple[Prediccion, Optional[Future]]]) -> None:
+    try:
+        _commit(engine, [p for p, _ in group])
+        resultados = [(p, f, None) for p, f in group]
+    except Exception:
+        traceback.print_exc()
+        _STATS["reintentos"] += 1
+        resultados = []
+        for p, f in group:  # aislar la fila que falla; las demas se guardan
+            try:
+                _commit(engine, [p])
+                resultados.append((p, f, None))
+            except Exception as exc:
+                resultados.append((p, f, exc))
+
+    fallidas = []
+    with _LOCK:
+        for p, future, error in resultados:
+            data = _PENDING.pop(p.id, None)
+            if error is not None:
+                fallidas.append((data, p, error))
+            else:
+                _STATS["filas"] += 1
+        _STATS["grupos"] += 1
+    for data, p, error in fallidas:
+        _record_failure(data or {column: getattr(p, column) for column in Prediccion.__fields__}, error)
+    for _, future, error in resultados:
+        if future is None:
+            continue
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+
+def _writer_loop(engine) -> None:
+    while True:
+        group, stop = _take_group()
+        if group:
+            _write_group(engine, group)
+        if stop:
+            return
+
+
+def start_writer(engine) -> None:
+    """Arranca el escritor si el modo es group o async (lifespan)."""
+    if PREDICTION_WRITE_MODE not in MODOS:
+        raise ValueError(f"PREDICTION_WRITE_MODE invalido: {PREDICTION_WRITE_MODE} ({', '.join(MODOS)})")
+    if PREDICTION_WRITE_MODE == "sync" or _STATE["thread"] is not None:
+        return
+    _STATE["engine"] = engine
+    thread = threading.Thread(target=_writer_loop, args=(engine,), name="write-behind", daemon=True)
+    _STATE["thread"] = thread
+    thread.start()
+    print(
+        f"📝 Escritura diferida de predicciones ({PREDICTION_WRITE_MODE}, "
+        f"grupos de hasta {WRITE_BEHIND_BATCH} o {WRITE_BEHIND_MAX_MS:g} ms)"
+    )
+
+
+def stop_writer(timeout: float = 30.0) -> None:
+    """Confirma lo que queda en cola y detiene el escritor (apagado ordenado)."""
+    thread = _STATE["thread"]
+    if thread is None:
+        return
+    pendientes = _QUEUE.qsize()
+    _QUEUE.put(None)
+    thread.join(timeout)
+    _STATE["thread"] = None
+    print(f"📝 Escritura diferida detenida ({pendientes} predicciones en cola confirmadas)")
+
+
+def write_behind_stats() -> Dict:
+    with _LOCK:
+        return {
+            **_STATS,
+            "modo": PREDICTION_WRITE_MODE,
+            "en_cola": _QUEUE.qsize(),
+            "pendientes": len(_PENDING),
+            "ids_libres": len(_IDS),
+        }
@@ -0,0 +1 @@
+"""Benchmarks reproducibles del backend (ejecutar con `python -m benchmarks.<modulo>`)."""
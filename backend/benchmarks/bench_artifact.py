@@ -0,0 +1,102 @@
+"""Memoria por worker: `joblib.load` del pickle vs artefacto mmap compartido.
+
+Entrena un Random Forest (250 arboles) sobre datos sinteticos, lo guarda como
+pickle y como artefacto mmap en un directorio temporal y lanza `--workers`
+procesos que cargan el modelo y predicen. Cada worker reporta su memoria privada y
+su PSS (`/proc/self/smaps_rollup`, solo Linux) descontando la de un proceso que
+solo importa los modulos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_artifact --workers 4 --rows 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import tempfile
+import warnings
+from pathlib import Path
+
+import joblib
+
+from app.ml.preprocessing import FEATURE_COLUMNS, generate_synthetic_students
+
+
+def _memory_kb() -> dict:
+    values = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+        "pss": values.get("Pss", 0),
+    }
+
+
+def _worker(mode: str, model_path: str, queue) -> None:
+    warnings.filterwarnings("ignore")
+    import sklearn.ensemble  # noqa: F401  (mismos modulos en ambos modos)
+
+    from app.ml.artifact import load_artifact
+    from app.ml.utils import predict_batch
+
+    X = generate_synthetic_students(2000, random_state=7)[FEATURE_COLUMNS].to_numpy(dtype=float)
+    before = _memory_kb()
+    if mode == "baseline":
+        queue.put((mode, before, before))
+        return
+    path = Path(model_path)
+    bundle = joblib.load(path) if mode == "pickle" else load_artifact(path.with_suffix(".mmap"))
+    predict_batch(bundle, X)
+    queue.put((mode, before, _memory_kb()))
+
+
+def _run(mode: str, model_path: Path, workers: int):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, str(model_path), queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    from sklearn.ensemble import RandomForestClassifier
+
+    from app.ml.artifact import write_artifact
+    from app.ml.train_models import _build_pipeline
+
+    df = generate_synthetic_students(args.rows)
+    pipeline = _build_pipeline(
+        RandomForestClassifier(n_estimators=250, max_depth=9, min_samples_split=4, random_state=42, n_jobs=-1)
+    )
+    pipeline.fit(df[FEATURE_COLUMNS], df["riesgo"])
+    bundle = {"model": pipeline, "best_model": "random_forest", "feature_order": FEATURE_COLUMNS}
+
+    tmp = Path(tempfile.mkdtemp(prefix="edupredict-artifact-"))
+    model_path = tmp / "model.pkl"
+    joblib.dump(bundle, model_path)
+    write_artifact(bundle, model_path.with_suffix(".mmap"))
+    print(f"pickle: {model_path.stat().st_size / 1e6:.1f} MB, artefacto: {model_path.with_suffix('.mmap').stat().st_size / 1e6:.1f} MB")
+
+    for mode in ("pickle", "mmap"):
+        results = _run(mode, model_path, args.workers)
+        private = sum(after["private"] - before["private"] for _, before, after in results) / 1024
+        pss = sum(after["pss"] - before["pss"] for _, before, after in results) / 1024
+        print(f"{mode:<7} {args.workers} workers: memoria privada del modelo {private:8.1f} MB, PSS {pss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Throughput de `import_from_db` sobre una BD SQLite que simula el sistema institucional.
+
+Crea (si no existe) una BD con tablas `notas` (una fila por calificacion) y
+`asistencia` (una fila por estudiante) y mide filas de notas procesadas por segundo.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_etl_db --rows 2000000 --students 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.etl.institucional import import_from_db
+
+
+def build_fixture(path: Path, rows: int, students: int, seed: int = 42) -> None:
+    """BD institucional sintetica: notas por materia y asistencia por estudiante."""
+    rng = np.random.default_rng(seed)
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE notas (id INTEGER PRIMARY KEY, cedula TEXT, materia TEXT, nota REAL, entregas_puntuales REAL)")
+    conn.execute("CREATE TABLE asistencia (cedula TEXT PRIMARY KEY, porc_asistencia REAL, riesgo TEXT)")
+
+    batch = 200_000
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        ids = rng.integers(0, students, n).astype(str)
+        notas = rng.uniform(0, 10, n).round(2)
+        puntual = rng.uniform(40, 100, n).round(1)
+        conn.executemany(
+            "INSERT INTO notas (cedula, materia, nota, entregas_puntuales) VALUES (?, 'M', ?, ?)",
+            zip(ids.tolist(), notas.tolist(), puntual.tolist()),
+        )
+    conn.executemany(
+        "INSERT INTO asistencia VALUES (?, ?, ?)",
+        zip(
+            np.arange(students).astype(str).tolist(),
+            rng.uniform(50, 100, students).round(1).tolist(),
+            rng.choice(["alto", "medio", "bajo"], students).tolist(),
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--db", type=Path, default=Path("./data/bench_institucional.db"))
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    args.db.parent.mkdir(parents=True, exist_ok=True)
+    if args.rebuild or not args.db.exists():
+        start = time.perf_counter()
+        build_fixture(args.db, args.rows, args.students)
+        print(f"fixture: {args.rows} notas en {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    df = import_from_db(dsn=f"sqlite:///{args.db}", tables=["notas", "asistencia"])
+    elapsed = time.perf_counter() - start
+
+    print(f"estudiantes: {len(df)}")
+    print(f"tiempo     : {elapsed:.2f}s")
+    print(f"throughput : {args.rows / elapsed:,.0f} notas/s")
+
+
+if __name__ == "__main__":
+    main()
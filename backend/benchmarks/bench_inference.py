@@ -0,0 +1,63 @@
+"""Micro-benchmark: ruta pandas (predict + predict_proba) vs ruta compilada.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_inference --iterations 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import warnings
+
+import pandas as pd
+
+from app.ml.preprocessing import FEATURE_COLUMNS
+from app.ml.utils import load_or_train_model, predict_with_model
+
+PAYLOAD = {
+    "promedio": 6.8,
+    "asistencia": 82.0,
+    "horas_estudio": 9.0,
+    "tendencia": -0.5,
+    "puntualidad": 88.0,
+    "habitos": 6.0,
+}
+
+
+def legacy_predict(model_bundle, payload):
+    """Ruta previa: DataFrame de una fila y dos pasadas por el pipeline."""
+    model = model_bundle["model"]
+    df = pd.DataFrame([payload], columns=model_bundle.get("feature_order", FEATURE_COLUMNS))
+    predicted = model.predict(df)[0]
+    proba = model.predict_proba(df)[0]
+    return predicted, proba
+
+
+def _time_per_call(fn, iterations: int) -> float:
+    fn()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    bundle = load_or_train_model()
+
+    legacy_us = _time_per_call(lambda: legacy_predict(bundle, PAYLOAD), args.iterations)
+    compiled_us = _time_per_call(lambda: predict_with_model(bundle, PAYLOAD), args.iterations)
+
+    print(f"modelo: {bundle.get('best_model')}")
+    print(f"pandas   : {legacy_us:8.1f} us/prediccion")
+    print(f"compilada: {compiled_us:8.1f} us/prediccion")
+    print(f"speedup  : {legacy_us / compiled_us:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Suite de benchmarks reproducible: datos sinteticos, entrenamiento, inferencia, PDF y API.
+
+Mide, con semilla fija:
+- `generate_synthetic_students` para cada tamano de `--sizes`,
+- `train_models` (secuencial) para cada tamano de `--train-sizes`,
+- `predict_with_model` (una fila) y `predict_batch` (cada tamano de `--sizes`),
+- `build_pdf_report`,
+- `GET /api/stats` con la tabla `predicciones` creciendo hasta cada tamano,
+- carga HTTP en proceso (httpx + ASGI, sin red) contra la app sobre SQLite temporal.
+
+Los resultados se escriben en JSON (`--output`) y se comparan contra una linea base
+(`--baseline`), marcando como regresion lo que empeore mas de `--tolerance`.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_suite --output data/bench.json
+    python -m benchmarks.bench_suite --baseline data/bench.json --strict
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# La app lee DATABASE_URL al importarse: cada corrida usa una SQLite temporal
+_BENCH_DIR = Path(tempfile.mkdtemp(prefix="edupredict-bench-"))
+atexit.register(shutil.rmtree, _BENCH_DIR, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_BENCH_DIR / 'bench.db'}")
+os.environ.setdefault("PDF_CACHE_DIR", str(_BENCH_DIR / "pdf_cache"))
+
+PAYLOAD = {
+    "promedio": 6.8,
+    "asistencia": 82.0,
+    "horas_estudio": 9.0,
+    "tendencia": -0.5,
+    "puntualidad": 88.0,
+    "habitos": 6.0,
+}
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(",") if v.strip()]
+
+
+def _time_once(fn: Callable) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _time_per_call(fn: Callable, iterations: int) -> float:
+    fn()  # calentamiento
+    return min(_time_once(lambda: [fn() for _ in range(iterations)]) for _ in range(3)) / iterations
+
+
+def _record(results: Dict, name: str, value: float, unit: str, better: str = "lower") -> None:
+    results[name] = {"value": round(float(value), 6), "unit": unit, "better": better}
+    print(f"  {name:<42} {value:14.4f} {unit}")
+
+
+# ============================================
+# ML: DATOS, ENTRENAMIENTO, INFERENCIA Y PDF
+# ============================================
+def bench_ml(results: Dict, sizes: List[int], train_sizes: List[int], iterations: int) -> Dict:
+    from app.ml.preprocessing import FEATURE_COLUMNS, generate_synthetic_students
+    from app.ml.train_models import train_models
+    from app.ml.utils import build_pdf_report, predict_batch, predict_with_model
+
+    print("Datos sinteticos")
+    datasets = {}
+    for n in sorted(set(sizes) | set(train_sizes)):
+        seconds = _time_once(lambda: datasets.__setitem__(n, generate_synthetic_students(n_samples=n)))
+        _record(results, f"generate_synthetic_students[n={n}]", seconds, "s")
+
+    print("Entrenamiento (train_models, secuencial)")
+    bundle = None
+    for n in train_sizes:
+        start = time.perf_counter()
+        bundle = train_models(df=datasets[n], n_workers=1)
+        _record(results, f"train_models[n={n}]", time.perf_counter() - start, "s")
+
+    print("Inferencia")
+    _record(results, "predict_with_model[1 fila]", _time_per_call(lambda: predict_with_model(bundle, PAYLOAD), iterations) * 1e6, "us")
+    for n in sizes:
+        X = datasets[n][FEATURE_COLUMNS].to_numpy(dtype=float)
+        seconds = _time_per_call(lambda: predict_batch(bundle, X), 1)
+        _record(results, f"predict_batch[n={n}]", n / seconds, "filas/s", better="higher")
+
+    print("PDF")
+    prediccion = {**PAYLOAD, **predict_with_model(bundle, PAYLOAD), "id": 1}
+    _record(results, "build_pdf_report", _time_per_call(lambda: build_pdf_report(prediccion, bundle), max(iterations // 20, 5)) * 1e3, "ms")
+    return bundle
+
+
+# ============================================
+# API: /api/stats Y CARGA HTTP EN PROCESO
+# ============================================
+def _fill_predicciones(engine, target: int, chunk: int = 50_000) -> None:
+    """Inserta filas sinteticas hasta que `predicciones` tenga `target` filas."""
+    from sqlalchemy import func, select
+
+    from app.ml.preprocessing import generate_synthetic_students
+    from app.models import Prediccion
+
+    table = Prediccion.__table__
+    with engine.begin() as conn:
+        current = conn.execute(select(func.count()).select_from(table)).scalar_one()
+        rng = np.random.default_rng(current)
+        created = datetime.utcnow()
+        while current < target:
+            n = min(chunk, target - current)
+            df = generate_synthetic_students(n_samples=n, random_state=current)
+            df["score"] = rng.uniform(0, 100, n).round(2)
+            df["recomendacion"] = "bench"
+            df["modelo"] = "bench"
+            df["created_at"] = created
+            conn.execute(table.insert(), df.to_dict("records"))
+            current += n
+
+    # La insercion con Core no pasa por la Session: reconstruir el resumen de /api/stats
+    from sqlmodel import Session
+
+    from app.stats_summary import rebuild_summary
+
+    with Session(engine) as session:
+        rebuild_summary(session)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+async def _load(client, requests_total: int, concurrency: int) -> Dict[str, List[float]]:
+    """Mezcla de trafico: 60% predict, 20% listado, 20% stats."""
+    plan = [("POST", "/api/predict", PAYLOAD)] * 3 + [("GET", "/api/students?limit=50", None), ("GET", "/api/stats", None)]
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        method, url, body = plan[i % len(plan)]
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            errors += 1
+        latencies.setdefault(url.split("?")[0], []).append(elapsed)
+
+    await asyncio.gather(*(one(i) for i in range(requests_total)))
+    latencies["_errors"] = [errors]
+    return latencies
+
+
+async def _bench_api_async(results: Dict, sizes: List[int], requests_total: int, concurrency: int) -> None:
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print("GET /api/stats")
+            for n in sizes:
+                _fill_predicciones(engine, n)
+                await client.get("/api/stats")  # calentamiento
+                timings = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    response = await client.get("/api/stats")
+                    timings.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                _record(results, f"api_stats[filas={n}]", statistics.median(timings) * 1e3, "ms")
+
+            print(f"Carga HTTP ({requests_total} requests, concurrencia {concurrency})")
+            start = time.perf_counter()
+            latencies = await _load(client, requests_total, concurrency)
+            elapsed = time.perf_counter() - start
+            errors = latencies.pop("_errors")[0]
+            _record(results, "http_load[throughput]", requests_total / elapsed, "req/s", better="higher")
+            _record(results, "http_load[errores]", errors, "requests")
+            for route, values in sorted(latencies.items()):
+                _record(results, f"http_load{route}[p50]", _percentile(values, 50) * 1e3, "ms")
+                _record(results, f"http_load{route}[p95]", _percentile(values, 95) * 1e3, "ms")
+
+
+def bench_api(results: Dict, sizes: List[int], requests_total: int, concurrency: int) -> None:
+    asyncio.run(_bench_api_async(results, sizes, requests_total, concurrency))
+
+
+# ============================================
+# RESULTADOS Y COMPARACION CON LINEA BASE
+# ============================================
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Imprime la variacion contra la linea base y retorna los nombres con regresion."""
+    regressions = []
+    print(f"\nComparacion con linea base ({baseline.get('meta', {}).get('commit') or 's/c'})")
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous["value"]:
+            continue
+        ratio = current["value"] / previous["value"]
+        worse = ratio > 1 + tolerance if current["better"] == "lower" else ratio < 1 - tolerance
+        if worse:
+            regressions.append(name)
+        flag = "REGRESION" if worse else ""
+        print(f"  {name:<42} {previous['value']:12.4f} -> {current['value']:12.4f} {current['unit']:<8} x{ratio:6.2f} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=_sizes, default=_sizes("1000,10000,100000"),
+                        help="Tamanos para datos, predict_batch y /api/stats (hasta 1000000)")
+    parser.add_argument("--train-sizes", type=_sizes, default=_sizes("1000,10000"))
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--strict", action="store_true", help="Codigo de salida 1 si hay regresiones")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    results: Dict = {}
+    bench_ml(results, args.sizes, args.train_sizes, args.iterations)
+    if not args.skip_api:
+        bench_api(results, args.sizes, args.requests, args.concurrency)
+
+    report = {
+        "meta": {
+            "fecha": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: str(v) for k, v in vars(args).items()},
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nResultados en {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regresion(es) sobre {args.tolerance:.0%}")
+            if args.strict:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
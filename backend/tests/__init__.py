@@ -0,0 +1 @@
+"""Pruebas del backend (ejecutar desde backend/ con `python -m pytest tests`)."""
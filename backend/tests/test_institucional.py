@@ -0,0 +1,56 @@
+"""`import_from_db` y `import_streaming` dan el mismo resultado sobre las mismas filas."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from app.etl.institucional import import_from_db, import_streaming
+
+ETIQUETAS = ["alto", "medio", "bajo"]
+
+
+def _notas(n_rows: int = 600, n_students: int = 40, seed: int = 7) -> pd.DataFrame:
+    """Varias filas por estudiante en orden de registro, con etiquetas que cambian y faltan."""
+    rng = np.random.default_rng(seed)
+    riesgo = rng.choice(ETIQUETAS, n_rows).astype(object)
+    riesgo[rng.random(n_rows) < 0.2] = None
+    return pd.DataFrame(
+        {
+            "estudiante_id": rng.integers(0, n_students, n_rows).astype(str),
+            "promedio": rng.uniform(0, 10, n_rows).round(2),
+            "asistencia": rng.uniform(40, 100, n_rows).round(2),
+            "riesgo": riesgo,
+        }
+    )
+
+
+def test_import_from_db_matches_streaming(tmp_path):
+    notas = _notas()
+    csv_path = tmp_path / "notas.csv"
+    notas.to_csv(csv_path, index=False)
+
+    db_path = tmp_path / "institucional.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE notas (id INTEGER PRIMARY KEY, estudiante_id TEXT, promedio REAL, asistencia REAL, riesgo TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO notas (estudiante_id, promedio, asistencia, riesgo) VALUES (?, ?, ?, ?)",
+            notas.itertuples(index=False, name=None),
+        )
+
+    # Bloques pequenos: la ultima etiqueta debe sobrevivir entre bloques
+    streamed = import_streaming([str(csv_path)], chunksize=50)
+    from_db = import_from_db(f"sqlite:///{db_path}", tables=["notas"], chunksize=50)
+
+    streamed = streamed.sort_values("estudiante_id").reset_index(drop=True)
+    from_db = from_db.sort_values("estudiante_id").reset_index(drop=True)
+    assert list(from_db.columns) == list(streamed.columns)
+    assert from_db["estudiante_id"].tolist() == streamed["estudiante_id"].tolist()
+    assert from_db["riesgo"].tolist() == streamed["riesgo"].tolist()
+    np.testing.assert_allclose(
+        from_db[["promedio", "asistencia"]].to_numpy(), streamed[["promedio", "asistencia"]].to_numpy(), rtol=1e-5
+    )